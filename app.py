@@ -1,13 +1,31 @@
 import streamlit as st
-import numpy as np
-import pickle
-import os
 import time
 from datetime import datetime
 
+from assets import premium_head
+from drift import PSI_DRIFT, PSI_WATCH
+from explain import explain, ranked
+from insights import cached as cached_insights, get_insights
+from metrics import Profiler, export_from_env, observe, span
+from online import get_learner, latest_key, latest_version
+from prediction_cache import get_cache
+from prediction_log import get_log
+from registry import get_registry
+from scoring import single_row
+from validation import RANGES
+
 # -------------------- Page config --------------------
 st.set_page_config(page_title="Diabetes Prediction — Premium", layout="wide", page_icon="🩺")
 
+# page render time goes to metrics.py; the sidebar's profiler choice applies to the next run
+run_started = time.perf_counter()
+profiler = Profiler(st.session_state.profile).start() if st.session_state.get("profile", "off") != "off" else None
+
+# Shared across sessions; the bundled model.pkl/scaler.pkl are loaded once per process, on first use
+registry = get_registry()
+prediction_cache = get_cache()
+prediction_log = get_log()
+
 # -------------------- Helper: Theme + CSS --------------------
 if "theme" not in st.session_state:
     st.session_state.theme = "dark"  # default
@@ -15,142 +33,8 @@ if "theme" not in st.session_state:
 def toggle_theme():
     st.session_state.theme = "light" if st.session_state.theme == "dark" else "dark"
 
-# CSS for both dark and light. Styling targets wrappers and uses modern look.
-base_css = """
-<style>
-:root {
-  --accent: #06b6d4;
-  --muted: #94a3b8;
-  --glass: rgba(255,255,255,0.06);
-  --glass-strong: rgba(255,255,255,0.10);
-  --card-radius: 16px;
-  --card-padding: 20px;
-}
-
-/* Page backgrounds */
-body[data-theme="dark"] .stApp {
-  background: linear-gradient(135deg,#081129 0%, #0f172a 100%);
-  color: #e6eef8;
-}
-body[data-theme="light"] .stApp {
-  background: linear-gradient(135deg,#f8fafc 0%, #f1f5f9 100%);
-  color: #0f172a;
-}
-
-/* Title */
-.header-title {
-  font-size: 44px;
-  font-weight: 900;
-  letter-spacing: -1px;
-  margin-bottom: -6px;
-  background: linear-gradient(90deg,#7c3aed,#06b6d4);
-  -webkit-background-clip: text;
-  -webkit-text-fill-color: transparent;
-}
-
-/* Subtitle */
-.header-sub {
-  font-size: 15px;
-  color: var(--muted);
-  margin-bottom: 12px;
-}
-
-/* Glass card */
-.glass {
-  padding: var(--card-padding);
-  border-radius: var(--card-radius);
-  background: var(--glass);
-  border: 1px solid rgba(255,255,255,0.06);
-  backdrop-filter: blur(8px);
-  transition: transform .25s ease, box-shadow .25s ease;
-}
-.glass:hover {
-  transform: translateY(-6px);
-  box-shadow: 0 10px 30px rgba(2,6,23,0.5);
-}
-
-/* Card headers */
-.card-h {
-  font-size:18px;
-  font-weight:700;
-  margin-bottom:6px;
-}
-
-/* Metrics */
-.metric {
-  display:flex; align-items:center; justify-content:space-between;
-  gap:10px;
-}
-.metric .value {
-  font-size:26px; font-weight:800;
-}
-.metric .label {
-  color:var(--muted); font-size:13px;
-}
-
-/* Image hover zoom */
-.img-card {
-  overflow:hidden;
-  border-radius:12px;
-}
-.img-card img {
-  transition: transform 0.6s ease;
-  width:100%;
-  height:auto;
-  display:block;
-}
-.img-card:hover img { transform: scale(1.06); }
-
-/* Glowing primary button (we style anchor-looking button for control) */
-.primary-btn {
-  display:inline-block;
-  padding:10px 18px;
-  border-radius:12px;
-  background: linear-gradient(90deg,#06b6d4,#3b82f6);
-  color:white !important;
-  font-weight:700;
-  text-decoration:none;
-  transition: transform .15s ease;
-  box-shadow: 0 6px 20px rgba(59,130,246,0.18);
-}
-.primary-btn:hover { transform: translateY(-3px); }
-
-/* Small loader heart */
-.loader {
-  display:inline-block;
-  width:42px;
-  height:42px;
-  border-radius:50%;
-  background: radial-gradient(circle at 30% 30%, #fff 0%, rgba(255,255,255,0.1) 30%, transparent 31%),
-              linear-gradient(90deg,#ef4444,#fb923c);
-  animation: pulse 1s infinite;
-}
-@keyframes pulse {
-  0% { transform: scale(1); opacity: .95;}
-  50% { transform: scale(1.12); opacity: .7;}
-  100% { transform: scale(1); opacity: .95;}
-}
-
-/* Footer */
-.footer {
-  color: var(--muted);
-  font-size:13px;
-  margin-top:20px;
-  text-align:center;
-}
-</style>
-"""
-
-# Inject theme attribute on body to allow CSS toggling (works in many Streamlit versions)
-# We'll also include a small script to set a data-theme attribute
-theme_script = f"""
-<script>
-const theme = "{st.session_state.theme}";
-document.documentElement.setAttribute('data-theme', theme);
-</script>
-"""
-
-st.markdown(base_css + theme_script, unsafe_allow_html=True)
+# CSS and the theme script are built once per process in assets.py
+st.markdown(premium_head(st.session_state.theme), unsafe_allow_html=True)
 
 # -------------------- Top bar w/ theme toggle and timestamp --------------------
 with st.container():
@@ -176,49 +60,59 @@ st.sidebar.markdown("### Shortcuts")
 if st.sidebar.button("Go to Predict"):
     page = "Patient Prediction"
 
-# -------------------- Robust image loader helper --------------------
-def find_image(*candidate_names):
+cache_stats = prediction_cache.stats()
+st.sidebar.caption(f"Prediction cache: {cache_stats['hit_rate']:.0%} hits • "
+                   f"{cache_stats['entries']:,}/{cache_stats['max_entries']:,} entries • "
+                   f"{cache_stats['evictions']:,} evictions")
+st.sidebar.selectbox("Profile each run", ["off", "cprofile", "sampling"], key="profile",
+                     help="Shows a profile of the whole script run at the bottom of the page.")
+
+# -------------------- Insights (computed once per data/model version) --------------------
+def active_version():
+    """
+    Uploaded model from this session if any, else the online learner's newest
+    snapshot if chosen on Upload Model, else the bundled one: (model, key, preprocessor).
     """
-    Returns the first path that exists among candidates else None.
-    Candidate names can be full paths or filenames in current directory.
+    if "model" in st.session_state:
+        return st.session_state.model, st.session_state.get("model_key"), st.session_state.get("preprocessor")
+    if st.session_state.get("use_online"):
+        # re-read every rerun, so new snapshots are picked up without a restart
+        online = latest_version(registry)
+        if online is not None:
+            return online.model, online.key, online.preprocessor
+    bundled = registry.bundled()
+    if bundled is None:
+        return None, None, None
+    return bundled.model, bundled.key, bundled.preprocessor
+
+def active_key():
+    """Version key of the active model, without deserialising the bundled one."""
+    if "model" in st.session_state:
+        return st.session_state.get("model_key")
+    if st.session_state.get("use_online"):
+        return latest_key() or registry.bundled_version_key()
+    return registry.bundled_version_key()
+
+def insight_images():
+    """(feature importance, heatmap, pair plot) image paths, None where unavailable; None if not built yet."""
+    # built insights only need the key; the model is loaded just to build them
+    insights = cached_insights(active_key())
+    if insights is None:
+        return None
+    images = insights["images"]
+    return images.get("feature_importance"), images.get("heatmap"), images.get("pairplot")
+
+@st.fragment(run_every=1.0)
+def build_insights():
     """
-    for name in candidate_names:
-        if name is None:
-            continue
-        if os.path.isabs(name):
-            if os.path.exists(name):
-                return name
-        else:
-            # check local project dir (same folder as app.py)
-            local_path = os.path.join(os.getcwd(), name)
-            if os.path.exists(local_path):
-                return local_path
-            # also try images/ subfolder
-            local_path2 = os.path.join(os.getcwd(), "images", name)
-            if os.path.exists(local_path2):
-                return local_path2
-    return None
-
-# Candidate filenames (preferred names in your folder)
-c_feature = find_image(
-    "feature_importance.png",
-    "feature-importance.png",
-    "feature1.png",
-    "/mnt/data/download (1).png",
-    "/mnt/data/download (1).png"  # fallback from sandbox history
-)
-c_heatmap = find_image(
-    "heatmap.png",
-    "correlation_heatmap.png",
-    "heatmap1.png",
-    "/mnt/data/download1.png",
-)
-c_pairplot = find_image(
-    "pairplot.png",
-    "pair_plot.png",
-    "pairplot1.png",
-    "/mnt/data/download2.png",
-)
+    Builds the insights on the fragment's next run rather than in the first
+    render (pandas, sklearn and matplotlib cost seconds to import), then reruns the page.
+    """
+    if st.session_state.get("insights_scheduled"):
+        get_insights(*active_version())
+        st.session_state.insights_scheduled = False
+        st.rerun()
+    st.session_state.insights_scheduled = True
 
 # -------------------- HOME PAGE --------------------
 if page == "Home":
@@ -226,22 +120,27 @@ if page == "Home":
     st.markdown("<div class='glass'>This is a premium Diabetes prediction UI — upload a trained model, enter patient data, and receive clear predictions with confidence. The Data Insights section displays visualizations from your dataset.</div>", unsafe_allow_html=True)
     st.write("")
 
-    # Metrics row (mocked values; later can be replaced with real aggregated stats)
+    images = insight_images()
+    c_feature, c_heatmap, c_pairplot = images or (None, None, None)
+
+    # Metrics row (read from the prediction log's running aggregates)
+    metrics = prediction_log.home_metrics(window_days=30)
+    accuracy = f"{metrics['accuracy'] * 100:.1f}%" if metrics["accuracy"] is not None else "—"
     m1, m2, m3 = st.columns(3)
     with m1:
         st.markdown("<div class='glass'>"
                     "<div class='card-h'>Accuracy</div>"
-                    "<div class='metric'><div><div class='value'>89.2%</div><div class='label'>Test set</div></div></div>"
+                    f"<div class='metric'><div><div class='value'>{accuracy}</div><div class='label'>{metrics['labelled']:,} confirmed outcomes</div></div></div>"
                     "</div>", unsafe_allow_html=True)
     with m2:
         st.markdown("<div class='glass'>"
                     "<div class='card-h'>Total Patients Tested</div>"
-                    "<div class='metric'><div><div class='value'>1,248</div><div class='label'>Records</div></div></div>"
+                    f"<div class='metric'><div><div class='value'>{metrics['total']:,}</div><div class='label'>Records</div></div></div>"
                     "</div>", unsafe_allow_html=True)
     with m3:
         st.markdown("<div class='glass'>"
                     "<div class='card-h'>High-Risk Cases</div>"
-                    "<div class='metric'><div><div class='value'>128</div><div class='label'>Last 30 days</div></div></div>"
+                    f"<div class='metric'><div><div class='value'>{metrics['high_risk_window']:,}</div><div class='label'>Last {metrics['window_days']} days</div></div></div>"
                     "</div>", unsafe_allow_html=True)
 
     st.write("")
@@ -253,112 +152,165 @@ if page == "Home":
             st.markdown("<div class='glass img-card'>", unsafe_allow_html=True)
             if candidate:
                 st.image(candidate, caption=("Feature Importance","Correlation Heatmap","Pair Plot")[idx], use_container_width=True)
+            elif images is None:
+                st.markdown("<div style='padding:40px;text-align:center;color:#94a3b8'>Building insights…</div>", unsafe_allow_html=True)
             else:
-                st.markdown("<div style='padding:40px;text-align:center;color:#94a3b8'>Image not found<br><small>Place image in app folder or images/</small></div>", unsafe_allow_html=True)
+                st.markdown("<div style='padding:40px;text-align:center;color:#94a3b8'>Not available<br><small>The active model does not expose coefficients or importances</small></div>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
+    if images is None:
+        build_insights()
 
 # -------------------- UPLOAD MODEL --------------------
 elif page == "Upload Model":
     st.markdown("### Upload Model", unsafe_allow_html=True)
-    st.markdown("<div class='glass'>Upload a trained sklearn model saved as `.pkl` or `joblib` file. The model should accept features in the order: [Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age]</div>", unsafe_allow_html=True)
+    st.markdown("<div class='glass'>Upload a trained sklearn model saved as `.pkl` or `joblib` file, or a compact `.npmodel` export (see compact.py; loaded without unpickling). The model should accept features in the order: [Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age]</div>", unsafe_allow_html=True)
     st.write("")
-    model_file = st.file_uploader("Upload model (.pkl or .joblib)", type=["pkl", "joblib"])
+    model_file = st.file_uploader("Upload model (.pkl, .joblib or .npmodel)", type=["pkl", "joblib", "npmodel"])
+    scaler_file = st.file_uploader("Upload scaler (optional, if the model was trained on scaled features)", type=["pkl", "joblib"])
     if model_file is not None:
         try:
-            model = pickle.load(model_file)
+            version = registry.load_bytes(model_file.getvalue(),
+                                          scaler_file.getvalue() if scaler_file is not None else None)
         except Exception as e:
-            # some users save with joblib — try joblib if pickle fails
-            import joblib
-            model_file.seek(0)
-            try:
-                model = joblib.load(model_file)
-            except Exception as e2:
-                st.error(f"Failed to load model: {e} / {e2}")
-                model = None
-        if model is not None:
+            st.error(f"Failed to load model: {e}")
+            version = None
+        if version is not None:
+            model = version.model
             st.session_state.model = model
-            st.success("Model loaded and saved to session.")
+            st.session_state.model_key = version.key
+            st.session_state.preprocessor = version.preprocessor
+            st.success(f"Model loaded and saved to session (version {version.key}).")
             # store some model metadata if available
             try:
                 st.session_state.n_features = model.n_features_in_
             except:
                 st.session_state.n_features = None
+    elif registry.bundled_version_key() is not None:
+        st.info(f"Using the bundled model.pkl (version {registry.bundled_version_key()}) until you upload one.")
+
+    # online learner: an SGD model updated from confirmed outcomes (see online.py)
+    latest_snapshot = get_learner().latest_name()
+    st.session_state.use_online = st.checkbox(
+        "Use the online learner's latest snapshot" + (f" ({latest_snapshot})" if latest_snapshot else ""),
+        value=st.session_state.get("use_online", False), disabled=latest_snapshot is None,
+        help="Updated from confirmed outcomes; new snapshots are used on the next interaction."
+             if latest_snapshot else "Run `python online.py init` to create the first snapshot.")
 
 # -------------------- PATIENT PREDICTION --------------------
 elif page == "Patient Prediction":
     st.markdown("### Patient Prediction", unsafe_allow_html=True)
-    # quick model check
-    if "model" not in st.session_state:
+    # quick model check: uploaded model first, else the bundled one (loaded on first use)
+    model, model_key, preprocessor = active_version()
+    if model is None:
         st.warning("No model loaded. Go to Upload Model to load a trained model.")
     else:
-        model = st.session_state.model
         # Input layout
         with st.form("predict_form"):
             left, right = st.columns(2)
             with left:
                 patient_name = st.text_input("Patient Name (optional)")
-                pregnancies = st.number_input("Pregnancies", min_value=0, max_value=20, value=0)
-                glucose = st.number_input("Glucose", min_value=0, max_value=500, value=120)
-                blood_pressure = st.number_input("Blood Pressure", min_value=0, max_value=300, value=70)
-                skin_thickness = st.number_input("Skin Thickness", min_value=0, max_value=100, value=20)
+                pregnancies = st.number_input("Pregnancies", min_value=RANGES["Pregnancies"][0], max_value=RANGES["Pregnancies"][1], value=0)
+                glucose = st.number_input("Glucose", min_value=RANGES["Glucose"][0], max_value=RANGES["Glucose"][1], value=120)
+                blood_pressure = st.number_input("Blood Pressure", min_value=RANGES["BloodPressure"][0], max_value=RANGES["BloodPressure"][1], value=70)
+                skin_thickness = st.number_input("Skin Thickness", min_value=RANGES["SkinThickness"][0], max_value=RANGES["SkinThickness"][1], value=20)
             with right:
-                insulin = st.number_input("Insulin", min_value=0, max_value=2000, value=80)
-                bmi = st.number_input("BMI", min_value=0.0, max_value=80.0, value=25.0)
-                dpf = st.number_input("Diabetes Pedigree Function", min_value=0.0, max_value=10.0, value=0.47)
-                age = st.number_input("Age", min_value=1, max_value=120, value=30)
+                insulin = st.number_input("Insulin", min_value=RANGES["Insulin"][0], max_value=RANGES["Insulin"][1], value=80)
+                bmi = st.number_input("BMI", min_value=RANGES["BMI"][0], max_value=RANGES["BMI"][1], value=25.0)
+                dpf = st.number_input("Diabetes Pedigree Function", min_value=RANGES["DiabetesPedigreeFunction"][0], max_value=RANGES["DiabetesPedigreeFunction"][1], value=0.47)
+                age = st.number_input("Age", min_value=RANGES["Age"][0], max_value=RANGES["Age"][1], value=30)
 
             submit = st.form_submit_button("Run Prediction")
 
         if submit:
-            # show animated loader
-            loader_col1, loader_col2, loader_col3 = st.columns([1,8,1])
-            with loader_col2:
-                st.markdown("<div style='text-align:center;margin-top:10px'><div class='loader'></div><div style='color:#94a3b8;margin-top:8px'>Analyzing...</div></div>", unsafe_allow_html=True)
-            # small pause to simulate processing (and allow loader animate)
-            time.sleep(0.8)
-
-            features = np.array([[pregnancies, glucose, blood_pressure, skin_thickness, insulin, bmi, dpf, age]])
+            # show animated loader while the model runs; cleared as soon as the result is ready
+            loader = st.empty()
+            loader.markdown("<div style='text-align:center;margin-top:10px'><div class='loader'></div><div style='color:#94a3b8;margin-top:8px'>Analyzing...</div></div>", unsafe_allow_html=True)
+
+            features = single_row(Pregnancies=pregnancies, Glucose=glucose, BloodPressure=blood_pressure,
+                                  SkinThickness=skin_thickness, Insulin=insulin, BMI=bmi,
+                                  DiabetesPedigreeFunction=dpf, Age=age)
+            # label and probability from one pass; repeat patients are served from the cache
+            pred, prob, contributions = None, None, None
             try:
-                pred = model.predict(features)[0]
+                labels, probs = prediction_cache.predict(model_key, model, features, preprocessor)
+                pred = labels[0]
+                prob = probs[0] if probs is not None else None
+                st.session_state.last_prediction_id = prediction_log.log(labels, probs, model_key, "single", features=features)
+                st.session_state.last_features = features
             except Exception as e:
                 st.error(f"Model prediction failed: {e}")
-                pred = None
-
-            prob = None
-            try:
-                if hasattr(model, "predict_proba"):
-                    prob = model.predict_proba(features)[0][1]
-            except Exception:
-                prob = None
-
-            # display results
             if pred is not None:
-                if pred == 1:
-                    st.markdown("<div class='glass' style='padding:18px;border-left:6px solid #ef4444'>"
-                                f"<div style='font-weight:800;color:#ef4444'>High risk of Diabetes</div>"
-                                f"<div style='color:var(--muted)'>Patient: {patient_name or '—'}</div>"
-                                "</div>", unsafe_allow_html=True)
+                try:
+                    contributions, base, units = explain(model, features, preprocessor, model_key)
+                except Exception:
+                    contributions = None  # the prediction stands even if it can't be explained
+
+            loader.empty()
+
+            with span("render", element="result_card"):
+                # display results
+                if pred is not None:
+                    if pred == 1:
+                        st.markdown("<div class='glass' style='padding:18px;border-left:6px solid #ef4444'>"
+                                    f"<div style='font-weight:800;color:#ef4444'>High risk of Diabetes</div>"
+                                    f"<div style='color:var(--muted)'>Patient: {patient_name or '—'}</div>"
+                                    "</div>", unsafe_allow_html=True)
+                    else:
+                        st.markdown("<div class='glass' style='padding:18px;border-left:6px solid #10b981'>"
+                                    f"<div style='font-weight:800;color:#10b981'>Low risk of Diabetes</div>"
+                                    f"<div style='color:var(--muted)'>Patient: {patient_name or '—'}</div>"
+                                    "</div>", unsafe_allow_html=True)
+
+                    # show probability gauge-like metric
+                    if prob is not None:
+                        pct = prob * 100
+                        st.markdown(f"**Confidence:** {pct:.2f}%")
+                        # visual bar
+                        bar_width = int(pct)
+                        st.markdown(f"<div style='background:#263544;border-radius:10px;padding:3px;width:100%'><div style='width:{bar_width}%;background:linear-gradient(90deg,#06b6d4,#3b82f6);padding:10px;border-radius:8px;text-align:right;color:white;font-weight:700'>{pct:.1f}%</div></div>", unsafe_allow_html=True)
+
+                    # per-feature contributions against the average diabetes.csv patient
+                    if contributions is not None:
+                        factors = ranked(contributions[0], features)
+                        largest = max(abs(c) for _, c, _ in factors) or 1.0
+                        rows = "".join(
+                            "<div style='display:flex;align-items:center;gap:10px;margin:4px 0'>"
+                            f"<div style='width:260px;color:var(--muted)'>{name} = {value:g}</div>"
+                            f"<div style='flex:1'><div style='width:{max(2, int(100 * abs(c) / largest))}%;height:12px;border-radius:6px;"
+                            f"background:{'#ef4444' if c > 0 else '#10b981'}'></div></div>"
+                            f"<div style='width:80px;text-align:right'>{c:+.3f}</div></div>"
+                            for name, c, value in factors)
+                        st.markdown("<div class='glass' style='padding:14px;margin-top:10px'>"
+                                    "<div style='font-weight:700;margin-bottom:6px'>What drove this prediction</div>"
+                                    f"<div style='color:var(--muted);font-size:13px;margin-bottom:8px'>Red raises the risk, green lowers it "
+                                    f"({units}, relative to an average patient at {base:+.3f}).</div>"
+                                    f"{rows}</div>", unsafe_allow_html=True)
                 else:
-                    st.markdown("<div class='glass' style='padding:18px;border-left:6px solid #10b981'>"
-                                f"<div style='font-weight:800;color:#10b981'>Low risk of Diabetes</div>"
-                                f"<div style='color:var(--muted)'>Patient: {patient_name or '—'}</div>"
-                                "</div>", unsafe_allow_html=True)
-
-                # show probability gauge-like metric
-                if prob is not None:
-                    pct = prob * 100
-                    st.markdown(f"**Confidence:** {pct:.2f}%")
-                    # visual bar
-                    bar_width = int(pct)
-                    st.markdown(f"<div style='background:#263544;border-radius:10px;padding:3px;width:100%'><div style='width:{bar_width}%;background:linear-gradient(90deg,#06b6d4,#3b82f6);padding:10px;border-radius:8px;text-align:right;color:white;font-weight:700'>{pct:.1f}%</div></div>", unsafe_allow_html=True)
-            else:
-                st.warning("Prediction could not be completed.")
+                    st.warning("Prediction could not be completed.")
+
+        # confirmed outcomes feed the live accuracy shown on Home (and, optionally, the online learner)
+        if st.session_state.get("last_prediction_id") is not None:
+            with st.expander("Record confirmed outcome for the last prediction"):
+                outcome = st.radio("Confirmed diagnosis", ["Non-Diabetic", "Diabetic"], horizontal=True)
+                train_online = st.checkbox("Also update the online learner with this outcome",
+                                           value=get_learner().latest_name() is not None,
+                                           disabled=get_learner().latest_name() is None)
+                if st.button("Save outcome"):
+                    label = 1 if outcome == "Diabetic" else 0
+                    prediction_log.record_outcome(st.session_state.last_prediction_id, label)
+                    st.success("Outcome recorded.")
+                    if train_online and st.session_state.get("last_features") is not None:
+                        path = get_learner().update(st.session_state.last_features, [label], source="app")
+                        if path:
+                            st.success(f"Online learner updated ({get_learner().latest_name()}).")
 
 # -------------------- DATA INSIGHTS --------------------
 elif page == "Data Insights":
     st.markdown("### Data Insights", unsafe_allow_html=True)
-    st.markdown("<div class='glass'>Visualizations provided here are static images produced during model development. Replace them by putting updated images in the app folder or the images/ subfolder.</div>", unsafe_allow_html=True)
+    st.markdown("<div class='glass'>Visualizations are computed from diabetes.csv and the active model, and rebuilt automatically when either changes.</div>", unsafe_allow_html=True)
     st.write("")
+    insights = cached_insights(active_key()) or get_insights(*active_version())
+    c_feature, c_heatmap, c_pairplot = (insights["images"].get(name) for name in ("feature_importance", "heatmap", "pairplot"))
 
     # three image columns with captions
     a,b,c = st.columns(3)
@@ -368,8 +320,54 @@ elif page == "Data Insights":
             if candidate:
                 st.image(candidate, caption=caption, use_container_width=True)
             else:
-                st.markdown(f"<div style='padding:40px;text-align:center;color:#94a3b8'>No image found for <b>{caption}</b><br><small>Place file in app folder or /images</small></div>", unsafe_allow_html=True)
+                st.markdown(f"<div style='padding:40px;text-align:center;color:#94a3b8'>No <b>{caption}</b> available<br><small>The active model does not expose coefficients or importances</small></div>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
 
+    st.write("")
+    st.markdown(f"#### Summary statistics ({insights['rows']:,} records)", unsafe_allow_html=True)
+    with span("render", element="dataframe"):
+        st.dataframe(insights["summary"], hide_index=True)
+
+    # drift of scored patients against diabetes.csv, from the prediction log's per-day aggregates (drift.py)
+    st.write("")
+    st.markdown("#### Drift of scored patients", unsafe_allow_html=True)
+    days = st.selectbox("Window", [1, 7, 30, 90], index=2, format_func=lambda d: f"Last {d} days", key="drift_days")
+    drift_report = prediction_log.drift_report(days)
+    if not drift_report["rows"]:
+        st.info("No scored patients in this window yet.")
+    else:
+        st.caption(f"{drift_report['rows']:,} patients scored in the last {days} days, compared with diabetes.csv. PSI below {PSI_WATCH} is stable, {PSI_WATCH}-{PSI_DRIFT} worth watching, {PSI_DRIFT} or more a shift; KS is flagged when it exceeds the 5% critical value.")
+        drifted = [f["feature"] for f in drift_report["features"] if f["status"] == "drift"]
+        if drifted:
+            st.warning(f"Distribution shift in {', '.join(drifted)}.")
+        table = [{
+            "Feature": f["feature"],
+            "Status": f["status"],
+            "PSI": round(f["psi"], 3),
+            "KS": f"{f['ks']:.3f}" + (" *" if f["ks"] > f["ks_critical"] else ""),
+            "Zero rate": None if f["zero_rate"] is None else f"{f['zero_rate']:.1%}",
+            "Baseline zero rate": f"{f['baseline_zero_rate']:.1%}",
+            "Mean": None if f["mean"] is None else round(f["mean"], 2),
+            "Baseline mean": round(f["baseline_mean"], 2),
+            "Median (approx.)": None if f["median"] is None else round(f["median"], 2),
+            "Baseline median": f["baseline_median"],
+        } for f in drift_report["features"]]
+        with span("render", element="dataframe"):
+            st.dataframe(table, hide_index=True)
+        points = [p for p in prediction_log.drift_timeline(days) if p["psi"] is not None]
+        if points:
+            import pandas as pd
+            psi_by_day = pd.DataFrame(points).pivot(index="day", columns="feature", values="psi")
+            st.markdown("PSI per day", unsafe_allow_html=True)
+            st.line_chart(psi_by_day, height=260)
+
 # -------------------- Footer --------------------
 st.markdown("<div class='footer'>Made with ❤️ by Anshul Gupta • ©— Diabetes Prediction System</div>".format(year=datetime.now().year), unsafe_allow_html=True)
+
+observe("page_render", time.perf_counter() - run_started, app="app.py", page=page)
+if profiler is not None:
+    with st.expander(f"Profile of this run ({profiler.stop().kind}, {profiler.seconds * 1000:.0f}ms)"):
+        st.code(profiler.report())
+export_from_env()
+# warm the bundled model now that the first render is out
+registry.preload_bundled()
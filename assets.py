@@ -0,0 +1,193 @@
+"""
+Static page assets for the two Streamlit apps.
+
+Streamlit re-executes the app script on every interaction, but imported
+modules run once per process, so the CSS lives here as constants and the
+per-theme head snippet is built once per theme.
+"""
+from functools import lru_cache
+
+# app.py: glass cards, dark/light backgrounds keyed on data-theme
+PREMIUM_CSS = """
+<style>
+:root {
+  --accent: #06b6d4;
+  --muted: #94a3b8;
+  --glass: rgba(255,255,255,0.06);
+  --glass-strong: rgba(255,255,255,0.10);
+  --card-radius: 16px;
+  --card-padding: 20px;
+}
+
+/* Page backgrounds */
+body[data-theme="dark"] .stApp {
+  background: linear-gradient(135deg,#081129 0%, #0f172a 100%);
+  color: #e6eef8;
+}
+body[data-theme="light"] .stApp {
+  background: linear-gradient(135deg,#f8fafc 0%, #f1f5f9 100%);
+  color: #0f172a;
+}
+
+/* Title */
+.header-title {
+  font-size: 44px;
+  font-weight: 900;
+  letter-spacing: -1px;
+  margin-bottom: -6px;
+  background: linear-gradient(90deg,#7c3aed,#06b6d4);
+  -webkit-background-clip: text;
+  -webkit-text-fill-color: transparent;
+}
+
+/* Subtitle */
+.header-sub {
+  font-size: 15px;
+  color: var(--muted);
+  margin-bottom: 12px;
+}
+
+/* Glass card */
+.glass {
+  padding: var(--card-padding);
+  border-radius: var(--card-radius);
+  background: var(--glass);
+  border: 1px solid rgba(255,255,255,0.06);
+  backdrop-filter: blur(8px);
+  transition: transform .25s ease, box-shadow .25s ease;
+}
+.glass:hover {
+  transform: translateY(-6px);
+  box-shadow: 0 10px 30px rgba(2,6,23,0.5);
+}
+
+/* Card headers */
+.card-h {
+  font-size:18px;
+  font-weight:700;
+  margin-bottom:6px;
+}
+
+/* Metrics */
+.metric {
+  display:flex; align-items:center; justify-content:space-between;
+  gap:10px;
+}
+.metric .value {
+  font-size:26px; font-weight:800;
+}
+.metric .label {
+  color:var(--muted); font-size:13px;
+}
+
+/* Image hover zoom */
+.img-card {
+  overflow:hidden;
+  border-radius:12px;
+}
+.img-card img {
+  transition: transform 0.6s ease;
+  width:100%;
+  height:auto;
+  display:block;
+}
+.img-card:hover img { transform: scale(1.06); }
+
+/* Glowing primary button (we style anchor-looking button for control) */
+.primary-btn {
+  display:inline-block;
+  padding:10px 18px;
+  border-radius:12px;
+  background: linear-gradient(90deg,#06b6d4,#3b82f6);
+  color:white !important;
+  font-weight:700;
+  text-decoration:none;
+  transition: transform .15s ease;
+  box-shadow: 0 6px 20px rgba(59,130,246,0.18);
+}
+.primary-btn:hover { transform: translateY(-3px); }
+
+/* Small loader heart */
+.loader {
+  display:inline-block;
+  width:42px;
+  height:42px;
+  border-radius:50%;
+  background: radial-gradient(circle at 30% 30%, #fff 0%, rgba(255,255,255,0.1) 30%, transparent 31%),
+              linear-gradient(90deg,#ef4444,#fb923c);
+  animation: pulse 1s infinite;
+}
+@keyframes pulse {
+  0% { transform: scale(1); opacity: .95;}
+  50% { transform: scale(1.12); opacity: .7;}
+  100% { transform: scale(1); opacity: .95;}
+}
+
+/* Footer */
+.footer {
+  color: var(--muted);
+  font-size:13px;
+  margin-top:20px;
+  text-align:center;
+}
+</style>
+"""
+
+# final_diabetes_app.py
+CLASSIC_CSS = """
+    <style>
+        body {
+            background-color: #0f192d;
+        }
+        .main {
+            background-color: #0f192d;
+        }
+        .title {
+            color: #4fd6c8;
+            font-size: 40px;
+            font-weight: 800;
+            text-align: center;
+            margin-bottom: 10px;
+        }
+        .subtitle {
+            color: white;
+            font-size: 18px;
+            text-align: center;
+            margin-bottom: 30px;
+        }
+        .card {
+            background: rgba(255, 255, 255, 0.08);
+            padding: 20px;
+            border-radius: 15px;
+            border: 1px solid #4fd6c8;
+            margin-bottom: 15px;
+        }
+        .stButton>button {
+            background-color: #4fd6c8;
+            color: black;
+            width: 100%;
+            border-radius: 10px;
+            height: 45px;
+            font-size: 18px;
+        }
+        .stTabs [role="tab"] {
+            background-color: #1b2b45;
+            color: white;
+        }
+        .stTabs [role="tab"][aria-selected="true"] {
+            background-color: #4fd6c8;
+            color: black;
+        }
+    </style>
+"""
+
+
+@lru_cache(maxsize=None)
+def premium_head(theme):
+    """PREMIUM_CSS plus a small script that sets the data-theme attribute the CSS keys on."""
+    return PREMIUM_CSS + f"""
+<script>
+const theme = "{theme}";
+document.documentElement.setAttribute('data-theme', theme);
+</script>
+"""
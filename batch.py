@@ -0,0 +1,140 @@
+"""
+Streaming batch scoring for large uploads (CSV, Parquet, Arrow IPC, .npy).
+
+The uploaded file is never materialised as a whole: rows are read in
+fixed-size chunks, each chunk is scored as one NumPy block and appended to
+the output file (a background job's, see jobs.py), so peak memory depends on the chunk size and not on the
+number of rows in the upload. Binary formats skip text parsing entirely; see
+columnar.py.
+"""
+import time
+
+import numpy as np
+
+import columnar
+import validation
+from explain import explainer_for
+from scoring import DEFAULT_CHUNK_ROWS, predict_unique
+
+
+def _source_size(source):
+    size = getattr(source, "size", None)
+    if size is not None:
+        return size
+    try:
+        pos = source.tell()
+        source.seek(0, 2)
+        size = source.tell()
+        source.seek(pos)
+        return size
+    except Exception:
+        return None
+
+
+def score_block(block, model, preprocessor=None, explainer=None):
+    """
+    Validates and scores one block from columnar.iter_blocks(). Returns
+    (X, codes, labels, proba, messages, contributions): labels are
+    INVALID_LABEL and proba NaN for rows failing validation (proba is None
+    when the model has no probabilities), messages holds the reason ("" for
+    valid rows), and contributions is None unless an `explainer` is given.
+    """
+    X, not_numeric = columnar.feature_matrix(block)
+    codes = validation.check(X, not_numeric)
+    valid = ~codes.any(axis=1)
+    if valid.all():
+        preds, proba = predict_unique(model, X, preprocessor)
+        messages = np.full(len(X), "", dtype=object)
+    else:
+        preds = np.full(len(X), columnar.INVALID_LABEL, dtype=np.int64)
+        proba = np.full(len(X), np.nan)
+        if valid.any():
+            valid_preds, valid_proba = predict_unique(model, X[valid], preprocessor)
+            preds[valid] = valid_preds
+            if valid_proba is None:
+                proba = None
+            else:
+                proba[valid] = valid_proba
+        messages = validation.row_messages(codes, X)
+    contributions = None
+    if explainer is not None:
+        contributions = np.full(X.shape, np.nan, dtype=np.float32)
+        if valid.any():
+            contributions[valid] = explainer.explain(X if valid.all() else X[valid])
+    return X, codes, preds, proba, messages, contributions
+
+
+def iter_score(source, model, out, fmt="csv", out_fmt=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+               preprocessor=None, prediction_log=None, model_key=None, explain=False, results=None):
+    """
+    Scores `source` (in batch format `fmt`, see columnar.FORMATS) chunk by
+    chunk, writing results to the binary file `out` in `out_fmt` (default:
+    same as the input) as they are produced. With `prediction_log`, each
+    chunk is appended to it in one bulk insert (an Outcome column, if
+    present, is logged as the confirmed outcome).
+
+    Rows failing validation.py's checks are not scored: they are written with
+    Prediction "Invalid" (-1 in binary outputs) and the reason in a Validation
+    column, and counted in the report instead of failing the file. Missing
+    feature columns still raise KeyError.
+
+    With `explain`, every scored row also gets one <feature>_contribution
+    column per feature (see explain.py; NaN for invalid rows).
+
+    With `results` (a results.BatchResults), every block is also appended to
+    its on-disk columns for paginated viewing; it is closed when scoring finishes.
+
+    Yields a progress dict after every chunk:
+        rows, chunks, elapsed, rows_per_sec, fraction (None if size unknown),
+        preview (first scored chunk, only on the first yield), positives,
+        invalid_rows, validation (ValidationReport, updated in place).
+    """
+    total = columnar.row_count(source, fmt)
+    size = _source_size(source) if total is None else None
+    writer = columnar.BlockWriter(out, out_fmt or fmt, explained=explain)
+    explainer = explainer_for(model, preprocessor) if explain else None
+    report = validation.ValidationReport()
+    started = time.perf_counter()
+    rows = positives = 0
+    for n, block in enumerate(columnar.iter_blocks(source, fmt, chunk_rows)):
+        if n == 0:
+            report.notes = validation.check_columns(columnar.column_names(block))
+        X, codes, preds, proba, messages, contributions = score_block(block, model, preprocessor, explainer)
+        valid = report.add(codes, X)
+        outcomes = columnar.outcomes_of(block)
+        if prediction_log is not None and valid.any():
+            prediction_log.log(preds[valid], None if proba is None else proba[valid], model_key, "batch",
+                               None if outcomes is None else outcomes[valid], features=X[valid])
+        preview = None
+        if n == 0:
+            preview = columnar.to_frame(columnar.head(block, 100), preds[:100],
+                                        None if proba is None else proba[:100], messages[:100],
+                                        None if contributions is None else contributions[:100])
+        writer.write(block, preds, proba, messages, contributions)
+        if results is not None:
+            results.add(X, preds, proba, messages)
+        rows += len(preds)
+        positives += int((preds == 1).sum())
+        elapsed = time.perf_counter() - started
+        fraction = None
+        if total:
+            fraction = min(rows / total, 1.0)
+        elif size:
+            try:
+                fraction = min(source.tell() / size, 1.0)
+            except Exception:
+                fraction = None
+        yield {
+            "rows": rows,
+            "chunks": n + 1,
+            "elapsed": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+            "fraction": fraction,
+            "positives": positives,
+            "preview": preview,
+            "invalid_rows": report.invalid_rows,
+            "validation": report,
+        }
+    writer.close()
+    if results is not None:
+        results.close()
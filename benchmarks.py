@@ -0,0 +1,359 @@
+"""
+Reproducible benchmarks for the scoring paths.
+
+    python benchmarks.py -o bench.json                      # 1k / 100k / 10M batch rows
+    python benchmarks.py --sizes 1000,100000 -o bench.json
+    python benchmarks.py --sizes 1000,100000 --compare bench.json
+    python benchmarks.py --apps-only --check-budget           # Streamlit cold start / rerun budget
+
+Cases
+    load            deserialising model.pkl / scaler.pkl (the registry's miss path) and
+                    the bundled model's compact .npmodel variants (compact.py)
+    single          one patient through app.py's Patient Prediction path
+                    (single_row -> prediction cache miss / hit)
+    batch:<n>       final_diabetes_app.py's Batch Prediction path end to end: a jobs.py job
+                    over n synthetic rows, from submit (input copy) to done (spawned worker,
+                    CSV output, paged results, prediction log); peak RSS is the worker's,
+                    and each size runs in a fresh process so it is per case
+    csv_read:<n>    chunked CSV parse alone
+    csv_write:<n>   CSV export of scored chunks alone
+    app:<script>    cold start of each Streamlit app (fresh interpreter -> first script
+                    run done, via streamlit's AppTest) and the cost of a rerun
+
+Synthetic rows are bootstrapped from diabetes.csv with small per-column
+jitter, so value ranges and zero rates follow the real data. Results are
+written as JSON; --compare exits non-zero when a timing regresses by more
+than --threshold against an earlier run, --check-budget when an app exceeds
+APP_BUDGETS.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from scoring import APP_DIR, DATA_PATH, FEATURES, load_data, single_row
+
+DEFAULT_SIZES = [1_000, 100_000, 10_000_000]
+INTEGER_COLUMNS = ["Pregnancies", "Glucose", "BloodPressure", "SkinThickness", "Insulin", "Age", "Outcome"]
+SEED = 1234
+
+APP_SCRIPTS = ["app.py", "final_diabetes_app.py"]
+# per-app limits checked by --check-budget (about 2x the times measured on a 1-CPU container)
+APP_BUDGETS = {
+    "app.py": {"cold_start_ms": 1500, "p50_ms": 100},
+    "final_diabetes_app.py": {"cold_start_ms": 1200, "p50_ms": 60},
+}
+# modules that should only load on the pages that use them
+HEAVY_MODULES = ["pandas", "sklearn", "matplotlib", "pyarrow"]
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timings(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    first = samples[0]
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "first_ms": 1000 * first,
+        "mean_ms": 1000 * statistics.fmean(samples),
+        "p50_ms": 1000 * samples[len(samples) // 2],
+        "p99_ms": 1000 * samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+# -------------------- Synthetic data --------------------
+def write_synthetic_csv(path, rows, chunk_rows=500_000, seed=SEED):
+    """Writes `rows` rows resampled from diabetes.csv with ~5% per-column jitter."""
+    import pandas as pd
+    X, y = load_data(DATA_PATH)
+    values = np.column_stack([X, y])
+    columns = FEATURES + ["Outcome"]
+    std = values.std(axis=0) * 0.05
+    int_mask = np.array([c in INTEGER_COLUMNS for c in columns])
+    outcome = columns.index("Outcome")
+    rng = np.random.default_rng(seed)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        sample = values[rng.integers(0, len(values), n)]
+        jittered = np.clip(sample + rng.normal(0.0, 1.0, sample.shape) * std, 0.0, None)
+        # keep "missing" zeros as zeros and the label untouched
+        jittered = np.where(sample == 0, 0.0, jittered)
+        jittered[:, outcome] = sample[:, outcome]
+        jittered[:, int_mask] = np.round(jittered[:, int_mask])
+        pd.DataFrame(jittered, columns=columns).astype(
+            {c: "int64" for c in INTEGER_COLUMNS}).to_csv(
+            path, mode="w" if written == 0 else "a", header=written == 0, index=False, float_format="%.3f")
+        written += n
+    return path
+
+
+# -------------------- Cases --------------------
+def bench_load(repeat=20):
+    from registry import BUNDLED_MODEL, BUNDLED_SCALER, deserialize, get_registry
+    results = []
+    for name, path in (("model.pkl", BUNDLED_MODEL), ("scaler.pkl", BUNDLED_SCALER)):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        results.append({"case": f"load:{name}", "bytes": len(data), **_timings(lambda: deserialize(data), repeat)})
+    if os.path.exists(BUNDLED_MODEL):
+        import compact
+        version = get_registry().load_files(BUNDLED_MODEL, BUNDLED_SCALER)
+        for dtype in compact.DTYPES:
+            try:
+                data = compact.export(version.model, version.preprocessor, dtype)[0]
+            except ValueError:
+                break
+            results.append({"case": f"load:model.{dtype}.npmodel", "bytes": len(data),
+                            **_timings(lambda: deserialize(data), repeat)})
+    return results
+
+
+def bench_single(repeat=2000):
+    from prediction_cache import PredictionCache
+    from registry import get_registry
+
+    version = get_registry().bundled()
+    rows = [dict(zip(FEATURES, row)) for row in load_data(DATA_PATH)[0].tolist()]
+    cache = PredictionCache(max_entries=len(rows) * 4)
+    counter = iter(range(10 ** 9))
+
+    def miss():
+        # a never-seen patient: Age is bumped so every call misses the cache
+        i = next(counter)
+        values = dict(rows[i % len(rows)])
+        values["Age"] = values["Age"] + i * 1e-3
+        cache.predict(version.key, version.model, single_row(**values), version.preprocessor)
+
+    def hit():
+        cache.predict(version.key, version.model, single_row(**rows[0]), version.preprocessor)
+
+    hit()
+    return [
+        {"case": "single:cache_miss", **_timings(miss, repeat)},
+        {"case": "single:cache_hit", **_timings(hit, repeat)},
+    ]
+
+
+def _batch_child(csv_path, rows, workdir, queue):
+    # the job and its prediction log live in the benchmark's temp dir, not next to the app
+    root = os.path.join(workdir, f"jobs_{rows}")
+    os.environ["DIABETES_PREDICTION_LOG"] = os.path.join(workdir, f"predictions_{rows}.db")
+    import jobs
+    from registry import get_registry
+    version = get_registry().bundled()
+    job_queue = jobs.JobQueue(root, workers=1)
+    started = time.perf_counter()
+    job_id = job_queue.submit(csv_path, os.path.basename(csv_path), version.key, "csv", "csv")
+    while job_queue.get(job_id)["status"] in jobs.ACTIVE:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    # reaps the worker, so RUSAGE_CHILDREN covers its peak
+    job_queue.shutdown()
+    job = job_queue.get(job_id)
+    queue.put({
+        "case": f"batch:{rows}",
+        "status": job["status"],
+        "error": job["error"],
+        "rows": job["rows"],
+        "seconds": elapsed,
+        "scoring_seconds": job["finished"] - job["started"],
+        "rows_per_sec": job["rows"] / elapsed,
+        "submitter_rss_mb": _peak_rss_mb(),
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    })
+
+
+def bench_batch(csv_path, rows, workdir):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_batch_child, args=(csv_path, rows, workdir, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return [result]
+
+
+def bench_csv_io(csv_path, rows):
+    import pandas as pd
+    from scoring import DEFAULT_CHUNK_ROWS
+
+    started = time.perf_counter()
+    for _ in pd.read_csv(csv_path, chunksize=DEFAULT_CHUNK_ROWS):
+        pass
+    read_s = time.perf_counter() - started
+
+    # export cost measured on a single chunk, scaled to the full size
+    sample = pd.read_csv(csv_path, nrows=min(rows, DEFAULT_CHUNK_ROWS))
+    sample["Prediction"] = np.where(sample["Outcome"] == 1, "Diabetic", "Non-Diabetic")
+    with tempfile.TemporaryFile(mode="w+b") as out:
+        started = time.perf_counter()
+        sample.to_csv(out, index=False)
+        write_s = (time.perf_counter() - started) * rows / len(sample)
+    return [
+        {"case": f"csv_read:{rows}", "seconds": read_s, "rows_per_sec": rows / read_s},
+        {"case": f"csv_write:{rows}", "seconds": write_s, "rows_per_sec": rows / write_s, "extrapolated": len(sample) < rows},
+    ]
+
+
+def _app_child(script, reruns, queue):
+    import logging
+    import warnings
+    warnings.simplefilter("ignore")
+    logging.disable(logging.CRITICAL)
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(APP_DIR, script), default_timeout=120).run()
+    cold_ms = 1000 * (time.perf_counter() - started)
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    queue.put({
+        "case": f"app:{script}",
+        "cold_start_ms": cold_ms,
+        "heavy_modules_on_start": loaded,
+        "errors": [str(e.value) for e in at.exception],
+        **_timings(at.run, reruns),
+    })
+
+
+def bench_apps(reruns=20):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for script in APP_SCRIPTS:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_app_child, args=(script, reruns, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+    return results
+
+
+def check_budgets(results, budgets=APP_BUDGETS, timings=True):
+    """
+    Returns a list of budget violations (empty if none): script errors, heavy
+    modules imported by the first render and, with `timings`, APP_BUDGETS.
+    Only the module check is deterministic; wall-clock timings depend on the machine.
+    """
+    violations = []
+    for r in results:
+        budget = budgets.get(r["case"].split(":", 1)[1]) if r["case"].startswith("app:") else None
+        for key, limit in (budget or {}).items() if timings else ():
+            if r[key] > limit:
+                violations.append(f"{r['case']}: {key} {r[key]:.0f} > budget {limit}")
+        if r.get("heavy_modules_on_start"):
+            violations.append(f"{r['case']}: first render imported {', '.join(r['heavy_modules_on_start'])}")
+        if r.get("errors"):
+            violations.append(f"{r['case']}: script raised {r['errors']}")
+    return violations
+
+
+# -------------------- Reporting --------------------
+def environment():
+    def version_of(module):
+        try:
+            return __import__(module).__version__
+        except Exception:
+            return None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": version_of("numpy"),
+        "pandas": version_of("pandas"),
+        "sklearn": version_of("sklearn"),
+    }
+
+
+TIMING_KEYS = ("p50_ms", "seconds", "cold_start_ms")
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of regression messages (empty if none)."""
+    previous = {r["case"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get(r["case"])
+        if old is None:
+            continue
+        for key in TIMING_KEYS:
+            if key in r and key in old and old[key] > 0 and r[key] > old[key] * (1 + threshold):
+                regressions.append(f"{r['case']}: {key} {old[key]:.4g} -> {r[key]:.4g}")
+    return regressions
+
+
+def run(sizes, workdir, repeat_single=2000, apps_only=False):
+    results = bench_apps()
+    if apps_only:
+        return results
+    results += bench_load() + bench_single(repeat_single)
+    for rows in sizes:
+        csv_path = os.path.join(workdir, f"synthetic_{rows}.csv")
+        write_synthetic_csv(csv_path, rows)
+        results += bench_batch(csv_path, rows, workdir)
+        results += bench_csv_io(csv_path, rows)
+        os.remove(csv_path)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model loading, single and batch scoring.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated batch sizes in rows")
+    parser.add_argument("-o", "--output", default=None, help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument("--workdir", default=None, help="where synthetic CSVs are written (default: temp dir)")
+    parser.add_argument("--apps-only", action="store_true", help="only measure Streamlit cold start and reruns")
+    parser.add_argument("--check-budget", action="store_true", help="fail if an app exceeds APP_BUDGETS")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        report = {"environment": environment(), "results": run(sizes, workdir, apps_only=args.apps_only)}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failures = []
+    if args.compare:
+        with open(args.compare) as f:
+            failures += [f"REGRESSION {line}" for line in compare(report["results"], json.load(f), args.threshold)]
+    if args.check_budget:
+        failures += [f"OVER BUDGET {line}" for line in check_budgets(report["results"])]
+    for line in failures:
+        print(line, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
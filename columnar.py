@@ -0,0 +1,375 @@
+"""
+Columnar batch input and output: Parquet, Arrow IPC and raw .npy matrices.
+
+Text parsing and formatting dominate CSV batch runs, so the batch path also
+accepts binary formats and reads them without a text round-trip:
+
+    .npy               (n, 8) float matrix in FEATURES order; memory-mapped
+                       from disk, or viewed in place over an uploaded buffer
+    .arrow / .feather  Arrow IPC file, memory-mapped / read zero-copy
+    .parquet           read row group by row group
+
+Blocks come back as pandas DataFrames (CSV), pyarrow RecordBatches
+(Parquet/Arrow) or NumPy arrays (.npy). Results are written with
+float32 features, int8 labels and float32 probabilities (plus float32
+per-feature contributions when the batch is explained, see explain.py).
+"""
+import io
+import os
+
+import numpy as np
+
+import validation
+from explain import CONTRIBUTION_COLUMNS
+from metrics import get_metrics, span
+from scoring import FEATURES
+
+FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".npy": "npy",
+}
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "npy": ".npy"}
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "npy": "application/octet-stream",
+}
+
+FEATURE_DTYPE = np.float32
+# one record per scored row in .npy output
+RESULT_DTYPE = np.dtype([("label", "i1"), ("probability", "<f4")])
+EXPLAINED_DTYPE = np.dtype(RESULT_DTYPE.descr + [(name, "<f4") for name in CONTRIBUTION_COLUMNS])
+# minimum .npy header size; the row count is patched in after streaming
+NPY_HEADER_BYTES = 128
+
+PREDICTION_NAMES = np.array(["Non-Diabetic", "Diabetic"], dtype=object)
+# label written for rows that failed validation
+INVALID_LABEL = -1
+INVALID_NAME = "Invalid"
+
+
+def format_for(name):
+    """Batch format from a file name; unknown extensions are treated as CSV."""
+    return FORMATS.get(os.path.splitext(str(name))[1].lower(), "csv")
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def _buffer(source):
+    """Zero-copy view over an in-memory upload (Streamlit UploadedFile, BytesIO), else None."""
+    getbuffer = getattr(source, "getbuffer", None)
+    return getbuffer() if getbuffer is not None else None
+
+
+# -------------------- Readers --------------------
+def open_npy(source):
+    """
+    Returns the (n, 8) feature matrix of a .npy file without copying it:
+    memory-mapped for paths, a view over the upload's buffer otherwise.
+    """
+    if _is_path(source):
+        X = np.load(source, mmap_mode="r")
+    else:
+        buf = _buffer(source)
+        if buf is None:
+            X = np.load(source)
+        else:
+            header = io.BytesIO(bytes(buf[:4096]))
+            version = np.lib.format.read_magic(header)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran_order, dtype = read_header(header)
+            count = int(np.prod(shape))
+            X = np.frombuffer(buf, dtype=dtype, count=count, offset=header.tell())
+            X = X.reshape(shape, order="F" if fortran_order else "C")
+    if X.ndim != 2 or X.shape[1] != len(FEATURES):
+        raise ValueError(f"Expected an (n, {len(FEATURES)}) matrix in the order {FEATURES}, got shape {X.shape}")
+    return X
+
+
+def _arrow_source(source):
+    import pyarrow as pa
+    if _is_path(source):
+        return pa.memory_map(str(source))
+    buf = _buffer(source)
+    return pa.BufferReader(pa.py_buffer(buf if buf is not None else source.read()))
+
+
+def _iter_arrow_batches(source):
+    import pyarrow as pa
+    src = _arrow_source(source)
+    try:
+        reader = pa.ipc.open_file(src)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    except pa.ArrowInvalid:
+        # not the IPC file format: try the streaming format
+        src.seek(0)
+        yield from pa.ipc.open_stream(src)
+
+
+def _parquet_file(source):
+    import pyarrow.parquet as pq
+    if _is_path(source):
+        return pq.ParquetFile(str(source), memory_map=True)
+    return pq.ParquetFile(_arrow_source(source))
+
+
+def row_count(source, fmt):
+    """Total rows when the format records it up front (not CSV)."""
+    if fmt == "npy":
+        return len(open_npy(source))
+    if fmt == "parquet":
+        return _parquet_file(source).metadata.num_rows
+    if fmt == "arrow":
+        return sum(batch.num_rows for batch in _iter_arrow_batches(source))
+    return None
+
+
+def iter_blocks(source, fmt, chunk_rows):
+    """Yields blocks of at most `chunk_rows` rows from `source` (each read timed as a batch_parse span)."""
+    return get_metrics().timed_iter(_iter_blocks(source, fmt, chunk_rows), "batch_parse", format=fmt)
+
+
+def _iter_blocks(source, fmt, chunk_rows):
+    if fmt == "npy":
+        X = open_npy(source)
+        for start in range(0, len(X), chunk_rows):
+            yield X[start:start + chunk_rows]
+    elif fmt == "parquet":
+        yield from _parquet_file(source).iter_batches(batch_size=chunk_rows)
+    elif fmt == "arrow":
+        for batch in _iter_arrow_batches(source):
+            for start in range(0, batch.num_rows, chunk_rows):
+                yield batch.slice(start, chunk_rows)
+    else:
+        import pandas as pd
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+
+
+def column_names(block):
+    if isinstance(block, np.ndarray):
+        return list(FEATURES)
+    return list(block.schema.names) if hasattr(block, "schema") else list(block.columns)
+
+
+def _coerce(values):
+    """Float array from a column of any type: (values, mask of entries that were not numbers)."""
+    import pandas as pd
+    values = pd.Series(values)
+    coerced = pd.to_numeric(values, errors="coerce")
+    return coerced.to_numpy(dtype=np.float64), (coerced.isna() & values.notna()).to_numpy()
+
+
+def feature_matrix(block):
+    """
+    (X, not_numeric) for any block type: X is the (n, 8) model input in
+    FEATURES order with NaN for empty cells (float32 for .npy and Arrow
+    blocks), not_numeric marks cells that held something other than a
+    number (None when every column is numeric). Missing columns raise KeyError.
+    """
+    if isinstance(block, np.ndarray):
+        return block, None
+    validation.check_columns(column_names(block))
+    not_numeric = None
+    if hasattr(block, "schema"):
+        import pyarrow as pa
+        X = np.empty((block.num_rows, len(FEATURES)), dtype=FEATURE_DTYPE)
+        columns = [block.column(name) for name in FEATURES]
+    else:
+        X = np.empty((len(block), len(FEATURES)), dtype=np.float64)
+        columns = [block[name] for name in FEATURES]
+    for j, column in enumerate(columns):
+        if hasattr(column, "type"):
+            numeric = pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+            values = column.to_numpy(zero_copy_only=False) if numeric else column.to_pylist()
+        else:
+            numeric = column.dtype.kind in "biuf"
+            values = column.to_numpy()
+        if numeric:
+            X[:, j] = values
+            continue
+        X[:, j], bad = _coerce(values)
+        if bad.any():
+            if not_numeric is None:
+                not_numeric = np.zeros(X.shape, dtype=bool)
+            not_numeric[:, j] = bad
+    return X, not_numeric
+
+
+def outcomes_of(block):
+    """The block's Outcome column as a float array (NaN where missing), or None."""
+    if isinstance(block, np.ndarray):
+        return None
+    if hasattr(block, "schema"):
+        if "Outcome" not in block.schema.names:
+            return None
+        return block.column("Outcome").to_numpy(zero_copy_only=False).astype(np.float64)
+    return block["Outcome"].to_numpy(dtype=np.float64) if "Outcome" in block.columns else None
+
+
+def head(block, n):
+    """First `n` rows of a block, detached from it."""
+    if hasattr(block, "schema"):
+        return block.slice(0, n)
+    return block[:n].copy()
+
+
+def prediction_names(labels):
+    """Diabetic / Non-Diabetic / Invalid per label."""
+    labels = np.asarray(labels)
+    names = PREDICTION_NAMES[(labels == 1).astype(np.intp)]
+    invalid = labels == INVALID_LABEL
+    if invalid.any():
+        names[invalid] = INVALID_NAME
+    return names
+
+
+def to_frame(block, labels, proba, messages=None, contributions=None):
+    """
+    pandas view of a scored block (used for previews and CSV output), with a
+    Validation column when `messages` is given and one <feature>_contribution
+    column per feature when `contributions` is. A DataFrame block is not modified.
+    """
+    import pandas as pd
+    if isinstance(block, np.ndarray):
+        df = pd.DataFrame(block, columns=FEATURES)
+    elif hasattr(block, "schema"):
+        df = block.to_pandas()
+    else:
+        df = block.copy(deep=False)
+    df["Prediction"] = prediction_names(labels)
+    if proba is not None:
+        df["Probability"] = np.asarray(proba, dtype=np.float32)
+    if messages is not None:
+        df["Validation"] = messages
+    if contributions is not None:
+        contributions = np.asarray(contributions, dtype=np.float32)
+        for j, name in enumerate(CONTRIBUTION_COLUMNS):
+            df[name] = contributions[:, j]
+    return df
+
+
+def to_arrow(block, labels, proba, messages=None, contributions=None):
+    """
+    Arrow table of a scored block: float32 features, int8 Prediction (-1 for
+    invalid rows), float32 Probability and, with `messages`, a Validation
+    column; with `contributions`, float32 <feature>_contribution columns.
+    """
+    import pyarrow as pa
+    if isinstance(block, np.ndarray):
+        X = np.asarray(block, dtype=FEATURE_DTYPE)
+        table = pa.table({name: X[:, j] for j, name in enumerate(FEATURES)})
+    elif hasattr(block, "schema"):
+        table = pa.Table.from_batches([block])
+    else:
+        import pandas as pd
+        # non-numeric cells become NaN so every chunk writes the same schema
+        features = {c: pd.to_numeric(block[c], errors="coerce").astype(FEATURE_DTYPE) for c in FEATURES}
+        table = pa.Table.from_pandas(block.assign(**features), preserve_index=False).replace_schema_metadata(None)
+    table = table.append_column("Prediction", pa.array(np.asarray(labels).astype(np.int8)))
+    probability = np.full(len(labels), np.nan, dtype=np.float32) if proba is None else np.asarray(proba, np.float32)
+    table = table.append_column("Probability", pa.array(probability))
+    if messages is not None:
+        table = table.append_column("Validation", pa.array(messages, type=pa.string()))
+    if contributions is not None:
+        contributions = np.asarray(contributions, dtype=np.float32)
+        for j, name in enumerate(CONTRIBUTION_COLUMNS):
+            table = table.append_column(name, pa.array(contributions[:, j]))
+    return table
+
+
+# -------------------- Writer --------------------
+def _npy_header(rows, dtype=RESULT_DTYPE):
+    header = np.lib.format.header_data_from_array_1_0(np.empty(0, dtype=dtype))
+    header["shape"] = (rows,)
+    text = repr(header).encode("latin1")
+    prefix = np.lib.format.magic(1, 0)
+    # the size depends only on the dtype (room for a 20-digit row count), so the patched header fits exactly
+    header["shape"] = (0,)
+    room = len(prefix) + 2 + len(repr(header)) + 1 + 20
+    pad = max(NPY_HEADER_BYTES, -(-room // 64) * 64) - len(prefix) - 2 - len(text) - 1
+    return prefix + (len(text) + pad + 1).to_bytes(2, "little") + text + b" " * pad + b"\n"
+
+
+class BlockWriter:
+    """
+    Streams scored blocks to a binary file object in one of the batch formats.
+    With `explained`, every write() passes contributions and .npy records
+    use EXPLAINED_DTYPE.
+    """
+
+    def __init__(self, out, fmt, explained=False):
+        self.out = out
+        self.fmt = fmt
+        self.rows = 0
+        self.dtype = EXPLAINED_DTYPE if explained else RESULT_DTYPE
+        self._writer = None
+        self._schema = None
+        if fmt == "npy":
+            out.write(_npy_header(0, self.dtype))
+
+    def write(self, block, labels, proba, messages=None, contributions=None):
+        """`messages` (one string per row, "" when valid) adds a Validation column to CSV/Parquet/Arrow."""
+        with span("batch_export", format=self.fmt):
+            self._write(block, labels, proba, messages, contributions)
+        self.rows += len(labels)
+
+    def _conform(self, table):
+        """
+        Casts a later block to the schema of the first: a pass-through column
+        (e.g. Outcome) read as int64 turns float64 or null in a chunk with blanks.
+        """
+        import pyarrow as pa
+        schema = self._schema
+        try:
+            return table.select(schema.names).cast(schema)
+        except (KeyError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Columns change type between chunks and can't be written as {self.fmt}: {e}")
+
+    def _write(self, block, labels, proba, messages, contributions):
+        if self.fmt == "npy":
+            records = np.empty(len(labels), dtype=self.dtype)
+            records["label"] = np.asarray(labels).astype(np.int8)
+            records["probability"] = np.nan if proba is None else np.asarray(proba, np.float32)
+            if contributions is not None:
+                for j, name in enumerate(CONTRIBUTION_COLUMNS):
+                    records[name] = contributions[:, j]
+            self.out.write(records.tobytes())
+        elif self.fmt in ("parquet", "arrow"):
+            table = to_arrow(block, labels, proba, messages, contributions)
+            if self._schema is None:
+                self._schema = table.schema
+            elif not table.schema.equals(self._schema):
+                table = self._conform(table)
+            if self._writer is None:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                if self.fmt == "parquet":
+                    self._writer = pq.ParquetWriter(self.out, table.schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.out, table.schema)
+            self._writer.write_table(table)
+        else:
+            # always a Probability column, so every chunk matches the header
+            proba = np.full(len(labels), np.nan) if proba is None else proba
+            to_frame(block, labels, proba, messages, contributions).to_csv(self.out, header=(self.rows == 0), index=False)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self.fmt == "npy":
+            # patch the real row count into the reserved header
+            end = self.out.tell()
+            self.out.seek(0)
+            self.out.write(_npy_header(self.rows, self.dtype))
+            self.out.seek(end)
+        self.out.flush()
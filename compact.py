@@ -0,0 +1,373 @@
+"""
+Compact, pickle-free model files.
+
+A pickled model.pkl ties the app to the sklearn version that wrote it, needs
+sklearn imported and the object graph rebuilt to load, and unpickling an
+uploaded file runs whatever code the file names. A .npmodel file holds only
+numbers and a JSON header:
+
+    magic (8 bytes) | header length (uint32 LE) | JSON header | arrays, 64-byte aligned
+
+The header records the kind of model, its classes, the feature order, the
+preprocessing spec (preprocessing.py) and where each array starts. Loading
+parses the header and maps the arrays in place (np.frombuffer over an mmap or
+the uploaded bytes), so it takes microseconds and copies nothing.
+
+    linear   binary logistic models: weights over the preprocessed inputs and
+             a bias, scored by fastpath.LinearKernel
+    trees    DecisionTree / RandomForest / ExtraTrees classifiers flattened
+             into breadth-first node arrays (feature, threshold, first child,
+             class-1 probability of each leaf) and walked level by level in
+             NumPy, every (row, tree) pair at once
+
+Variants trade size for precision:
+
+    float64  exact
+    float32  float32 weights / leaf probabilities
+    int8     linear weights as int8 with one float32 scale per feature,
+             calibrated on diabetes.csv; leaf probabilities in 1/255 steps
+
+Tree thresholds are float32 in every variant, rounded down so that the
+float32 comparison sklearn itself makes gives the same branch. Each export is
+checked against the original model on diabetes.csv (probability difference,
+label mismatches, accuracy of both) and the result is kept in the header.
+
+    python compact.py export -o model.npmodel --dtype int8
+    python compact.py parity model.npmodel
+    python compact.py info model.npmodel
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from fastpath import LinearKernel, kernel_for
+from preprocessing import Preprocessor
+from scoring import DATA_PATH, FEATURES, load_data
+
+
+MAGIC = b"\x93NPMODEL"
+FORMAT_VERSION = 1
+EXTENSION = ".npmodel"
+ALIGN = 64
+DTYPES = ("float64", "float32", "int8")
+# largest |probability difference| to the original that export accepts, per variant
+TOLERANCES = {"float64": 1e-9, "float32": 1e-5, "int8": 0.02}
+TREE_MODELS = {"DecisionTreeClassifier", "RandomForestClassifier", "ExtraTreesClassifier"}
+# leaf probabilities of int8 files are stored as multiples of 1/LEAF_LEVELS
+LEAF_LEVELS = 255
+# (row, tree) pairs walked at once by the tree kernel
+TREE_BLOCK = 1 << 18
+# levels walked between setting aside the pairs that reached a leaf
+LEAF_CHECK_LEVELS = 4
+
+
+class CompactModel:
+    """
+    A loaded .npmodel. Scores preprocessed inputs like a fitted sklearn
+    classifier (classes_, predict, predict_proba); `preprocessor` is the
+    embedded spec, or None if it was exported without one.
+    """
+    n_features_in_ = len(FEATURES)
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.kind = header["kind"]
+        self.dtype = header["dtype"]
+        self.classes_ = np.asarray(header["classes"])
+        spec = header.get("preprocess")
+        self.preprocessor = Preprocessor.from_dict(spec) if spec else None
+        self.arrays = arrays
+        # picked up by fastpath.kernel_for, so linear files score through the fused kernel
+        self.linear_kernel = None
+        if self.kind == "linear":
+            weights = arrays["weights"].astype(np.float64)
+            if "weight_scale" in arrays:
+                weights *= arrays["weight_scale"]
+            self.linear_kernel = LinearKernel(weights, header["bias"], self.classes_)
+        elif self.kind == "trees":
+            nodes = len(arrays["feature"])
+            for name in ("first_child", "roots"):
+                if len(arrays[name]) and not 0 <= arrays[name].min() <= arrays[name].max() < nodes:
+                    raise ValueError(f"Corrupt model file: {name} points outside the tree")
+            if nodes and not 0 <= arrays["feature"].min() <= arrays["feature"].max() < len(FEATURES):
+                raise ValueError("Corrupt model file: unknown feature index")
+        else:
+            raise ValueError(f"Unsupported model kind {self.kind!r}")
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def _tree_proba(self, X):
+        a = self.arrays
+        X = np.ascontiguousarray(X, dtype=np.float32)  # sklearn trees compare float32 features too
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        roots, first = a["roots"], a["first_child"]
+        quantized = a["value"].dtype == np.uint8
+        total = np.empty(len(X), dtype=np.float64)
+        step = max(1, TREE_BLOCK // max(1, len(roots)))
+        for start in range(0, len(X), step):
+            block = X[start:start + step]
+            flat = block.reshape(-1)
+            # one entry per (row, tree); entries that reached a leaf are set aside every few levels
+            node = np.tile(roots, len(block))
+            offset = np.repeat(np.arange(len(block), dtype=np.int32) * block.shape[1], len(roots))
+            position = np.arange(len(node))
+            leaves = np.empty(len(node), dtype=np.int32)
+            for level in range(self.header["depth"]):
+                right = np.take(flat, offset + np.take(a["feature"], node)) > np.take(a["threshold"], node)
+                node = np.take(first, node) + right
+                if level % LEAF_CHECK_LEVELS == LEAF_CHECK_LEVELS - 1 or level == self.header["depth"] - 1:
+                    done = np.take(first, node) == node
+                    leaves[position[done]] = node[done]
+                    node, offset, position = node[~done], offset[~done], position[~done]
+            leaves[position] = node
+            values = np.take(a["value"], leaves).reshape(len(block), len(roots))
+            total[start:start + len(block)] = values.sum(axis=1, dtype=np.int64 if quantized else np.float64)
+        return total / (len(roots) * (LEAF_LEVELS if quantized else 1))
+
+    def _predict(self, X):
+        if self.linear_kernel is not None:
+            return self.linear_kernel.predict(X)
+        proba = self._tree_proba(X)
+        return self.classes_[(proba > 0.5).astype(np.intp)], proba
+
+    def predict(self, X):
+        return self._predict(X)[0]
+
+    def predict_proba(self, X):
+        proba = self._predict(X)[1]
+        return np.column_stack([1.0 - proba, proba])
+
+
+# -------------------- File format --------------------
+def is_compact(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def dumps(header, arrays):
+    """Serialises a header dict and named arrays to .npmodel bytes."""
+    arrays = {name: np.ascontiguousarray(a, dtype=np.asarray(a).dtype.newbyteorder("<")) for name, a in arrays.items()}
+    layout, offset = {}, 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset += -(-a.nbytes // ALIGN) * ALIGN
+    text = json.dumps(dict(header, arrays=layout), sort_keys=True).encode()
+    text += b" " * (-(len(MAGIC) + 4 + len(text)) % ALIGN)
+    out = bytearray(MAGIC + struct.pack("<I", len(text)) + text)
+    for a in arrays.values():
+        data = a.tobytes()
+        out += data + b"\0" * (-len(data) % ALIGN)
+    return bytes(out)
+
+
+def loads(buffer):
+    """CompactModel over `buffer` (bytes or an mmap); the arrays are views, not copies."""
+    if not is_compact(buffer):
+        raise ValueError("Not a .npmodel file")
+    start = len(MAGIC) + 4
+    (length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    header = json.loads(bytes(memoryview(buffer)[start:start + length]))
+    if header.get("format_version", 1) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format {header['format_version']}")
+    if header.get("features") != FEATURES:
+        raise ValueError("Model file was built for a different feature order")
+    base = start + length
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        count = math.prod(spec["shape"])
+        arrays[name] = np.frombuffer(buffer, np.dtype(spec["dtype"]), count, base + spec["offset"]).reshape(spec["shape"])
+    return CompactModel(header, arrays)
+
+
+def load(path):
+    """Memory-maps a .npmodel file; pages are read only when scoring touches them."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(buffer)
+
+
+# -------------------- Export --------------------
+def _linear_arrays(kernel, dtype, inputs):
+    if dtype != "int8":
+        return {"weights": kernel.weights.astype(dtype)}
+    # quantize weight x feature spread, so features in small units (DPF) keep their precision
+    spread = inputs.std(axis=0)
+    spread[spread == 0] = 1.0
+    scaled = kernel.weights * spread
+    step = max(float(np.abs(scaled).max()) / 127, np.finfo(np.float64).tiny)
+    return {"weights": np.round(scaled / step).astype(np.int8), "weight_scale": (step / spread).astype(np.float32)}
+
+
+def _breadth_first(tree):
+    """Node ids in breadth-first order, so every node's two children are adjacent."""
+    order, i = [0], 0
+    while i < len(order):
+        node = order[i]
+        if tree.children_left[node] >= 0:
+            order += [tree.children_left[node], tree.children_right[node]]
+        i += 1
+    return np.array(order, dtype=np.intp)
+
+
+def _tree_arrays(model, dtype):
+    estimators = model.estimators_ if hasattr(model, "estimators_") else [model]
+    parts = {name: [] for name in ("feature", "threshold", "first_child", "value")}
+    roots, offset, depth = [], 0, 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        order = _breadth_first(tree)
+        new_id = np.empty(len(order), dtype=np.intp)
+        new_id[order] = np.arange(len(order))
+        left = tree.children_left[order]
+        leaf = left < 0
+        threshold64 = tree.threshold[order]
+        threshold = threshold64.astype(np.float32)
+        # round down: x <= float32 threshold must match sklearn's x <= float64 threshold
+        threshold = np.where(threshold > threshold64, np.nextafter(threshold, np.float32(-np.inf)), threshold)
+        value = tree.value[order, 0, :]
+        proba = value[:, 1] / np.maximum(value.sum(axis=1), np.finfo(np.float64).tiny)
+        parts["feature"].append(np.where(leaf, 0, tree.feature[order]).astype(np.int8))
+        # leaves never go right (x > inf is False) and are their own first child
+        parts["threshold"].append(np.where(leaf, np.inf, threshold).astype(np.float32))
+        parts["first_child"].append((np.where(leaf, np.arange(len(order)), new_id[np.maximum(left, 0)]) + offset)
+                                    .astype(np.int32))
+        parts["value"].append(np.round(proba * LEAF_LEVELS).astype(np.uint8) if dtype == "int8" else proba.astype(dtype))
+        roots.append(offset)
+        offset += len(order)
+        depth = max(depth, tree.max_depth)
+    arrays = {name: np.concatenate(values) for name, values in parts.items()}
+    arrays["roots"] = np.array(roots, dtype=np.int32)
+    return arrays, depth
+
+
+def parity(original, compact, X, y=None, preprocessor=None):
+    """
+    Scores raw rows X with both models (each behind its preprocessing) and
+    returns the max |probability difference|, label mismatches and, with
+    outcomes `y`, the accuracy of each.
+    """
+    from scoring import predict
+    ref_labels, ref_proba = predict(original, X, preprocessor)
+    labels, proba = predict(compact, X, compact.preprocessor if compact.preprocessor is not None else preprocessor)
+    result = {
+        "rows": len(X),
+        "max_proba_diff": float(np.max(np.abs(proba - ref_proba))) if ref_proba is not None and len(X) else 0.0,
+        "label_mismatches": int(np.sum(labels != ref_labels)),
+    }
+    if y is not None:
+        result["accuracy"] = float(np.mean(labels == y))
+        result["original_accuracy"] = float(np.mean(ref_labels == y))
+    return result
+
+
+def export(model, preprocessor=None, dtype="float64", data_path=DATA_PATH):
+    """
+    Returns (bytes, parity) for a fitted model and the preprocessor it
+    expects. ValueError if the model kind has no compact form.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+    X, y = load_data(data_path)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "dtype": dtype,
+        "features": FEATURES,
+        "estimator": type(model).__name__,
+        "preprocess": preprocessor.to_dict() if preprocessor is not None else None,
+    }
+    kernel = kernel_for(model)
+    if kernel is not None:
+        inputs = preprocessor.transform(X) if preprocessor is not None else X
+        header.update(kind="linear", classes=kernel.classes.tolist(), bias=kernel.bias)
+        arrays = _linear_arrays(kernel, dtype, inputs)
+    elif type(model).__name__ in TREE_MODELS and len(model.classes_) == 2 and getattr(model, "n_outputs_", 1) == 1:
+        arrays, depth = _tree_arrays(model, dtype)
+        header.update(kind="trees", classes=model.classes_.tolist(), depth=depth)
+    else:
+        raise ValueError(f"{type(model).__name__} has no compact form (binary logistic or tree models only)")
+
+    result = parity(model, CompactModel(header, arrays), X, y, preprocessor)
+    header["parity"] = result
+    return dumps(header, arrays), result
+
+
+# -------------------- CLI --------------------
+def _format_parity(result):
+    line = f"rows={result['rows']} max_proba_diff={result['max_proba_diff']:.3g} " \
+           f"label_mismatches={result['label_mismatches']}"
+    if "accuracy" in result:
+        line += f" accuracy={result['accuracy']:.4f} (original {result['original_accuracy']:.4f})"
+    return line
+
+
+def main(argv=None):
+    from registry import BUNDLED_MODEL, BUNDLED_SCALER, get_registry
+
+    parser = argparse.ArgumentParser(description="Export / check / inspect compact .npmodel files.")
+    parser.add_argument("command", choices=["export", "parity", "info"])
+    parser.add_argument("file", nargs="?", default=None, help=".npmodel file (parity, info)")
+    parser.add_argument("--model", default=BUNDLED_MODEL, help="original pickled model")
+    parser.add_argument("--scaler", default=None, help="its scaler (default: the bundled one with the bundled model)")
+    parser.add_argument("--dtype", choices=DTYPES, default="float64")
+    parser.add_argument("--data", default=DATA_PATH, help="parity rows")
+    parser.add_argument("-o", "--output", default=None, help="default: the model path with a .npmodel extension")
+    parser.add_argument("--tolerance", type=float, default=None, help="max |probability difference| (default per dtype)")
+    parser.add_argument("--force", action="store_true", help="write the file even if the parity check fails")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        if not args.file:
+            parser.error("info needs a .npmodel file")
+        started = time.perf_counter()
+        compact = load(args.file)
+        elapsed = time.perf_counter() - started
+        header = compact.header
+        print(f"{args.file}: {header['estimator']} ({compact.kind}, {compact.dtype}), "
+              f"{os.path.getsize(args.file):,} bytes, arrays {compact.nbytes:,} bytes, loaded in {elapsed * 1e6:.0f}us")
+        for name, spec in header["arrays"].items():
+            print(f"  {name:<13} {spec['dtype']:<4} {tuple(spec['shape'])}")
+        if header.get("parity"):
+            print("  parity at export: " + _format_parity(header["parity"]))
+        return 0
+
+    scaler = args.scaler or (BUNDLED_SCALER if args.model == BUNDLED_MODEL else None)
+    version = get_registry().load_files(args.model, scaler)
+    if args.command == "parity":
+        if not args.file:
+            parser.error("parity needs a .npmodel file")
+        compact = load(args.file)
+        X, y = load_data(args.data)
+        result = parity(version.model, compact, X, y, version.preprocessor)
+        tolerance = TOLERANCES[compact.dtype] if args.tolerance is None else args.tolerance
+        print(_format_parity(result))
+        return 0 if result["max_proba_diff"] <= tolerance and result["label_mismatches"] == 0 else 1
+
+    try:
+        data, result = export(version.model, version.preprocessor, args.dtype, args.data)
+    except ValueError as e:
+        print(f"{e}; keep using the pickle")
+        return 1
+    print(_format_parity(result))
+    tolerance = TOLERANCES[args.dtype] if args.tolerance is None else args.tolerance
+    if (result["max_proba_diff"] > tolerance or result["label_mismatches"]) and not args.force:
+        print(f"parity check failed (tolerance {tolerance:g}, no label mismatches); nothing written, use --force")
+        return 1
+    output = args.output or os.path.splitext(args.model)[0] + (f".{args.dtype}" if args.dtype != "float64" else "") \
+        + EXTENSION
+    with open(output, "wb") as f:
+        f.write(data)
+    print(f"wrote {output} ({len(data):,} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Drift and data-quality monitoring over scored traffic.
+
+The prediction log passes the raw feature rows of everything it records
+(single, batch, API and CLI scoring) to record(). They are folded into
+per-day, per-feature aggregates in the same SQLite transaction:
+
+    drift_stats   rows, missing (NaN), zeros, sum, sum of squares, min, max
+    drift_bins    counts over fixed bins: the diabetes.csv 5% quantiles
+
+Storage is bounded per feature per day however much is scored, and nothing
+is kept in memory between calls. Reports compare a window of days with the
+baseline built from diabetes.csv (drift_baseline.json, rebuilt with
+`python drift.py baseline`):
+
+    PSI        population stability index over the bins
+               (< 0.1 stable, 0.1-0.25 watch, >= 0.25 drift)
+    KS         largest gap between the two CDFs at the bin edges, with the
+               5% critical value for the two sample sizes
+    zero rate  share of zeros, which the notebook treats as missing for
+               Glucose, BloodPressure, SkinThickness, Insulin and BMI
+    mean       and a median read off the histogram
+
+    python drift.py baseline
+    python drift.py report --days 7
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+from scoring import APP_DIR, DATA_PATH, FEATURES, load_data
+
+BASELINE_PATH = os.path.join(APP_DIR, "drift_baseline.json")
+
+FORMAT_VERSION = 1
+# bin edges are the baseline quantiles at 1/QUANTILE_BINS steps (repeated edges merge)
+QUANTILE_BINS = 20
+PSI_WATCH = 0.1
+PSI_DRIFT = 0.25
+# empty bins count as this share in PSI
+PSI_EPSILON = 1e-4
+# two-sample KS critical value coefficient at alpha = 0.05
+KS_COEFFICIENT = 1.358
+# windows with fewer rows get no status
+MIN_ROWS = 50
+DEFAULT_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drift_stats (
+    day TEXT NOT NULL,
+    baseline TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    zeros INTEGER NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    total_sq REAL NOT NULL DEFAULT 0,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (day, baseline, feature)
+);
+CREATE TABLE IF NOT EXISTS drift_bins (
+    day TEXT NOT NULL,
+    baseline TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, baseline, feature, bin)
+);
+"""
+
+_BUMP_STATS = """
+INSERT INTO drift_stats (day, baseline, feature, rows, missing, zeros, total, total_sq, min, max)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(day, baseline, feature) DO UPDATE SET
+    rows = rows + excluded.rows,
+    missing = missing + excluded.missing,
+    zeros = zeros + excluded.zeros,
+    total = total + excluded.total,
+    total_sq = total_sq + excluded.total_sq,
+    min = MIN(COALESCE(min, excluded.min), COALESCE(excluded.min, min)),
+    max = MAX(COALESCE(max, excluded.max), COALESCE(excluded.max, max))
+"""
+_BUMP_BIN = """
+INSERT INTO drift_bins (day, baseline, feature, bin, count) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(day, baseline, feature, bin) DO UPDATE SET count = count + excluded.count
+"""
+
+
+class Baseline:
+    """
+    Bin edges and reference statistics per feature. `id` hashes the edges,
+    so stored counts are only ever compared with the bins they were made with.
+    """
+
+    def __init__(self, features, rows, source="diabetes.csv"):
+        self.features = features
+        self.rows = rows
+        self.source = source
+        self.edges = {name: np.asarray(stats["edges"], dtype=np.float64) for name, stats in features.items()}
+        self.counts = {name: np.asarray(stats["counts"], dtype=np.int64) for name, stats in features.items()}
+        digest = hashlib.sha256(json.dumps({name: stats["edges"] for name, stats in features.items()},
+                                           sort_keys=True).encode())
+        self.id = digest.hexdigest()[:12]
+
+    @classmethod
+    def build(cls, data_path=DATA_PATH):
+        """Baseline of a diabetes.csv-style file."""
+        X, _ = load_data(data_path)
+        features = {}
+        for j, name in enumerate(FEATURES):
+            column = X[:, j]
+            edges = np.unique(np.quantile(column, np.linspace(0, 1, QUANTILE_BINS + 1)[1:-1]))
+            features[name] = {
+                "edges": edges.tolist(),
+                "counts": bin_counts(column, edges).tolist(),
+                "zero_rate": float(np.mean(column == 0)),
+                "mean": float(column.mean()),
+                "std": float(column.std()),
+                "median": float(np.median(column)),
+                "min": float(column.min()),
+                "max": float(column.max()),
+            }
+        return cls(features, len(X), os.path.basename(data_path))
+
+    def to_dict(self):
+        return {"format_version": FORMAT_VERSION, "id": self.id, "source": self.source, "rows": self.rows,
+                "features": self.features}
+
+    @classmethod
+    def from_dict(cls, spec):
+        if spec.get("format_version", 1) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported drift baseline format {spec['format_version']}")
+        if list(spec["features"]) != FEATURES:
+            raise ValueError("Drift baseline was built for a different feature order")
+        return cls(spec["features"], spec["rows"], spec.get("source", "diabetes.csv"))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+_baselines = {}
+
+
+def load_baseline(path=BASELINE_PATH):
+    """The baseline in `path` (cached), or one built from diabetes.csv if there is no such file."""
+    baseline = _baselines.get(path)
+    if baseline is None:
+        if os.path.exists(path):
+            with open(path) as f:
+                baseline = Baseline.from_dict(json.load(f))
+        else:
+            baseline = Baseline.build()
+        _baselines[path] = baseline
+    return baseline
+
+
+def bin_counts(values, edges):
+    """Counts over the bins (-inf, e0], (e0, e1], ..., (e_last, inf); NaN is skipped."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    return np.bincount(np.searchsorted(edges, values), minlength=len(edges) + 1)
+
+
+# -------------------- Recording --------------------
+def record(conn, day, X, baseline=None):
+    """
+    Folds raw feature rows (FEATURES order) into the day's aggregates using
+    `conn`; the caller owns the transaction.
+    """
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+    if not len(X):
+        return
+    baseline = baseline or load_baseline()
+    stats, bins = [], []
+    for j, name in enumerate(FEATURES):
+        column = X[:, j]
+        present = column[~np.isnan(column)]
+        counts = bin_counts(present, baseline.edges[name])
+        stats.append((day, baseline.id, name, len(column), len(column) - len(present), int(np.sum(present == 0)),
+                      float(present.sum()), float(np.dot(present, present)),
+                      float(present.min()) if len(present) else None,
+                      float(present.max()) if len(present) else None))
+        bins += [(day, baseline.id, name, int(b), int(counts[b])) for b in np.flatnonzero(counts)]
+    conn.executemany(_BUMP_STATS, stats)
+    conn.executemany(_BUMP_BIN, bins)
+
+
+# -------------------- Statistics --------------------
+def psi(expected, actual):
+    """Population stability index between two count vectors over the same bins."""
+    e = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), PSI_EPSILON)
+    a = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), PSI_EPSILON)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(expected, actual):
+    """Largest CDF gap at the bin edges and its 5% critical value: (statistic, critical)."""
+    n, m = int(np.sum(expected)), int(np.sum(actual))
+    if not n or not m:
+        return 0.0, float("inf")
+    gap = np.abs(np.cumsum(expected) / n - np.cumsum(actual) / m)
+    return float(gap.max()), KS_COEFFICIENT * float(np.sqrt((n + m) / (n * m)))
+
+
+def histogram_quantile(counts, edges, low, high, q=0.5):
+    """Quantile read off binned counts, interpolating linearly inside a bin; the outer bins end at low/high."""
+    total = np.sum(counts)
+    if not total:
+        return None
+    bounds = np.concatenate([[min(low, edges[0])], edges, [max(high, edges[-1])]])
+    cumulative = np.cumsum(counts)
+    b = min(int(np.searchsorted(cumulative, q * total)), len(counts) - 1)
+    before = cumulative[b - 1] if b else 0
+    share = (q * total - before) / counts[b] if counts[b] else 0.0
+    return float(bounds[b] + share * (bounds[b + 1] - bounds[b]))
+
+
+def status(psi_value, rows):
+    if rows < MIN_ROWS:
+        return "too few rows"
+    if psi_value >= PSI_DRIFT:
+        return "drift"
+    if psi_value >= PSI_WATCH:
+        return "watch"
+    return "stable"
+
+
+# -------------------- Reports --------------------
+def _window(days, today):
+    until = today or date.today()
+    return (until - timedelta(days=days - 1)).isoformat(), until.isoformat()
+
+
+def report(conn, days=DEFAULT_DAYS, today=None, baseline=None):
+    """
+    Drift of the rows scored over the last `days` days against the baseline:
+    {"rows", "days", "baseline", "features": [one dict per feature]}.
+    """
+    baseline = baseline or load_baseline()
+    since, until = _window(days, today)
+    stats = {row[0]: row[1:] for row in conn.execute(
+        "SELECT feature, SUM(rows), SUM(missing), SUM(zeros), SUM(total), SUM(total_sq), MIN(min), MAX(max) "
+        "FROM drift_stats WHERE baseline = ? AND day BETWEEN ? AND ? GROUP BY feature", (baseline.id, since, until))}
+    counts = {name: np.zeros(len(baseline.counts[name]), dtype=np.int64) for name in FEATURES}
+    for name, b, count in conn.execute(
+            "SELECT feature, bin, SUM(count) FROM drift_bins WHERE baseline = ? AND day BETWEEN ? AND ? "
+            "GROUP BY feature, bin", (baseline.id, since, until)):
+        if name in counts and b < len(counts[name]):
+            counts[name][b] = count
+
+    features = []
+    for name in FEATURES:
+        rows, missing, zeros, total, total_sq, low, high = stats.get(name, (0, 0, 0, 0.0, 0.0, None, None))
+        reference = baseline.features[name]
+        present = rows - missing
+        psi_value = psi(baseline.counts[name], counts[name]) if present else 0.0
+        ks_value, ks_critical = ks(baseline.counts[name], counts[name])
+        features.append({
+            "feature": name,
+            "rows": rows,
+            "status": status(psi_value, present),
+            "psi": psi_value,
+            "ks": ks_value,
+            "ks_critical": ks_critical,
+            "missing_rate": missing / rows if rows else None,
+            "zero_rate": zeros / present if present else None,
+            "baseline_zero_rate": reference["zero_rate"],
+            "mean": total / present if present else None,
+            "std": float(np.sqrt(max(total_sq / present - (total / present) ** 2, 0.0))) if present else None,
+            "baseline_mean": reference["mean"],
+            "median": histogram_quantile(counts[name], baseline.edges[name], low, high) if present else None,
+            "baseline_median": reference["median"],
+        })
+    return {"rows": max((f["rows"] for f in features), default=0), "days": days, "baseline": baseline.id,
+            "features": features}
+
+
+def timeline(conn, days=DEFAULT_DAYS, today=None, baseline=None):
+    """Per-day PSI of each feature: [{"day", "feature", "rows", "psi"}] (psi None below MIN_ROWS)."""
+    baseline = baseline or load_baseline()
+    since, until = _window(days, today)
+    per_day = {}
+    for day, name, b, count in conn.execute(
+            "SELECT day, feature, bin, count FROM drift_bins WHERE baseline = ? AND day BETWEEN ? AND ? "
+            "ORDER BY day", (baseline.id, since, until)):
+        if name in baseline.counts and b < len(baseline.counts[name]):
+            per_day.setdefault((day, name), np.zeros(len(baseline.counts[name]), dtype=np.int64))[b] = count
+    points = []
+    for (day, name), counts in per_day.items():
+        rows = int(counts.sum())
+        points.append({"day": day, "feature": name, "rows": rows,
+                       "psi": psi(baseline.counts[name], counts) if rows >= MIN_ROWS else None})
+    return points
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drift baseline and reports for scored traffic.")
+    parser.add_argument("command", choices=["baseline", "report"])
+    parser.add_argument("--data", default=DATA_PATH, help="baseline data (baseline)")
+    parser.add_argument("-o", "--output", default=BASELINE_PATH)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    args = parser.parse_args(argv)
+
+    if args.command == "baseline":
+        baseline = Baseline.build(args.data)
+        baseline.save(args.output)
+        print(f"wrote {args.output} (baseline {baseline.id}, {baseline.rows:,} rows)")
+        return 0
+
+    from prediction_log import get_log
+    result = get_log().drift_report(args.days)
+    print(f"last {args.days} days: {result['rows']:,} rows scored (baseline {result['baseline']})")
+    for f in result["features"]:
+        zero_rate = "-" if f["zero_rate"] is None else f"{f['zero_rate']:.1%}"
+        print(f"  {f['feature']:<26} {f['status']:<13} PSI {f['psi']:.3f}  KS {f['ks']:.3f} "
+              f"(critical {f['ks_critical']:.3f})  zeros {zero_rate} (baseline {f['baseline_zero_rate']:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Pure-NumPy scoring kernel for logistic models.
+
+A binary logistic model (optionally preceded by a StandardScaler) is folded
+into one weight vector and bias:
+
+    z = ((x - mean) / scale) @ w + b  ==  x @ (w / scale) + (b - (mean / scale) @ w)
+
+so label and probability come out of a single matrix-vector product and a
+sigmoid, without sklearn's per-call validation. Anything else (trees, SVC,
+...) returns None from compile_model() and keeps using sklearn.
+
+    python fastpath.py export -o model_linear.npz
+    python fastpath.py parity
+"""
+import argparse
+import sys
+import weakref
+
+import numpy as np
+
+# estimators whose predict_proba is sigmoid(decision_function) for binary problems
+LOGISTIC_MODELS = {"LogisticRegression", "LogisticRegressionCV", "SGDClassifier"}
+
+
+class LinearKernel:
+    __slots__ = ("weights", "bias", "classes", "_weights32")
+
+    def __init__(self, weights, bias, classes):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.classes = np.asarray(classes)
+        self._weights32 = self.weights.astype(np.float32)
+
+    def decision(self, X):
+        X = np.asarray(X)
+        if X.dtype == np.float32:
+            # columnar batches arrive as float32; stay in float32 rather than upcast a copy
+            return X @ self._weights32 + np.float32(self.bias)
+        return np.asarray(X, dtype=np.float64) @ self.weights + self.bias
+
+    def predict(self, X):
+        """
+        Returns (labels, probability of classes[1]) from one pass over X.
+        ValueError on NaN or infinite inputs, as sklearn raises.
+        """
+        z = self.decision(X)
+        if not np.isfinite(z).all():
+            # only look at X when z is off: a huge finite row may overflow z, which the sigmoid handles
+            bad = ~np.isfinite(np.asarray(X)).all(axis=1)
+            if bad.any():
+                raise ValueError(f"Input contains NaN or infinity ({int(bad.sum())} rows, first at row {int(bad.argmax())})")
+        proba = np.empty_like(z)
+        # numerically stable sigmoid for large |z|
+        pos = z >= 0
+        proba[pos] = 1.0 / (1.0 + np.exp(-z[pos]))
+        ez = np.exp(z[~pos])
+        proba[~pos] = ez / (1.0 + ez)
+        return self.classes[(z > 0).astype(np.intp)], proba
+
+    def save(self, path):
+        np.savez(path, weights=self.weights, bias=np.array([self.bias]), classes=self.classes)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["weights"], data["bias"][0], data["classes"])
+
+
+def _is_logistic(model):
+    if type(model).__name__ not in LOGISTIC_MODELS:
+        return False
+    if type(model).__name__ == "SGDClassifier" and getattr(model, "loss", None) not in ("log_loss", "log"):
+        return False
+    coef = getattr(model, "coef_", None)
+    classes = getattr(model, "classes_", None)
+    return coef is not None and classes is not None and len(classes) == 2 and np.shape(coef)[0] == 1
+
+
+def compile_model(model, scaler=None):
+    """
+    Returns a LinearKernel equivalent to `scaler` followed by `model`, or None
+    if the model is not a binary logistic model. A two-step sklearn Pipeline
+    (StandardScaler, logistic model) is folded the same way.
+    """
+    if getattr(model, "linear_kernel", None) is not None:
+        # compact.CompactModel loaded from a linear .npmodel file
+        return model.linear_kernel
+    steps = getattr(model, "steps", None)
+    if steps is not None:
+        if len(steps) != 2 or scaler is not None:
+            return None
+        scaler, model = steps[0][1], steps[1][1]
+        if getattr(scaler, "mean_", None) is None:
+            return None
+    if not _is_logistic(model):
+        return None
+
+    w = np.asarray(model.coef_, dtype=np.float64)[0]
+    b = float(np.asarray(model.intercept_, dtype=np.float64)[0])
+    if scaler is not None:
+        mean = np.asarray(scaler.mean_ if scaler.mean_ is not None else 0.0, dtype=np.float64)
+        scale = np.asarray(scaler.scale_ if scaler.scale_ is not None else 1.0, dtype=np.float64)
+        w = w / scale
+        b = b - float(np.sum(mean * w))
+    return LinearKernel(w, b, model.classes_)
+
+
+_NOT_LINEAR = object()
+_kernels = weakref.WeakKeyDictionary()
+
+
+def kernel_for(model):
+    """Compiled kernel for `model`, cached per model object; None when sklearn must be used."""
+    try:
+        kernel = _kernels.get(model)
+    except TypeError:
+        return compile_model(model)
+    if kernel is None:
+        kernel = compile_model(model) or _NOT_LINEAR
+        _kernels[model] = kernel
+    return None if kernel is _NOT_LINEAR else kernel
+
+
+# -------------------- Export / parity CLI --------------------
+def parity(model, kernel, X, scaler=None):
+    """Max |proba difference| and number of label mismatches against sklearn on X."""
+    Xs = scaler.transform(X) if scaler is not None else X
+    ref_labels = np.asarray(model.predict(Xs))
+    ref_proba = np.asarray(model.predict_proba(Xs))[:, 1]
+    labels, proba = kernel.predict(np.asarray(X, dtype=np.float64))
+    return float(np.max(np.abs(proba - ref_proba))), int(np.sum(labels != ref_labels))
+
+
+def main(argv=None):
+    from registry import BUNDLED_MODEL, get_registry
+    from scoring import DATA_PATH, load_data
+
+    parser = argparse.ArgumentParser(description="Export / check the NumPy fast path for a logistic model.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--model", default=BUNDLED_MODEL)
+    parser.add_argument("--scaler", default=None, help="fold this StandardScaler in front of the model")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("-o", "--output", default="model_linear.npz")
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args(argv)
+
+    version = get_registry().load_files(args.model, args.scaler)
+    kernel = compile_model(version.model, version.scaler)
+    if kernel is None:
+        print(f"{type(version.model).__name__} is not a binary logistic model; sklearn will be used")
+        return 1
+
+    if args.command == "export":
+        kernel.save(args.output)
+        print(f"wrote {args.output}")
+        return 0
+
+    X, _ = load_data(args.data)
+    max_diff, mismatches = parity(version.model, kernel, X, version.scaler)
+    print(f"rows={len(X)} max_proba_diff={max_diff:.3g} label_mismatches={mismatches}")
+    return 0 if max_diff <= args.tolerance and mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,59 +1,34 @@
+import time
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import joblib
-import base64
-import matplotlib.pyplot as plt
+
+import columnar
+from assets import CLASSIC_CSS
+from explain import explain, ranked
+from jobs import ACTIVE, DONE, get_queue
+from insights import cached as cached_insights, get_insights
+from metrics import Profiler, export_from_env, observe, span
+from online import get_learner, latest_key, latest_version
+from prediction_cache import get_cache
+from prediction_log import get_log
+from registry import get_registry
+from results import PAGE_SIZES, RISK_FILTERS, SORT_KEYS, page_count
+from scoring import single_row
+from validation import RANGES
+
+# Shared across sessions; the bundled model.pkl/scaler.pkl are loaded once per process, on first use
+registry = get_registry()
+prediction_cache = get_cache()
+prediction_log = get_log()
+
+# page render time goes to metrics.py; the profiler choice at the bottom applies to the next run
+run_started = time.perf_counter()
+profiler = Profiler(st.session_state.profile).start() if st.session_state.get("profile", "off") != "off" else None
 
 # ================================
 # Custom CSS for Tech UI
 # ================================
-st.markdown("""
-    <style>
-        body {
-            background-color: #0f192d;
-        }
-        .main {
-            background-color: #0f192d;
-        }
-        .title {
-            color: #4fd6c8;
-            font-size: 40px;
-            font-weight: 800;
-            text-align: center;
-            margin-bottom: 10px;
-        }
-        .subtitle {
-            color: white;
-            font-size: 18px;
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .card {
-            background: rgba(255, 255, 255, 0.08);
-            padding: 20px;
-            border-radius: 15px;
-            border: 1px solid #4fd6c8;
-            margin-bottom: 15px;
-        }
-        .stButton>button {
-            background-color: #4fd6c8;
-            color: black;
-            width: 100%;
-            border-radius: 10px;
-            height: 45px;
-            font-size: 18px;
-        }
-        .stTabs [role="tab"] {
-            background-color: #1b2b45;
-            color: white;
-        }
-        .stTabs [role="tab"][aria-selected="true"] {
-            background-color: #4fd6c8;
-            color: black;
-        }
-    </style>
-""", unsafe_allow_html=True)
+st.markdown(CLASSIC_CSS, unsafe_allow_html=True)
 
 # =====================================
 # HEADER
@@ -65,15 +40,54 @@ st.markdown("<div class='subtitle'>Powered by Logistic Regression</div>", unsafe
 # UPLOAD MODEL
 # =====================================
 st.markdown("### Upload your Logistic Regression Model (.pkl)")
-uploaded_model = st.file_uploader("Upload model.pkl", type=["pkl"])
+uploaded_model = st.file_uploader("Upload model.pkl (or a compact .npmodel export)", type=["pkl", "npmodel"])
+latest_snapshot = get_learner().latest_name()
+use_online = st.checkbox("Use the online learner's latest snapshot" + (f" ({latest_snapshot})" if latest_snapshot else ""),
+                         disabled=latest_snapshot is None)
 
-model = None
+uploaded_version = None
 if uploaded_model:
-    model = joblib.load(uploaded_model)
-    st.success("Model loaded successfully!")
+    try:
+        uploaded_version = registry.load_bytes(uploaded_model.getvalue())
+        st.success("Model loaded successfully!")
+    except Exception as e:
+        st.error(f"Failed to load model: {e}")
+elif use_online:
+    st.caption(f"Using the online learner ({latest_snapshot}); new snapshots are picked up on the next interaction.")
+elif registry.bundled_version_key() is not None:
+    st.caption(f"Using the bundled model.pkl (version {registry.bundled_version_key()}).")
+
+
+def active_version():
+    """
+    (model, key, preprocessor) of the uploaded model, else the online learner's
+    newest snapshot if chosen, else the bundled one (deserialised on first use).
+    """
+    if uploaded_model:
+        version = uploaded_version
+    else:
+        version = latest_version(registry) if use_online else None
+        if version is None:
+            # no snapshot (any more): the bundled model, as active_key() reports
+            version = registry.bundled()
+    if version is None:
+        return None, None, None
+    return version.model, version.key, version.preprocessor
+
+
+def active_key():
+    """Version key of the active model without deserialising the bundled one."""
+    if uploaded_model:
+        return uploaded_version.key if uploaded_version is not None else None
+    if use_online:
+        return latest_key() or registry.bundled_version_key()
+    return registry.bundled_version_key()
 
-# Tabs
-tabs = st.tabs(["Single Prediction", "Batch Prediction", "Analytics Dashboard"])
+
+# Tabs: with on_change="rerun", .open tells which tab is showing, so the
+# batch and analytics bodies (and their imports) only run when opened
+tabs = st.tabs(["Single Prediction", "Batch Prediction", "Analytics Dashboard"], key="active_tab",
+               on_change="rerun")
 
 # =====================================
 # TAB 1: SINGLE PREDICTION
@@ -85,83 +99,205 @@ with tabs[0]:
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        Pregnancies = st.number_input("Pregnancies", 0, 20, 1)
-        BloodPressure = st.number_input("Blood Pressure", 0, 200, 70)
-        Insulin = st.number_input("Insulin", 0, 900, 80)
+        Pregnancies = st.number_input("Pregnancies", *RANGES["Pregnancies"], 1)
+        BloodPressure = st.number_input("Blood Pressure", *RANGES["BloodPressure"], 70)
+        Insulin = st.number_input("Insulin", *RANGES["Insulin"], 80)
 
     with col2:
-        Glucose = st.number_input("Glucose Level", 0, 300, 120)
-        SkinThickness = st.number_input("Skin Thickness", 0, 100, 20)
-        Age = st.number_input("Age", 1, 120, 30)
+        Glucose = st.number_input("Glucose Level", *RANGES["Glucose"], 120)
+        SkinThickness = st.number_input("Skin Thickness", *RANGES["SkinThickness"], 20)
+        Age = st.number_input("Age", *RANGES["Age"], 30)
 
     with col3:
-        BMI = st.number_input("BMI", 0.0, 70.0, 25.3)
-        DPF = st.number_input("Diabetes Pedigree Function", 0.0, 3.0, 0.5)
+        BMI = st.number_input("BMI", *RANGES["BMI"], 25.3)
+        DPF = st.number_input("Diabetes Pedigree Function", *RANGES["DiabetesPedigreeFunction"], 0.5)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
     if st.button("Predict Diabetes"):
 
+        model, model_key, preprocessor = active_version()
         if model is None:
             st.error("Please upload a model.pkl first.")
         else:
-            input_data = np.array([[Pregnancies, Glucose, BloodPressure, SkinThickness,
-                                    Insulin, BMI, DPF, Age]])
+            input_data = single_row(Pregnancies=Pregnancies, Glucose=Glucose, BloodPressure=BloodPressure,
+                                    SkinThickness=SkinThickness, Insulin=Insulin, BMI=BMI,
+                                    DiabetesPedigreeFunction=DPF, Age=Age)
 
-            prediction = model.predict(input_data)[0]
+            labels, probs = prediction_cache.predict(model_key, model, input_data, preprocessor)
+            prediction_log.log(labels, probs, model_key, "single", features=input_data)
+            prediction = labels[0]
             result_text = "HIGH RISK (Diabetic)" if prediction == 1 else "LOW RISK (Non-Diabetic)"
 
-            st.markdown("<br>", unsafe_allow_html=True)
-            st.markdown(f"""
-                <div class='card' style='text-align:center;font-size:24px;color:white'>
-                    Prediction Result: <span style='color:#4fd6c8'>{result_text}</span>
-                </div>
-            """, unsafe_allow_html=True)
+            # which inputs pushed the score up or down, against the average diabetes.csv patient
+            contributions, base, units = explain(model, input_data, preprocessor, model_key)
+            factors = ranked(contributions[0], input_data)
+            largest = max(abs(c) for _, c, _ in factors) or 1.0
+
+            with span("render", element="result_card"):
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown(f"""
+                    <div class='card' style='text-align:center;font-size:24px;color:white'>
+                        Prediction Result: <span style='color:#4fd6c8'>{result_text}</span>
+                    </div>
+                """, unsafe_allow_html=True)
+                st.markdown("<div class='card'><b>Top factors</b> "
+                            f"<span style='color:#9aa4b2'>({units}; red raises risk, teal lowers it)</span>"
+                            + "".join(f"<div style='margin-top:6px'>{name} = {value:g} "
+                                      f"<span style='color:{'#ff6b6b' if c > 0 else '#4fd6c8'}'>{c:+.3f}</span>"
+                                      f"<div style='height:8px;border-radius:4px;width:{max(2, int(100 * abs(c) / largest))}%;"
+                                      f"background:{'#ff6b6b' if c > 0 else '#4fd6c8'}'></div></div>"
+                                      for name, c, value in factors)
+                            + "</div>", unsafe_allow_html=True)
 
 # =====================================
 # TAB 2: BATCH PREDICTION
 # =====================================
 with tabs[1]:
-    st.subheader("Upload CSV for multiple predictions")
-    batch_file = st.file_uploader("Upload CSV", type=["csv"], key="csvupload")
+    if tabs[1].open:
+        st.subheader("Upload CSV for multiple predictions")
+        batch_file = st.file_uploader("Upload CSV, Parquet, Arrow or .npy", key="csvupload",
+                                      type=["csv", "parquet", "pq", "arrow", "feather", "ipc", "npy"])
+        in_fmt = columnar.format_for(batch_file.name) if batch_file else "csv"
+        out_fmt = st.selectbox("Results format", list(columnar.EXTENSIONS),
+                               index=list(columnar.EXTENSIONS).index(in_fmt))
+        explain_rows = st.checkbox("Add per-feature contribution columns",
+                                   help="Why each row scored as it did; exact for logistic models, "
+                                        "sampled Shapley values (about 15x the scoring time) for others.")
+
+        # scoring runs as a background job (jobs.py), so reruns and other tabs stay responsive
+        queue = get_queue()
+        queue.recover()
+        job_ids = st.session_state.setdefault("batch_jobs", [])
+        if batch_file and st.button("Score in the background"):
+            model, model_key, preprocessor = active_version()
+            if model is None:
+                st.error("Please upload a model.pkl first.")
+            else:
+                try:
+                    job_ids.insert(0, queue.submit(batch_file, batch_file.name, model_key, in_fmt, out_fmt,
+                                                   explain_rows))
+                except KeyError as e:
+                    st.error(e.args[0])
+        if batch_file and latest_snapshot is not None and st.button("Update the online learner with this file's outcomes"):
+            batch_file.seek(0)
+            try:
+                path = get_learner().update_from(batch_file, in_fmt, name=batch_file.name)
+            except (KeyError, ValueError) as e:
+                st.error(f"Could not update the online learner. {e.args[0]}")
+            else:
+                if path:
+                    st.success(f"Online learner updated ({get_learner().latest_name()}).")
+                else:
+                    st.warning("No valid rows with a 0/1 Outcome to learn from.")
+
+        jobs_now = queue.jobs(job_ids)
+        done_ids = [job["id"] for job in jobs_now if job["status"] == DONE]
 
-    if batch_file and model:
-        df = pd.read_csv(batch_file)
+        # only the job list polls; a full rerun happens when another job finishes
+        @st.fragment(run_every=1.0 if any(job["status"] in ACTIVE for job in jobs_now) else None)
+        def job_panel():
+            current = queue.jobs(st.session_state.batch_jobs)
+            for job in current:
+                name_col, status_col, action_col = st.columns([3, 5, 2])
+                name_col.write(f"**{job['name']}**  \n{job['id']}")
+                if job["status"] in ACTIVE:
+                    rate = f" • {job['rows_per_sec']:,.0f} rows/s" if job["rows_per_sec"] else ""
+                    status_col.progress(job["fraction"] or 0.0, text=f"{job['status']} • {job['rows']:,} rows{rate}")
+                    if action_col.button("Cancel", key=f"cancel-{job['id']}"):
+                        queue.cancel(job["id"])
+                elif job["status"] == DONE:
+                    summary = job["summary"] or {}
+                    status_col.write(f"done • {job['rows']:,} rows, {summary.get('positives', 0):,} predicted Diabetic, "
+                                     f"{summary.get('elapsed', 0.0):.2f}s")
+                    path = queue.output_path(job["id"])
+                    action_col.download_button(f"Download ({job['out_fmt']})", lambda path=path: open(path, "rb").read(),
+                                               "prediction_results" + columnar.EXTENSIONS[job["out_fmt"]],
+                                               mime=columnar.MIME_TYPES[job["out_fmt"]], key=f"download-{job['id']}")
+                else:
+                    status_col.write(job["status"] + (f" • {job['error']}" if job["error"] else ""))
+            if any(job["status"] == DONE and job["id"] not in done_ids for job in current):
+                st.rerun()
 
-        st.write("Uploaded Data:")
-        st.dataframe(df)
+        job_panel()
 
-        try:
-            predictions = model.predict(df)
-            df["Prediction"] = ["Diabetic" if p == 1 else "Non-Diabetic" for p in predictions]
+        if done_ids:
+            job_id = st.selectbox("Results of", done_ids, key="result_job",
+                                  format_func=lambda i: next(f"{j['name']} ({i})" for j in jobs_now if j["id"] == i))
+            job = next(j for j in jobs_now if j["id"] == job_id)
+            report = (job["summary"] or {}).get("validation", {})
+            for note in report.get("notes", []):
+                st.info(note)
+            if report.get("invalid_rows"):
+                st.warning(f"{report['invalid_rows']:,} rows failed validation and were not scored "
+                           "(Prediction = Invalid, reason in the Validation column).")
+                st.dataframe([{"feature": name, **problems} for name, problems in report["by_feature"].items()],
+                             hide_index=True)
+                st.dataframe(report["examples"], hide_index=True)
 
-            st.success("Predictions completed!")
-            st.dataframe(df)
+            # results stay server-side (memory-mapped); the view keeps its sort orders per job
+            loaded = st.session_state.get("job_results")
+            if loaded is None or loaded[0] != job_id:
+                loaded = st.session_state.job_results = (job_id, queue.results(job_id))
+            results = loaded[1]
 
-            csv_output = df.to_csv(index=False).encode()
-            st.download_button("Download Results CSV", csv_output, "prediction_results.csv")
+            # summary and histogram are aggregated server-side; only one page of rows is sent
+            summary = results.summary()
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Rows", f"{summary['rows']:,}")
+            c2.metric("Diabetic", f"{summary['Diabetic']:,}")
+            c3.metric("Non-Diabetic", f"{summary['Non-Diabetic']:,}")
+            c4.metric("Invalid", f"{summary['Invalid']:,}")
+            counts, edges = results.histogram()
+            st.bar_chart({"Probability": [f"{lo:.2f}-{hi:.2f}" for lo, hi in zip(edges[:-1], edges[1:])],
+                          "Rows": counts.tolist()}, x="Probability", y="Rows", height=220)
 
-        except Exception as e:
-            st.error("Error during prediction. Ensure CSV columns match the model input format.")
+            f1, f2, f3, f4 = st.columns([2, 2, 1, 1])
+            risk = f1.selectbox("Show", RISK_FILTERS, key="result_risk")
+            sort_by = f2.selectbox("Sort by", SORT_KEYS, key="result_sort")
+            descending = f3.checkbox("Descending", key="result_desc")
+            page_size = f4.selectbox("Rows per page", PAGE_SIZES, key="result_page_size")
+            low, high = st.slider("Probability range", 0.0, 1.0, (0.0, 1.0), 0.01, key="result_range")
+            idx = results.order(risk, sort_by, descending, low, high)
+            pages = page_count(len(idx), page_size)
+            if st.session_state.get("result_page", 1) > pages:
+                st.session_state.result_page = 1
+            page = st.number_input(f"Page (of {pages:,})", 1, pages, key="result_page")
+            st.caption(f"{len(idx):,} matching rows")
+            with span("render", element="dataframe"):
+                st.dataframe(results.page(idx, page - 1, page_size), hide_index=True)
 
 # =====================================
 # TAB 3: ANALYTICS DASHBOARD
 # =====================================
 with tabs[2]:
-    st.subheader("Sample Analytics Visualization")
+    if tabs[2].open:
+        st.subheader("Analytics Visualization")
 
-    sample_df = pd.DataFrame({
-        "Feature": ["Glucose", "BloodPressure", "BMI", "Age"],
-        "Importance": [40, 10, 30, 20]
-    })
+        insights = cached_insights(active_key()) or get_insights(*active_version())
+        images = insights["images"]
+        if "feature_importance" in images:
+            st.image(images["feature_importance"], caption="Feature importance of the active model")
+        else:
+            st.info("The active model does not expose coefficients or feature importances.")
+        if "heatmap" in images:
+            st.image(images["heatmap"], caption="Correlation heatmap (diabetes.csv)")
 
-    fig, ax = plt.subplots(figsize=(8, 4))
-    ax.bar(sample_df["Feature"], sample_df["Importance"])
-    ax.set_title("Feature Importance Example (Static)")
-    ax.set_xlabel("Features")
-    ax.set_ylabel("Importance Score")
-    st.pyplot(fig)
+        st.write(f"Summary statistics ({insights['rows']:,} records):")
+        with span("render", element="dataframe"):
+            st.dataframe(insights["summary"], hide_index=True)
 
-    st.info("These charts are placeholders. You can link real feature importance if your model supports it!")
+# =====================================
+# DIAGNOSTICS
+# =====================================
+st.selectbox("Profile each run", ["off", "cprofile", "sampling"], key="profile",
+             help="Shows a profile of the whole script run below.")
+observe("page_render", time.perf_counter() - run_started, app="final_diabetes_app.py")
+if profiler is not None:
+    with st.expander(f"Profile of this run ({profiler.stop().kind}, {profiler.seconds * 1000:.0f}ms)"):
+        st.code(profiler.report())
+export_from_env()
+# warm the bundled model now that the first render is out
+registry.preload_bundled()
 
 # END OF APP
@@ -0,0 +1,238 @@
+"""
+Precomputed Data Insights artifacts.
+
+Summary statistics, the correlation matrix and feature importances are
+computed from diabetes.csv and the active model once, then written to
+.insights/<key>/ together with small rendered PNGs. The key combines a hash of
+diabetes.csv with the model version key, so editing the data or switching
+models rebuilds the artifacts; every other page load is a dict lookup.
+
+The MAX_KEYS most recently used keys are kept, on disk and in memory, so
+sessions on different models (bundled, uploaded, online) don't rebuild each
+other's, while online snapshots (online.py) can't grow the cache without
+bound. A directory's mtime records its last use. Set DIABETES_INSIGHTS_DIR
+to keep the cache somewhere other than .insights/ next to the app.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from scoring import APP_DIR, DATA_PATH, FEATURES, load_data
+
+PAIRPLOT_SOURCE = os.path.join(APP_DIR, "pairplot.png")
+CACHE_DIR = os.environ.get("DIABETES_INSIGHTS_DIR", os.path.join(APP_DIR, ".insights"))
+
+THUMB_WIDTH = 640
+RENDER_DPI = 80
+
+# data + model versions whose insights are kept (on disk and in memory)
+MAX_KEYS = 8
+
+_loaded = OrderedDict()
+_hashes = {}
+_lock = threading.Lock()
+
+
+def data_hash(path=DATA_PATH):
+    """Content hash of the data file, recomputed only when its size or mtime changes."""
+    st = os.stat(path)
+    stamp = (path, st.st_size, st.st_mtime_ns)
+    digest = _hashes.get(stamp)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = _hashes[stamp] = h.hexdigest()[:12]
+    return digest
+
+
+# -------------------- Computation --------------------
+def feature_importances(model, X, preprocessor=None):
+    """
+    Percent importance per feature: |coefficient| x feature std for logistic
+    models (coefficients mapped back to raw units, X in raw units after
+    imputation), feature_importances_ for tree ensembles, None otherwise.
+    """
+    from fastpath import kernel_for
+    kernel = kernel_for(model)
+    if kernel is not None:
+        w = kernel.weights
+        if preprocessor is not None and preprocessor.scale is not None:
+            w = w / preprocessor.scale
+        raw = np.abs(w) * X.std(axis=0)
+    elif hasattr(model, "feature_importances_"):
+        raw = np.asarray(model.feature_importances_, dtype=np.float64)
+    else:
+        return None
+    total = raw.sum()
+    if not total:
+        return None
+    return dict(zip(FEATURES, (100.0 * raw / total).round(2).tolist()))
+
+
+def compute(model=None, preprocessor=None, data_path=DATA_PATH):
+    import pandas as pd
+    X, y = load_data(data_path)
+    df = pd.DataFrame(X, columns=FEATURES)
+    if y is not None:
+        df["Outcome"] = y
+    if preprocessor is not None:
+        from preprocessing import Preprocessor
+        X = Preprocessor(preprocessor.impute_means).transform(X)
+    summary = df.describe().T[["mean", "std", "min", "50%", "max"]].round(3)
+    summary["zero_rate"] = (df == 0).mean().round(3)
+    return {
+        "rows": int(len(df)),
+        "positive_rate": float(df["Outcome"].mean()) if "Outcome" in df else None,
+        "summary": summary.reset_index().rename(columns={"index": "feature", "50%": "median"}).to_dict("records"),
+        "correlation": {"columns": list(df.columns), "values": df.corr().round(3).to_numpy().tolist()},
+        "importance": feature_importances(model, X, preprocessor) if model is not None else None,
+    }
+
+
+# -------------------- Rendering --------------------
+def _render(stats, out_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    images = {}
+    if stats["importance"]:
+        items = sorted(stats["importance"].items(), key=lambda kv: kv[1])
+        fig, ax = plt.subplots(figsize=(6, 4))
+        ax.barh([k for k, _ in items], [v for _, v in items], color="#06b6d4")
+        ax.set_xlabel("Importance (%)")
+        ax.set_title("Feature Importance")
+        fig.tight_layout()
+        images["feature_importance"] = os.path.join(out_dir, "feature_importance.png")
+        fig.savefig(images["feature_importance"], dpi=RENDER_DPI)
+        plt.close(fig)
+
+    corr = np.array(stats["correlation"]["values"])
+    cols = stats["correlation"]["columns"]
+    fig, ax = plt.subplots(figsize=(6, 5))
+    im = ax.imshow(corr, cmap="coolwarm", vmin=-1, vmax=1)
+    ax.set_xticks(range(len(cols)), cols, rotation=60, ha="right", fontsize=7)
+    ax.set_yticks(range(len(cols)), cols, fontsize=7)
+    for i in range(len(cols)):
+        for j in range(len(cols)):
+            ax.text(j, i, f"{corr[i, j]:.2f}", ha="center", va="center", fontsize=5)
+    fig.colorbar(im, ax=ax, fraction=0.046)
+    ax.set_title("Correlation Heatmap")
+    fig.tight_layout()
+    images["heatmap"] = os.path.join(out_dir, "heatmap.png")
+    fig.savefig(images["heatmap"], dpi=RENDER_DPI)
+    plt.close(fig)
+
+    if os.path.exists(PAIRPLOT_SOURCE):
+        # the seaborn pair plot is too slow to redraw; ship a downsampled copy instead
+        from PIL import Image
+        with Image.open(PAIRPLOT_SOURCE) as img:
+            img = img.convert("RGB")
+            img.thumbnail((THUMB_WIDTH, THUMB_WIDTH))
+            images["pairplot"] = os.path.join(out_dir, "pairplot.jpg")
+            img.save(images["pairplot"], quality=80, optimize=True)
+    return images
+
+
+def build(key, model=None, preprocessor=None, data_path=DATA_PATH):
+    """
+    Computes and writes the artifacts for `key`, then removes the least
+    recently used keys beyond MAX_KEYS. Returns the removed keys.
+    """
+    out_dir = os.path.join(CACHE_DIR, key)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    stats = compute(model, preprocessor, data_path)
+    images = _render(stats, tmp_dir)
+    stats["images"] = {name: os.path.basename(path) for name, path in images.items()}
+    with open(os.path.join(tmp_dir, "insights.json"), "w") as f:
+        json.dump(stats, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return _prune(key)
+
+
+def _prune(keep):
+    ages = []
+    for name in os.listdir(CACHE_DIR):
+        # .tmp dirs may be another process's build in progress
+        if name == keep or name.endswith(".tmp"):
+            continue
+        try:
+            ages.append((os.stat(os.path.join(CACHE_DIR, name)).st_mtime, name))
+        except OSError:
+            pass
+    removed = [name for _, name in sorted(ages, reverse=True)[MAX_KEYS - 1:]]
+    for name in removed:
+        shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)
+    return removed
+
+
+def _touch(key):
+    """Marks `key` as used; False if its directory is gone."""
+    try:
+        os.utime(os.path.join(CACHE_DIR, key))
+        return True
+    except OSError:
+        return False
+
+
+def _read(key):
+    out_dir = os.path.join(CACHE_DIR, key)
+    with open(os.path.join(out_dir, "insights.json")) as f:
+        stats = json.load(f)
+    stats["images"] = {name: os.path.join(out_dir, fname) for name, fname in stats["images"].items()}
+    stats["key"] = key
+    return stats
+
+
+def _remember(key, stats):
+    _loaded[key] = stats
+    while len(_loaded) > MAX_KEYS:
+        _loaded.popitem(last=False)
+    return stats
+
+
+def cached(model_key=None):
+    """The insights for `model_key` if they are already built, else None (never touches the model)."""
+    key = f"{data_hash()}-{model_key or 'nomodel'}"
+    with _lock:
+        stats = _loaded.get(key)
+        if stats is not None:
+            if _touch(key):
+                _loaded.move_to_end(key)
+                return stats
+            # pruned by a build for another key (possibly in another process)
+            del _loaded[key]
+        try:
+            stats = _read(key)
+            _touch(key)
+            return _remember(key, stats)
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def get_insights(model=None, model_key=None, preprocessor=None):
+    """
+    Returns the insights dict (summary, correlation, importance, image paths)
+    for the current data + model, building it on first use.
+    """
+    stats = cached(model_key)
+    if stats is not None:
+        return stats
+    key = f"{data_hash()}-{model_key or 'nomodel'}"
+    with _lock:
+        if key in _loaded:
+            # another session finished the build while we waited
+            return _loaded[key]
+        for removed in build(key, model, preprocessor):
+            _loaded.pop(removed, None)
+        return _remember(key, _read(key))
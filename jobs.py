@@ -0,0 +1,431 @@
+"""
+Background batch scoring jobs.
+
+A job is a directory plus a row in a small SQLite table, so it outlives the
+Streamlit rerun (and session, and server process) that submitted it:
+
+    batch_jobs/
+        jobs.db                       status, progress, summary per job
+        <job id>/input.<ext>          the upload, written once
+                 model.pkl|.npmodel   the files of the model version it was
+                 scaler.pkl           submitted with, copied as they are and
+                 model.preprocess.json  loaded back through the registry
+                 output.<ext>         results file, streamed while scoring
+                 results/*.npy        columns for the paginated view (results.py)
+
+Jobs run in a process pool (spawned workers, so they use every core and
+never share the Streamlit process's GIL). A worker writes progress to the
+table after each chunk and checks the job's cancel flag there. Queued jobs
+of a process that died are picked up again by the next JobQueue.recover()
+(the app and `submit` call it; `list` and `cancel` don't), and unfinished
+running ones are re-run from the start.
+
+    python jobs.py submit patients.csv --format parquet
+    python jobs.py list
+    python jobs.py cancel <job id>
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from scoring import APP_DIR
+
+JOBS_DIR = os.environ.get("DIABETES_JOBS_DIR", os.path.join(APP_DIR, "batch_jobs"))
+DEFAULT_WORKERS = int(os.environ.get("DIABETES_JOB_WORKERS", "0")) or os.cpu_count() or 1
+# finished jobs (and their files) are deleted after this many days
+KEEP_DAYS = 7
+# minimum seconds between progress writes from a worker
+PROGRESS_INTERVAL = 0.25
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    in_fmt TEXT NOT NULL,
+    out_fmt TEXT NOT NULL,
+    explain INTEGER NOT NULL DEFAULT 0,
+    model_key TEXT,
+    queue_pid INTEGER,
+    worker_pid INTEGER,
+    rows INTEGER NOT NULL DEFAULT 0,
+    fraction REAL,
+    rows_per_sec REAL,
+    cancel INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    summary TEXT
+);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """The jobs table; safe to use from several threads and processes."""
+
+    def __init__(self, root=JOBS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, "jobs.db")
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def create(self, job_id, name, in_fmt, out_fmt, explain, model_key):
+        self._conn().execute(
+            "INSERT INTO jobs (id, name, status, created, in_fmt, out_fmt, explain, model_key, queue_pid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, name, QUEUED, time.time(), in_fmt, out_fmt, int(explain), model_key, os.getpid()))
+
+    def update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._conn().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id, status, **fields):
+        """Moves an active job to a final status (no-op if it already left ACTIVE)."""
+        fields = {"status": status, "finished": time.time(), **fields}
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        cur = self._conn().execute(f"UPDATE jobs SET {columns} WHERE id = ? AND status IN (?, ?)",
+                                   (*fields.values(), job_id, *ACTIVE))
+        return cur.rowcount > 0
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["summary"] = json.loads(job["summary"]) if job["summary"] else None
+        return job
+
+    def list(self, ids=None, limit=50):
+        """Jobs newest first (only `ids`, if given)."""
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                return []
+            rows = self._conn().execute(
+                f"SELECT id FROM jobs WHERE id IN ({','.join('?' * len(ids))}) ORDER BY created DESC", ids)
+        else:
+            rows = self._conn().execute("SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+        return [self.get(row[0]) for row in rows.fetchall()]
+
+    def cancel_requested(self, job_id):
+        row = self._conn().execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def delete(self, job_id):
+        self._conn().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+def input_path(job_dir, fmt):
+    import columnar
+    return os.path.join(job_dir, "input" + columnar.EXTENSIONS[fmt])
+
+
+def output_path(job_dir, fmt):
+    import columnar
+    return os.path.join(job_dir, "output" + columnar.EXTENSIONS[fmt])
+
+
+def write_model(job_dir, model_key):
+    """Copies the files of a loaded registry version into `job_dir`; KeyError if it is gone."""
+    import compact
+    from preprocessing import spec_path_for
+    from registry import get_registry
+    artifacts = get_registry().artifacts(model_key)
+    if artifacts is None:
+        raise KeyError(f"Model version {model_key} is no longer loaded; load it again and resubmit.")
+    model_bytes, scaler_bytes, preprocess_bytes = artifacts
+    model_path = os.path.join(job_dir, "model" + (compact.EXTENSION if compact.is_compact(model_bytes) else ".pkl"))
+    for path, data in ((model_path, model_bytes), (os.path.join(job_dir, "scaler.pkl"), scaler_bytes),
+                       (spec_path_for(model_path), preprocess_bytes)):
+        if data is not None:
+            with open(path, "wb") as f:
+                f.write(data)
+
+
+def load_model(job_dir):
+    """The ModelVersion written by write_model(), through the registry."""
+    import compact
+    from registry import get_registry
+    model_path = os.path.join(job_dir, "model.pkl")
+    if not os.path.exists(model_path):
+        model_path = os.path.join(job_dir, "model" + compact.EXTENSION)
+    scaler_path = os.path.join(job_dir, "scaler.pkl")
+    return get_registry().load_files(model_path, scaler_path if os.path.exists(scaler_path) else None)
+
+
+# -------------------- Worker --------------------
+def run_job(root, job_id):
+    """Scores one job in the calling process; used by the pool workers."""
+    import batch
+    from prediction_log import get_log
+    from results import BatchResults
+
+    store = JobStore(root)
+    job = store.get(job_id)
+    if job is None or job["status"] not in ACTIVE:
+        return
+    if job["cancel"]:
+        store.finish(job_id, CANCELLED)
+        return
+    store.update(job_id, status=RUNNING, started=time.time(), worker_pid=os.getpid(), rows=0, fraction=0.0)
+    job_dir = store.job_dir(job_id)
+    out_path = output_path(job_dir, job["out_fmt"])
+    try:
+        version = load_model(job_dir)
+        results = BatchResults(os.path.join(job_dir, "results"))
+        source_path = input_path(job_dir, job["in_fmt"])
+        # CSV is read through a file object so progress can follow its position
+        source = open(source_path, "rb") if job["in_fmt"] == "csv" else source_path
+        try:
+            with open(out_path, "wb") as out:
+                stats, reported = None, 0.0
+                for stats in batch.iter_score(source, version.model, out, job["in_fmt"], job["out_fmt"],
+                                              preprocessor=version.preprocessor, prediction_log=get_log(),
+                                              model_key=job["model_key"], explain=bool(job["explain"]),
+                                              results=results):
+                    now = time.monotonic()
+                    if now - reported >= PROGRESS_INTERVAL:
+                        reported = now
+                        if store.cancel_requested(job_id):
+                            raise JobCancelled()
+                        store.update(job_id, rows=stats["rows"], fraction=stats["fraction"],
+                                     rows_per_sec=stats["rows_per_sec"])
+        finally:
+            if source is not source_path:
+                source.close()
+            results.close()
+        summary = None
+        if stats is not None:
+            summary = {key: stats[key] for key in ("rows", "elapsed", "rows_per_sec", "positives", "invalid_rows")}
+            summary["validation"] = stats["validation"].to_dict()
+        store.finish(job_id, DONE, rows=results.rows, fraction=1.0,
+                     rows_per_sec=summary["rows_per_sec"] if summary else 0.0,
+                     summary=json.dumps(summary) if summary else None)
+    except JobCancelled:
+        store.finish(job_id, CANCELLED)
+        shutil.rmtree(os.path.join(job_dir, "results"), ignore_errors=True)
+        if os.path.exists(out_path):
+            os.remove(out_path)
+    except Exception as e:
+        store.finish(job_id, FAILED, error=e.args[0] if isinstance(e, KeyError) else f"{type(e).__name__}: {e}")
+
+
+# -------------------- Queue --------------------
+class JobQueue:
+    """Submits jobs to a pool of `workers` spawned processes."""
+
+    def __init__(self, root=JOBS_DIR, workers=DEFAULT_WORKERS):
+        self.root = root
+        self.workers = max(1, workers)
+        self.store = JobStore(root)
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._recovered = False
+        self._prune()
+
+    def _submit(self, job_id):
+        with self._lock:
+            if self._pool is None:
+                # spawned rather than forked: the Streamlit process has threads (and locks) of its own
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            future = self._pool.submit(run_job, self.root, job_id)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._done(job_id, f))
+
+    def _done(self, job_id, future):
+        self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            # the worker died (e.g. killed or out of memory); the next submit starts a fresh pool
+            self.store.finish(job_id, FAILED, error=f"{type(error).__name__}: {error}")
+            if isinstance(error, BrokenProcessPool):
+                with self._lock:
+                    self._pool = None
+
+    def submit(self, source, name, model_key, in_fmt="csv", out_fmt=None, explain=False):
+        """
+        Copies `source` (a path or an in-memory upload) and the files of the
+        registry version `model_key` into a new job directory and queues it.
+        Returns the job id; KeyError if the version is no longer loaded.
+        """
+        self.recover()
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.store.job_dir(job_id)
+        os.makedirs(job_dir)
+        try:
+            write_model(job_dir, model_key)
+        except KeyError:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        target = input_path(job_dir, in_fmt)
+        if isinstance(source, (str, os.PathLike)):
+            shutil.copyfile(source, target)
+        else:
+            getbuffer = getattr(source, "getbuffer", None)
+            with open(target, "wb") as f:
+                if getbuffer is not None:
+                    f.write(getbuffer())
+                else:
+                    source.seek(0)
+                    shutil.copyfileobj(source, f)
+        self.store.create(job_id, name, in_fmt, out_fmt or in_fmt, explain, model_key)
+        self._submit(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancels a queued job at once; a running one stops after its current chunk."""
+        self.store.update(job_id, cancel=1)
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self.store.finish(job_id, CANCELLED)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def jobs(self, ids=None):
+        return self.store.list(ids)
+
+    def output_path(self, job_id):
+        job = self.store.get(job_id)
+        return output_path(self.store.job_dir(job_id), job["out_fmt"])
+
+    def results(self, job_id):
+        """The finished job's results (results.BatchResults, memory-mapped)."""
+        from results import BatchResults
+        return BatchResults.load(os.path.join(self.store.job_dir(job_id), "results"))
+
+    def recover(self):
+        """
+        Re-queues jobs whose submitting or running process has gone away.
+        Runs once per queue; only processes that will stay up to run the jobs
+        should call it.
+        """
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+        for job in self.store.list(limit=1000):
+            if job["status"] == QUEUED and not _alive(job["queue_pid"]):
+                pass
+            elif job["status"] == RUNNING and not _alive(job["worker_pid"]) and not _alive(job["queue_pid"]):
+                self.store.update(job["id"], status=QUEUED)
+            else:
+                continue
+            self.store.update(job["id"], queue_pid=os.getpid())
+            self._submit(job["id"])
+
+    def _prune(self):
+        cutoff = time.time() - KEEP_DAYS * 86400
+        for job in self.store.list(limit=1000):
+            if job["status"] not in ACTIVE and (job["finished"] or job["created"]) < cutoff:
+                self.store.delete(job["id"])
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=not wait)
+                self._pool = None
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Returns the process-wide job queue (workers start on the first submit)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def main(argv=None):
+    import columnar
+    from registry import BUNDLED_MODEL, BUNDLED_SCALER, get_registry
+
+    parser = argparse.ArgumentParser(description="Background batch scoring jobs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    submit = sub.add_parser("submit", help="queue a file and wait for it to finish")
+    submit.add_argument("input")
+    submit.add_argument("--format", choices=list(columnar.EXTENSIONS), default=None, help="output format")
+    submit.add_argument("--model", default=None, help="model file (default: bundled model.pkl)")
+    submit.add_argument("--explain", action="store_true")
+    sub.add_parser("list", help="recent jobs")
+    cancel = sub.add_parser("cancel")
+    cancel.add_argument("job_id")
+    args = parser.parse_args(argv)
+
+    queue = get_queue()
+    if args.command == "submit":
+        registry = get_registry()
+        version = registry.load_files(args.model) if args.model else registry.load_files(BUNDLED_MODEL, BUNDLED_SCALER)
+        fmt = columnar.format_for(args.input)
+        job_id = queue.submit(args.input, os.path.basename(args.input), version.key, fmt, args.format, args.explain)
+        print(f"job {job_id}")
+        while (job := queue.get(job_id))["status"] in ACTIVE:
+            print(f"\r{job['status']:<9} {job['rows']:,} rows", end="", flush=True)
+            time.sleep(0.5)
+        print(f"\r{job['status']:<9} {job['rows']:,} rows" + (f" -> {queue.output_path(job_id)}" if job["status"] == DONE
+                                                          else f" {job['error'] or ''}"))
+        queue.shutdown()
+        return 0 if job["status"] == DONE else 1
+    if args.command == "cancel":
+        queue.cancel(args.job_id)
+        return 0
+    for job in queue.jobs():
+        rate = f", {job['rows_per_sec']:,.0f} rows/s" if job["rows_per_sec"] else ""
+        print(f"{job['id']}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(job['created']))}  {job['status']:<9} "
+              f"{job['name']:<24} {job['rows']:,} rows{rate}" + (f"  {job['error']}" if job["error"] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Load generator for server.py.
+
+Opens --concurrency keep-alive connections and sends single-patient
+/predict requests (rows sampled from diabetes.csv) for --duration seconds,
+then prints throughput and p50/p90/p99 latency as JSON.
+
+    python server.py &
+    python loadgen.py --concurrency 64 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from scoring import DATA_PATH, FEATURES, load_data
+
+
+def load_payloads(path=DATA_PATH, limit=1000):
+    X, _ = load_data(path)
+    return [json.dumps(dict(zip(FEATURES, row))).encode() for row in X[:limit].tolist()]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def _client(host, port, path, payloads, stop_at, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop_at:
+            body = random.choice(payloads)
+            started = time.perf_counter()
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            if b" 200 " in status:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(host, port, concurrency, duration, path="/predict"):
+    payloads = load_payloads()
+    latencies, errors = [], []
+    started = time.perf_counter()
+    stop_at = started + duration
+    await asyncio.gather(*[_client(host, port, path, payloads, stop_at, latencies, errors)
+                           for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": 1000.0 * percentile(latencies, 50),
+        "p90_ms": 1000.0 * percentile(latencies, 90),
+        "p99_ms": 1000.0 * percentile(latencies, 99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the inference server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.host, args.port, args.concurrency, args.duration)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+In-process timing and counters for the hot paths, exported in the
+Prometheus text format.
+
+    with span("predict", path="kernel"):    # -> diabetes_span_seconds{span="predict",path="kernel"}
+        ...
+    count("rows", rows, stage="predict")    # -> diabetes_rows_total{stage="predict"}
+
+Spans land in one histogram family with a `span` label, so model loading,
+preprocessing, prediction, batch parse/export and page rendering can be
+compared side by side. Recording a span is two perf_counter() calls and a
+bucket increment under a lock (about 2us); DIABETES_METRICS=0
+turns it into a no-op.
+
+Export (see export_from_env, called at the end of every app rerun):
+    DIABETES_METRICS_PORT=9108          serve /metrics from a daemon thread
+    DIABETES_METRICS_FILE=metrics.prom  rewrite the file atomically
+server.py also serves GET /metrics.
+
+Profiling is opt-in per run: Profiler("cprofile") wraps cProfile,
+Profiler("sampling") samples the calling thread's stack every few
+milliseconds from a helper thread (much lower overhead, coarser).
+
+    python metrics.py profile scoring.py diabetes.csv -o /tmp/out.csv
+"""
+import argparse
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PREFIX = "diabetes_"
+ENABLED = os.environ.get("DIABETES_METRICS", "1") != "0"
+# seconds; the render and predict paths sit in the sub-millisecond buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SAMPLE_INTERVAL = 0.005
+
+
+_label_keys = {}
+
+
+def _label_key(labels):
+    """Canonical (sorted, stringified) label tuple, memoised since the hot paths reuse a few label sets."""
+    raw = tuple(labels.items())
+    key = _label_keys.get(raw)
+    if key is None:
+        key = _label_keys[raw] = tuple(sorted((k, str(v)) for k, v in raw))
+    return key
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-th observation (inf past the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+
+class _Span:
+    __slots__ = ("metrics", "key", "started")
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe_key(self.key, time.perf_counter() - self.started)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Metrics:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, label key) -> float
+        self._histograms = {}  # (name, label key) -> Histogram
+        self.started = time.time()
+
+    def span(self, name, **labels):
+        """Context manager timing its body into diabetes_span_seconds{span=name, ...}."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, ("span_seconds", _label_key({"span": name, **labels})))
+
+    def observe(self, name, seconds, **labels):
+        """Records a duration measured elsewhere, as if it were a span."""
+        if self.enabled:
+            self._observe_key(("span_seconds", _label_key({"span": name, **labels})), seconds)
+
+    def _observe_key(self, key, value):
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def count(self, name, value=1, **labels):
+        """Adds `value` to the counter diabetes_<name>_total{...}."""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timed_iter(self, iterable, name, **labels):
+        """Yields from `iterable`, timing each next() (e.g. CSV parsing of one chunk)."""
+        it = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter() - started, **labels)
+            yield item
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # -------------------- Export --------------------
+    def summary(self):
+        """[{span, labels, count, total_ms, mean_ms, p50_ms, p99_ms}] sorted by total time."""
+        with self._lock:
+            items = [(dict(key), hist.count, hist.sum, hist.quantile(0.5), hist.quantile(0.99))
+                     for (_, key), hist in self._histograms.items()]
+        rows = []
+        for labels, n, total, p50, p99 in items:
+            name = labels.pop("span")
+            rows.append({"span": name, "labels": ",".join(f"{k}={v}" for k, v in labels.items()),
+                         "count": n, "total_ms": 1000.0 * total, "mean_ms": 1000.0 * total / n,
+                         "p50_ms": 1000.0 * p50, "p99_ms": 1000.0 * p99})
+        return sorted(rows, key=lambda r: -r["total_ms"])
+
+    def to_prometheus(self):
+        """Everything recorded so far in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items())
+        lines = []
+        seen = set()
+        for (name, key), value in counters:
+            metric = f"{PREFIX}{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(key)} {value:g}")
+        for (name, key), counts, total, n in histograms:
+            metric = f"{PREFIX}{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} Wall time of instrumented spans.")
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, c in zip(list(BUCKETS) + ["+Inf"], counts):
+                cumulative += c
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', bound if bound == '+Inf' else f'{bound:g}')])} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {total:.9g}")
+            lines.append(f"{metric}_count{_format_labels(key)} {n}")
+        lines.append(f"# TYPE {PREFIX}process_start_time_seconds gauge")
+        lines.append(f"{PREFIX}process_start_time_seconds {self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes to_prometheus() to `path` atomically (for node_exporter's textfile collector)."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+_metrics = Metrics()
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_metrics():
+    """Returns the process-wide metrics."""
+    return _metrics
+
+
+def span(name, **labels):
+    return _metrics.span(name, **labels)
+
+
+def count(name, value=1, **labels):
+    _metrics.count(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    _metrics.observe(name, seconds, **labels)
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serves GET /metrics from a daemon thread; only the first call starts a server."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                data = _metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
+
+
+def export_from_env():
+    """Starts the endpoint / rewrites the file named by DIABETES_METRICS_PORT / DIABETES_METRICS_FILE."""
+    port = os.environ.get("DIABETES_METRICS_PORT")
+    if port:
+        try:
+            start_http_server(int(port))
+        except OSError:
+            pass  # another process (e.g. a second Streamlit server) owns the port
+    path = os.environ.get("DIABETES_METRICS_FILE")
+    if path:
+        _metrics.write(path)
+
+
+# -------------------- Profiling --------------------
+class Profiler:
+    """
+    Opt-in profiler for one run: start(), stop(), then report() for the top
+    `limit` entries as text. "cprofile" is deterministic; "sampling" counts
+    the calling thread's stacks every SAMPLE_INTERVAL seconds.
+    """
+
+    def __init__(self, kind="cprofile", limit=25):
+        if kind not in ("cprofile", "sampling"):
+            raise ValueError(f"Unknown profiler {kind!r}")
+        self.kind = kind
+        self.limit = limit
+        self.seconds = 0.0
+        self._profile = None
+        self._samples = Counter()
+        self._leaves = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.kind == "cprofile":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            target = threading.get_ident()
+            self._thread = threading.Thread(target=self._sample, args=(target,), name="sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self, target):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            self._leaves[self._where(frame)] += 1
+            seen = set()
+            while frame is not None:
+                where = self._where(frame)
+                if where not in seen:
+                    seen.add(where)
+                    self._samples[where] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def _where(frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self._started
+        if self._profile is not None:
+            self._profile.disable()
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def report(self):
+        if self._profile is not None:
+            import io
+            import pstats
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.limit)
+            return out.getvalue()
+        total = sum(self._leaves.values())
+        if not total:
+            return f"no samples in {self.seconds * 1000:.0f}ms"
+        lines = [f"{total} samples every {SAMPLE_INTERVAL * 1000:g}ms over {self.seconds * 1000:.0f}ms",
+                 f"{'cumulative':>10} {'self':>6}  function"]
+        for where, n in self._samples.most_common(self.limit):
+            lines.append(f"{100.0 * n / total:9.1f}% {100.0 * self._leaves[where] / total:5.1f}%  {where}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    import runpy
+
+    parser = argparse.ArgumentParser(description="Profile a script and print its spans.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prof = sub.add_parser("profile", help="run a script under a profiler, then print the report and spans")
+    prof.add_argument("--kind", choices=["cprofile", "sampling"], default="cprofile")
+    prof.add_argument("--limit", type=int, default=25)
+    prof.add_argument("--prometheus", action="store_true", help="print the Prometheus text instead of a span table")
+    prof.add_argument("script")
+    prof.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    profiler = Profiler(args.kind, args.limit).start()
+    try:
+        runpy.run_path(args.script, run_name="__main__")
+    except SystemExit:
+        pass
+    finally:
+        profiler.stop()
+    print(profiler.report())
+    if args.prometheus:
+        print(_metrics.to_prometheus())
+    else:
+        for row in _metrics.summary():
+            print(f"{row['span']:<16} {row['labels']:<32} n={row['count']:<7} total={row['total_ms']:9.1f}ms "
+                  f"mean={row['mean_ms']:8.3f}ms p99<={row['p99_ms']:g}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
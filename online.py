@@ -0,0 +1,336 @@
+"""
+Incremental model updates from newly labelled outcomes.
+
+An SGD logistic regression (SGDClassifier(loss="log_loss")) is updated with
+partial_fit, and a StandardScaler keeps running statistics with its own
+partial_fit, so an update costs O(batch rows) no matter how much data came
+before. Zeros are imputed with the bundled training means first, as at
+inference.
+
+Every update writes an immutable snapshot in the registry's file format:
+
+    online_models/
+        v000001/ model.pkl  scaler.pkl  model.preprocess.json  meta.json
+        v000002/ ...
+        LATEST              name of the newest snapshot
+
+The apps call latest_key() / latest_version() on each rerun; they only read
+LATEST (and meta.json), so a new snapshot is picked up on the next
+interaction without a restart.
+
+    python online.py init                  # bootstrap from diabetes.csv
+    python online.py update labelled.csv   # any batch format with an Outcome column
+    python online.py status
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+import validation
+from preprocessing import Preprocessor
+from registry import BUNDLED_PREPROCESS, content_key, get_registry
+from scoring import APP_DIR, DATA_PATH, DEFAULT_CHUNK_ROWS, load_data
+
+ONLINE_DIR = os.environ.get("DIABETES_ONLINE_DIR", os.path.join(APP_DIR, "online_models"))
+LATEST = "LATEST"
+
+# snapshots kept on disk; older ones are pruned after each update
+DEFAULT_KEEP = 20
+SEED = 42
+# a small constant step keeps single-outcome updates from swinging the model
+SGD_PARAMS = {"loss": "log_loss", "alpha": 1e-3, "learning_rate": "constant", "eta0": 0.01, "random_state": SEED}
+CLASSES = np.array([0, 1])
+
+
+def _bundled_means():
+    if not os.path.exists(BUNDLED_PREPROCESS):
+        return None
+    with open(BUNDLED_PREPROCESS, "rb") as f:
+        return Preprocessor.from_bytes(f.read()).impute_means
+
+
+class OnlineLearner:
+    def __init__(self, root=ONLINE_DIR, keep=DEFAULT_KEEP):
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+        # (snapshot name, model, scaler, meta) of the newest snapshot this process has seen
+        self._state = None
+
+    # -------------------- Snapshots --------------------
+    def latest_name(self):
+        try:
+            with open(os.path.join(self.root, LATEST)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def latest_path(self):
+        name = self.latest_name()
+        return os.path.join(self.root, name, "model.pkl") if name else None
+
+    def snapshots(self):
+        """meta.json of every snapshot on disk, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        metas = []
+        for name in sorted(n for n in os.listdir(self.root) if n.startswith("v")):
+            try:
+                with open(os.path.join(self.root, name, "meta.json")) as f:
+                    metas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return metas
+
+    def _load(self):
+        name = self.latest_name()
+        if name is None:
+            raise FileNotFoundError(f"No online model in {self.root}; run `python online.py init` first")
+        if self._state is None or self._state[0] != name:
+            snapshot = os.path.join(self.root, name)
+            with open(os.path.join(snapshot, "model.pkl"), "rb") as f:
+                model = pickle.load(f)
+            with open(os.path.join(snapshot, "scaler.pkl"), "rb") as f:
+                scaler = pickle.load(f)
+            with open(os.path.join(snapshot, "meta.json")) as f:
+                meta = json.load(f)
+            self._state = (name, model, scaler, meta)
+        return self._state
+
+    def _write(self, model, scaler, means, meta):
+        """Writes a new snapshot and moves LATEST to it; returns the model.pkl path."""
+        os.makedirs(self.root, exist_ok=True)
+        name = f"v{meta['version']:06d}"
+        final = os.path.join(self.root, name)
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        model_bytes = pickle.dumps(model)
+        with open(os.path.join(tmp, "model.pkl"), "wb") as f:
+            f.write(model_bytes)
+        with open(os.path.join(tmp, "scaler.pkl"), "wb") as f:
+            pickle.dump(scaler, f)
+        Preprocessor.from_scaler(scaler, means).save(os.path.join(tmp, "model.preprocess.json"))
+        # the registry key latest_version() will load it under, so latest_key() needn't unpickle
+        meta = dict(meta, key=_snapshot_key(tmp, model_bytes))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, final)
+        pointer = os.path.join(self.root, LATEST + ".tmp")
+        with open(pointer, "w") as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(self.root, LATEST))
+        self._state = (name, model, scaler, meta)
+        self._prune()
+        return os.path.join(final, "model.pkl")
+
+    def _prune(self):
+        names = sorted(n for n in os.listdir(self.root) if n.startswith("v") and not n.endswith(".tmp"))
+        for name in names[:-self.keep]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    # -------------------- Training --------------------
+    @staticmethod
+    def _clean(X, y):
+        """Drops rows failing validation or without a 0/1 label."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        keep = ~validation.check(X).any(axis=1) & np.isin(y, CLASSES)
+        return X[keep], y[keep].astype(np.int64)
+
+    def bootstrap(self, data_path=DATA_PATH, epochs=5, batch_rows=64):
+        """Starts a new lineage: a few partial_fit passes over `data_path` in small batches."""
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.preprocessing import StandardScaler
+        X, y = self._clean(*load_data(data_path))
+        means = _bundled_means()
+        X = Preprocessor(means).transform(X)
+        scaler = StandardScaler().fit(X)
+        Xs = scaler.transform(X)
+        model = SGDClassifier(**SGD_PARAMS)
+        rng = np.random.default_rng(SEED)
+        for _ in range(epochs):
+            order = rng.permutation(len(Xs))
+            for start in range(0, len(order), batch_rows):
+                idx = order[start:start + batch_rows]
+                model.partial_fit(Xs[idx], y[idx], classes=CLASSES)
+        meta = {
+            "version": self._next_version(),
+            "parent": None,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "source": os.path.basename(data_path),
+            "batch_rows": int(len(y)),
+            "samples_seen": int(len(y)),
+            "impute_means": means,
+        }
+        with self._lock:
+            return self._write(model, scaler, means, meta)
+
+    def _next_version(self):
+        versions = [m["version"] for m in self.snapshots()]
+        return max(versions, default=0) + 1
+
+    def update(self, X, y, source="batch"):
+        """
+        Updates the latest snapshot with one labelled batch (raw features in
+        FEATURES order, 0/1 outcomes) and writes the result as a new snapshot.
+        Returns the new model.pkl path, or None if no row was usable.
+        """
+        return self.update_blocks([(X, y)], source)
+
+    def update_blocks(self, blocks, source="batch"):
+        """
+        update() over an iterable of (X, y) blocks: one partial_fit per block,
+        a single snapshot at the end. Each block is scored with the model
+        before it is trained on, and meta.json records that
+        test-then-train accuracy.
+        """
+        with self._lock:
+            name, model, scaler, meta = self._load()
+            model, scaler = pickle.loads(pickle.dumps((model, scaler)))  # the loaded snapshot stays immutable
+            means = meta.get("impute_means")
+            pre = Preprocessor(means)
+            rows = correct = 0
+            for X, y in blocks:
+                X, y = self._clean(X, y)
+                if not len(y):
+                    continue
+                X = pre.transform(X)
+                correct += int((model.predict(scaler.transform(X)) == y).sum())
+                scaler.partial_fit(X)
+                model.partial_fit(scaler.transform(X), y, classes=CLASSES)
+                rows += len(y)
+            if not rows:
+                return None
+            new_meta = {
+                "version": meta["version"] + 1,
+                "parent": name,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "source": source,
+                "batch_rows": rows,
+                "samples_seen": int(meta["samples_seen"] + rows),
+                "accuracy_before_update": correct / rows,
+                "impute_means": means,
+            }
+            return self._write(model, scaler, means, new_meta)
+
+    def update_from(self, source, fmt="csv", chunk_rows=DEFAULT_CHUNK_ROWS, name="batch"):
+        """update_blocks() over a batch file with an Outcome column, chunk by chunk."""
+        import columnar
+
+        def blocks():
+            for block in columnar.iter_blocks(source, fmt, chunk_rows):
+                outcomes = columnar.outcomes_of(block)
+                if outcomes is None:
+                    raise KeyError("Missing columns: Outcome")
+                yield columnar.feature_matrix(block)[0], outcomes
+
+        return self.update_blocks(blocks(), name)
+
+
+def _snapshot_key(snapshot, model_bytes=None):
+    """Registry key of a snapshot as registry.load_files(<snapshot>/model.pkl) computes it."""
+    if model_bytes is None:
+        with open(os.path.join(snapshot, "model.pkl"), "rb") as f:
+            model_bytes = f.read()
+    spec_path = os.path.join(snapshot, "model.preprocess.json")
+    spec_bytes = None
+    if os.path.exists(spec_path):
+        with open(spec_path, "rb") as f:
+            spec_bytes = f.read()
+    return content_key(model_bytes, None, spec_bytes)
+
+
+_learner = None
+_learner_lock = threading.Lock()
+# snapshot model.pkl path -> registry key (snapshots never change once written)
+_keys = {}
+
+
+def get_learner():
+    """Returns the process-wide online learner."""
+    global _learner
+    with _learner_lock:
+        if _learner is None:
+            _learner = OnlineLearner()
+        return _learner
+
+
+def latest_key():
+    """
+    Registry key of the newest snapshot without deserialising it (read from
+    its meta.json, hashed for snapshots written before the key was recorded),
+    or None if there is no snapshot.
+    """
+    path = get_learner().latest_path()
+    if path is None:
+        return None
+    if path not in _keys:
+        snapshot = os.path.dirname(path)
+        try:
+            with open(os.path.join(snapshot, "meta.json")) as f:
+                key = json.load(f).get("key")
+        except (OSError, ValueError):
+            key = None
+        try:
+            _keys[path] = key or _snapshot_key(snapshot)
+        except OSError:
+            return None
+    return _keys[path]
+
+
+def latest_version(registry=None):
+    """ModelVersion of the newest snapshot (loaded through the registry), or None."""
+    path = get_learner().latest_path()
+    if path is None:
+        return None
+    registry = registry or get_registry()
+    version = registry.get(_keys[path]) if path in _keys else None
+    if version is None:
+        version = registry.load_files(path)
+        _keys[path] = version.key
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally updated SGD logistic regression.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    init = sub.add_parser("init", help="bootstrap a new snapshot lineage from labelled data")
+    init.add_argument("--data", default=DATA_PATH)
+    init.add_argument("--epochs", type=int, default=5)
+    update = sub.add_parser("update", help="update the latest snapshot with a labelled batch file")
+    update.add_argument("input", help="CSV/Parquet/Arrow file with the feature columns and Outcome")
+    sub.add_parser("status", help="list snapshots")
+    args = parser.parse_args(argv)
+
+    learner = get_learner()
+    if args.command == "init":
+        print(f"wrote {learner.bootstrap(args.data, args.epochs)}")
+    elif args.command == "update":
+        import columnar
+        try:
+            path = learner.update_from(args.input, columnar.format_for(args.input), name=os.path.basename(args.input))
+        except (KeyError, FileNotFoundError) as e:
+            print(f"error: {e.args[0] if isinstance(e, KeyError) else e}", file=sys.stderr)
+            return 2
+        print(f"wrote {path}" if path else "no usable labelled rows")
+    else:
+        latest = learner.latest_name()
+        for meta in learner.snapshots():
+            marker = "*" if f"v{meta['version']:06d}" == latest else " "
+            acc = meta.get("accuracy_before_update")
+            print(f"{marker} v{meta['version']:06d} {meta['created']} {meta['source']:<24} "
+                  f"+{meta['batch_rows']:,} rows, {meta['samples_seen']:,} seen"
+                  + (f", accuracy before update {acc:.3f}" if acc is not None else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
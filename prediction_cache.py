@@ -0,0 +1,119 @@
+"""
+Memoised predictions for repeated patients.
+
+Streamlit reruns the whole script on every widget change and staff often
+re-score the same patient, so results are cached per (model version,
+quantized feature row) in a process-wide LRU with a TTL. Large blocks skip
+the per-row lookups and rely on scoring.predict_unique() instead.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import count
+from scoring import predict, predict_unique
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("DIABETES_PREDICTION_CACHE_SIZE", "10000"))
+DEFAULT_TTL = float(os.environ.get("DIABETES_PREDICTION_CACHE_TTL", "3600"))
+# features are rounded to this many decimals before keying (DPF has 3)
+DEFAULT_DECIMALS = 4
+# blocks larger than this are not looked up row by row
+MAX_LOOKUP_ROWS = 256
+
+
+class PredictionCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, decimals=DEFAULT_DECIMALS):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def keys_for(self, model_key, X):
+        rounded = np.round(np.asarray(X, dtype=np.float64), self.decimals) + 0.0  # folds -0.0 into 0.0
+        return [(model_key, tuple(row)) for row in rounded.tolist()]
+
+    def predict(self, model_key, model, X, preprocessor=None):
+        """
+        predict() with memoisation. Returns (labels, probabilities) exactly
+        like scoring.predict; only rows missing from the cache reach the model.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if model_key is None or len(X) > MAX_LOOKUP_ROWS:
+            return predict_unique(model, X, preprocessor)
+
+        keys = self.keys_for(model_key, X)
+        now = time.monotonic()
+        found = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found[i] = entry
+
+        missing = [i for i, entry in enumerate(found) if entry is None]
+        count("prediction_cache_lookups", len(found) - len(missing), result="hit")
+        count("prediction_cache_lookups", len(missing), result="miss")
+        if missing:
+            labels, proba = predict(model, X[missing], preprocessor)
+            expires = now + self.ttl
+            with self._lock:
+                for j, i in enumerate(missing):
+                    entry = (expires, labels[j], None if proba is None else proba[j])
+                    found[i] = entry
+                    self._entries[keys[i]] = entry
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        labels = np.array([entry[1] for entry in found])
+        if any(entry[2] is None for entry in found):
+            return labels, None
+        return labels, np.array([entry[2] for entry in found], dtype=np.float64)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide prediction cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache()
+        return _cache
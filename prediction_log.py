@@ -0,0 +1,189 @@
+"""
+Append-only prediction log backed by SQLite in WAL mode.
+
+Every scored patient is appended to `predictions` with one executemany per
+call. The same transaction also updates per-day counters (`daily_stats`) and
+all-time counters (`totals`), so the Home page reads a single row plus at most
+30 daily rows no matter how many predictions have been logged. When the
+caller passes the feature rows, per-day drift aggregates (drift.py) are
+updated in that transaction too.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import drift
+from scoring import APP_DIR
+
+DEFAULT_PATH = os.environ.get("DIABETES_PREDICTION_LOG", os.path.join(APP_DIR, "predictions.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    model_key TEXT,
+    label INTEGER NOT NULL,
+    probability REAL,
+    outcome INTEGER
+);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    high_risk INTEGER NOT NULL DEFAULT 0,
+    labelled INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL DEFAULT 0,
+    high_risk INTEGER NOT NULL DEFAULT 0,
+    labelled INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO totals (id) VALUES (1);
+"""
+
+_BUMP_DAY = """
+INSERT INTO daily_stats (day, total, high_risk, labelled, correct) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(day) DO UPDATE SET
+    total = total + excluded.total,
+    high_risk = high_risk + excluded.high_risk,
+    labelled = labelled + excluded.labelled,
+    correct = correct + excluded.correct
+"""
+_BUMP_TOTALS = """
+UPDATE totals SET total = total + ?, high_risk = high_risk + ?,
+                  labelled = labelled + ?, correct = correct + ? WHERE id = 1
+"""
+
+
+class PredictionLog:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA + drift.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # one connection per thread; WAL lets readers run alongside the writer
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def log(self, labels, probabilities=None, model_key=None, source="single", outcomes=None, ts=None,
+            features=None):
+        """
+        Appends one row per prediction and updates the counters. `outcomes`
+        (confirmed 0/1, NaN/None where unknown) may be given for labelled
+        batches, `features` (the raw rows, FEATURES order) for drift
+        monitoring. Returns the id of the first inserted row.
+        """
+        labels = np.asarray(labels).astype(np.int64).reshape(-1)
+        n = len(labels)
+        if n == 0:
+            return None
+        ts = time.time() if ts is None else ts
+        day = datetime.fromtimestamp(ts).date().isoformat()
+        proba = [None] * n if probabilities is None else np.asarray(probabilities, dtype=np.float64).tolist()
+        if outcomes is None:
+            known = np.zeros(n, dtype=bool)
+            outcome_values = [None] * n
+        else:
+            outcomes = np.asarray(outcomes, dtype=np.float64).reshape(-1)
+            known = ~np.isnan(outcomes)
+            outcome_values = [int(o) if k else None for o, k in zip(outcomes.tolist(), known.tolist())]
+
+        high_risk = int((labels == 1).sum())
+        labelled = int(known.sum())
+        correct = int((known & (outcomes == labels)).sum()) if outcomes is not None else 0
+        rows = zip([ts] * n, [day] * n, [source] * n, [model_key] * n, labels.tolist(), proba, outcome_values)
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions")
+            first_id = cur.fetchone()[0] + 1
+            conn.executemany(
+                "INSERT INTO predictions (ts, day, source, model_key, label, probability, outcome) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute(_BUMP_DAY, (day, n, high_risk, labelled, correct))
+            conn.execute(_BUMP_TOTALS, (n, high_risk, labelled, correct))
+            if features is not None:
+                drift.record(conn, day, features)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return first_id
+
+    def record_outcome(self, prediction_id, outcome):
+        """Stores the confirmed outcome for one logged prediction (replacing any earlier one)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT day, label, outcome FROM predictions WHERE id = ?",
+                               (prediction_id,)).fetchone()
+            if row is None:
+                raise KeyError(prediction_id)
+            day, label, previous = row
+            labelled = 0 if previous is not None else 1
+            correct = int(outcome == label) - (int(previous == label) if previous is not None else 0)
+            conn.execute("UPDATE predictions SET outcome = ? WHERE id = ?", (int(outcome), prediction_id))
+            conn.execute(_BUMP_DAY, (day, 0, 0, labelled, correct))
+            conn.execute(_BUMP_TOTALS, (0, 0, labelled, correct))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def home_metrics(self, window_days=30, today=None):
+        """
+        total / high_risk over all time, high_risk_window over the last
+        `window_days` days and accuracy over predictions with a recorded outcome.
+        """
+        conn = self._conn()
+        total, high_risk, labelled, correct = conn.execute(
+            "SELECT total, high_risk, labelled, correct FROM totals WHERE id = 1").fetchone()
+        since = ((today or date.today()) - timedelta(days=window_days - 1)).isoformat()
+        window_total, window_high = conn.execute(
+            "SELECT COALESCE(SUM(total), 0), COALESCE(SUM(high_risk), 0) FROM daily_stats WHERE day >= ?",
+            (since,)).fetchone()
+        return {
+            "total": total,
+            "high_risk": high_risk,
+            "window_days": window_days,
+            "window_total": window_total,
+            "high_risk_window": window_high,
+            "labelled": labelled,
+            "accuracy": correct / labelled if labelled else None,
+        }
+
+    def drift_report(self, days=drift.DEFAULT_DAYS, today=None):
+        """Feature drift of the last `days` days against diabetes.csv (see drift.report)."""
+        return drift.report(self._conn(), days, today)
+
+    def drift_timeline(self, days=drift.DEFAULT_DAYS, today=None):
+        """Per-day PSI of each feature over the last `days` days (see drift.timeline)."""
+        return drift.timeline(self._conn(), days, today)
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_log():
+    """Returns the process-wide prediction log."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = PredictionLog()
+        return _log
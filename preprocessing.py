@@ -0,0 +1,129 @@
+"""
+Inference-time preprocessing that matches the training notebook.
+
+Training treats zeros in Glucose, BloodPressure, SkinThickness, BMI and
+Insulin as missing and fills them with the column mean (computed over the
+non-zero values), optionally followed by a StandardScaler. The same steps are
+stored as a small JSON spec next to the model (model.pkl ->
+model.preprocess.json) and applied to whole blocks at once, without per-row
+Python loops.
+
+    python preprocessing.py build                       # bundled spec, no scaling
+    python preprocessing.py build --scaler scaler.pkl   # also fold in scaler stats
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from scoring import FEATURES
+
+FORMAT_VERSION = 1
+
+ZERO_AS_MISSING = ["Glucose", "BloodPressure", "SkinThickness", "BMI", "Insulin"]
+
+
+def spec_path_for(model_path):
+    """model.pkl -> model.preprocess.json (same directory)."""
+    return os.path.splitext(model_path)[0] + ".preprocess.json"
+
+
+class Preprocessor:
+    """
+    Zero-imputation followed by optional standardisation, over arrays in
+    FEATURES order. A Preprocessor() with no arguments passes data through.
+    """
+
+    def __init__(self, impute_means=None, mean=None, scale=None):
+        self.impute_means = dict(impute_means or {})
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self._impute_idx = np.array([FEATURES.index(c) for c in self.impute_means], dtype=np.intp)
+        self._impute_values = np.array(list(self.impute_means.values()), dtype=np.float64)
+
+    @property
+    def is_identity(self):
+        return not self.impute_means and self.mean is None and self.scale is None
+
+    def transform(self, X):
+        """Returns a new float64 array (float32 for float32 input); the input is never modified."""
+        X = np.array(X, dtype=np.float32 if getattr(X, "dtype", None) == np.float32 else np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(self._impute_idx):
+            block = X[:, self._impute_idx]
+            X[:, self._impute_idx] = np.where(block == 0, self._impute_values, block)
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+    # -------------------- Serialisation --------------------
+    def to_dict(self):
+        return {
+            "format_version": FORMAT_VERSION,
+            "features": FEATURES,
+            "impute_zero_with_mean": self.impute_means,
+            "scaler": None if self.mean is None and self.scale is None else {
+                "mean": None if self.mean is None else self.mean.tolist(),
+                "scale": None if self.scale is None else self.scale.tolist(),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, spec):
+        if spec.get("format_version", 1) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported preprocessing format {spec['format_version']}")
+        if spec.get("features", FEATURES) != FEATURES:
+            raise ValueError("Preprocessing spec was built for a different feature order")
+        scaler = spec.get("scaler") or {}
+        return cls(spec.get("impute_zero_with_mean"), scaler.get("mean"), scaler.get("scale"))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    @classmethod
+    def from_scaler(cls, scaler, impute_means=None):
+        """Wraps a fitted sklearn StandardScaler (mean_/scale_ may be None)."""
+        return cls(impute_means, getattr(scaler, "mean_", None), getattr(scaler, "scale_", None))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def fit_impute_means(df):
+    """Column means over non-zero values, as computed in the training notebook."""
+    return {c: float(df[c].replace(0, np.nan).mean()) for c in ZERO_AS_MISSING}
+
+
+def main(argv=None):
+    import pandas as pd
+    from registry import BUNDLED_MODEL, deserialize
+    from scoring import DATA_PATH, load_data
+
+    parser = argparse.ArgumentParser(description="Build the preprocessing spec stored next to a model.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--scaler", default=None, help="StandardScaler the model was trained behind")
+    parser.add_argument("--no-impute", action="store_true")
+    parser.add_argument("-o", "--output", default=spec_path_for(BUNDLED_MODEL))
+    args = parser.parse_args(argv)
+
+    means = None if args.no_impute else fit_impute_means(pd.DataFrame(load_data(args.data)[0], columns=FEATURES))
+    if args.scaler:
+        with open(args.scaler, "rb") as f:
+            pre = Preprocessor.from_scaler(deserialize(f.read()), means)
+    else:
+        pre = Preprocessor(means)
+    pre.save(args.output)
+    print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
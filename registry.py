@@ -0,0 +1,250 @@
+"""
+Process-wide model registry.
+
+Models are keyed by the content hash of the model file (plus its scaler and
+preprocessing spec, if any) so every Streamlit session that uploads the same
+bytes shares one deserialised object. Versions are kept in LRU order and the least recently
+used one is dropped once more than `max_versions` are loaded.
+"""
+import hashlib
+import io
+import os
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+
+import compact
+from metrics import count, span
+from preprocessing import Preprocessor, spec_path_for
+from scoring import APP_DIR
+
+BUNDLED_MODEL = os.path.join(APP_DIR, "model.pkl")
+BUNDLED_SCALER = os.path.join(APP_DIR, "scaler.pkl")
+BUNDLED_PREPROCESS = spec_path_for(BUNDLED_MODEL)
+
+DEFAULT_MAX_VERSIONS = int(os.environ.get("DIABETES_MODEL_CACHE_SIZE", "4"))
+# seconds between the end of the first script run and the background model load
+PRELOAD_DELAY = 2.0
+
+ModelVersion = namedtuple("ModelVersion", ["key", "model", "scaler", "preprocessor"])
+
+
+def content_key(model_bytes, scaler_bytes=None, preprocess_bytes=None):
+    """Short, stable id for a model/scaler/preprocessing triple."""
+    h = hashlib.sha256(model_bytes)
+    if scaler_bytes is not None:
+        h.update(b"\0scaler\0")
+        h.update(scaler_bytes)
+    if preprocess_bytes is not None:
+        h.update(b"\0preprocess\0")
+        h.update(preprocess_bytes)
+    return h.hexdigest()[:16]
+
+
+def deserialize(data):
+    """
+    Loads a compact .npmodel (never unpickled, see compact.py) or a pickled
+    object, falling back to joblib (some users save with it).
+    """
+    if compact.is_compact(data):
+        return compact.loads(data)
+    try:
+        return pickle.loads(data)
+    except Exception as e:
+        import joblib
+        try:
+            return joblib.load(io.BytesIO(data))
+        except Exception as e2:
+            raise ValueError(f"{e} / {e2}") from e2
+
+
+def _read_optional(path):
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def build_preprocessor(scaler=None, preprocess_bytes=None):
+    """
+    An explicit spec wins; otherwise impute with the bundled means and apply
+    `scaler` (if one was supplied with the model).
+    """
+    if preprocess_bytes is not None:
+        return Preprocessor.from_bytes(preprocess_bytes)
+    bundled = _read_optional(BUNDLED_PREPROCESS)
+    means = Preprocessor.from_bytes(bundled).impute_means if bundled is not None else None
+    if scaler is not None:
+        return Preprocessor.from_scaler(scaler, means)
+    return Preprocessor(means)
+
+
+class ModelRegistry:
+    def __init__(self, max_versions=DEFAULT_MAX_VERSIONS):
+        self.max_versions = max(1, max_versions)
+        self._versions = OrderedDict()
+        # key -> the files a version was loaded from, or its bytes if it came from an upload
+        self._origins = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bundled_key = None
+        self._peeked = None
+        self._preload = None
+
+    def load_bytes(self, model_bytes, scaler_bytes=None, preprocess_bytes=None, _paths=None):
+        """Returns the ModelVersion for these bytes, deserialising only on a miss."""
+        key = content_key(model_bytes, scaler_bytes, preprocess_bytes)
+        with self._lock:
+            version = self._versions.get(key)
+            if version is not None:
+                self._versions.move_to_end(key)
+                self.hits += 1
+                count("model_cache_lookups", result="hit")
+                return version
+            self.misses += 1
+        count("model_cache_lookups", result="miss")
+
+        # deserialise outside the lock so a slow load doesn't block other sessions
+        with span("model_load"):
+            model = deserialize(model_bytes)
+            scaler = deserialize(scaler_bytes) if scaler_bytes is not None else None
+            if preprocess_bytes is None and getattr(model, "preprocessor", None) is not None:
+                # .npmodel files carry their own spec
+                preprocessor = model.preprocessor
+            else:
+                preprocessor = build_preprocessor(scaler, preprocess_bytes)
+        version = ModelVersion(key, model, scaler, preprocessor)
+
+        with self._lock:
+            # another session may have loaded the same bytes meanwhile
+            existing = self._versions.get(key)
+            if existing is not None:
+                self._versions.move_to_end(key)
+                return existing
+            self._versions[key] = version
+            self._origins[key] = _paths or (model_bytes, scaler_bytes, preprocess_bytes)
+            while len(self._versions) > self.max_versions:
+                evicted, _ = self._versions.popitem(last=False)
+                self._origins.pop(evicted, None)
+                self.evictions += 1
+        return version
+
+    def load_files(self, model_path, scaler_path=None):
+        """
+        Loads a model file plus its scaler and the <model>.preprocess.json
+        next to it, if present (.npmodel files are self-contained).
+        """
+        with open(model_path, "rb") as f:
+            model_bytes = f.read()
+        spec_path = None if compact.is_compact(model_bytes) else spec_path_for(model_path)
+        return self.load_bytes(model_bytes, _read_optional(scaler_path), _read_optional(spec_path),
+                               _paths=(model_path, scaler_path, spec_path))
+
+    def artifacts(self, key):
+        """
+        (model_bytes, scaler_bytes, preprocess_bytes) a loaded version was
+        built from, as written (a .npmodel stays a .npmodel), for handing the
+        model to another process. None if the version is no longer loaded or
+        its files have changed since.
+        """
+        with self._lock:
+            origin = self._origins.get(key)
+        if origin is None or isinstance(origin[0], bytes):
+            return origin
+        model_bytes = _read_optional(origin[0])
+        if model_bytes is None:
+            return None
+        artifacts = (model_bytes, _read_optional(origin[1]), _read_optional(origin[2]))
+        return artifacts if content_key(*artifacts) == key else None
+
+    def get(self, key):
+        """Returns a loaded version by key (counts as a use) or None."""
+        with self._lock:
+            version = self._versions.get(key)
+            if version is not None:
+                self._versions.move_to_end(key)
+            return version
+
+    def bundled_version_key(self):
+        """
+        Key of the bundled model without deserialising it (None if there is no
+        model.pkl). The files are re-statted on every call and only hashed again
+        when their size or mtime changed, so a `train.py --promote` is picked up
+        by the next rerun without restarting the app.
+        """
+        stamp = tuple((st.st_size, st.st_mtime_ns) if (st := _stat(p)) else None
+                      for p in (BUNDLED_MODEL, BUNDLED_SCALER, BUNDLED_PREPROCESS))
+        if stamp[0] is None:
+            return None
+        peeked = self._peeked
+        if peeked is None or peeked[0] != stamp:
+            key = content_key(_read_optional(BUNDLED_MODEL), _read_optional(BUNDLED_SCALER),
+                              _read_optional(BUNDLED_PREPROCESS))
+            peeked = self._peeked = (stamp, key)
+        return peeked[1]
+
+    def bundled(self):
+        """The repo's model.pkl/scaler.pkl as they are now; None if they are missing or unreadable."""
+        key = self.bundled_version_key()
+        if key is None:
+            return None
+        version = self.get(key)
+        if version is not None:
+            return version
+        try:
+            version = self.load_files(BUNDLED_MODEL, BUNDLED_SCALER)
+        except Exception:
+            return None
+        self.bundled_key = version.key
+        return version
+
+    def preload_bundled(self, delay=PRELOAD_DELAY):
+        """
+        Deserialises the bundled model in a daemon thread `delay` seconds from
+        now, once per process. The apps call this at the end of a script run so
+        the first render stays light and the first prediction doesn't pay for
+        sklearn.
+        """
+        with self._lock:
+            if self._preload is not None:
+                return
+            self._preload = threading.Timer(delay, self.bundled)
+            self._preload.daemon = True
+        self._preload.start()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "versions": list(self._versions),
+                "max_versions": self.max_versions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns the process-wide registry. The bundled model is deserialised by
+    preload_bundled() after the first render, or on the first bundled() call.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
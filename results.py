@@ -0,0 +1,182 @@
+"""
+Server-side store for one scored batch, viewed a page at a time.
+
+batch.iter_score() appends every scored block as compact columns (float32
+features, int8 label, float32 probability, validation messages for the
+invalid rows only), about 37 bytes per row, straight to one .npy file per
+column in the results directory. Nothing is concatenated in memory: close()
+fills in the final .npy headers and reopens the columns memory-mapped, so
+any process can load() them (see jobs.py). The UI then asks for summary
+counts, a probability histogram and one page of a filtered, sorted view.
+Each of these is a NumPy aggregation or a slice, so only the visible rows
+are turned into a DataFrame and sent to the browser. The row order for a
+(filter, sort) pair is computed once and reused while paging.
+"""
+import os
+import threading
+
+import numpy as np
+
+import columnar
+from scoring import FEATURES
+
+RISK_FILTERS = ["All", "Diabetic", "Non-Diabetic", "Invalid"]
+SORT_KEYS = ["Row", "Probability"] + FEATURES
+PAGE_SIZES = [25, 50, 100, 250, 500]
+HISTOGRAM_BINS = 20
+# (filter, sort) orderings kept per result set
+MAX_ORDERS = 8
+COLUMNS = ["X", "labels", "proba", "message_rows", "message_text"]
+# (name, dtype, features per row) of the columns appended block by block
+_APPENDED = [("X", np.float32, len(FEATURES)), ("labels", np.int8, None), ("proba", np.float32, None)]
+
+
+class BatchResults:
+    def __init__(self, directory=None):
+        """Appends to new column files in `directory`; load() passes None."""
+        self.directory = directory
+        self.rows = 0
+        self.X = self.labels = self.proba = None
+        self._files = {}
+        self._data_start = None
+        self._message_rows = []
+        self._message_text = []
+        self._orders = {}
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for name, dtype, width in _APPENDED:
+                f = self._files[name] = open(_path(directory, name), "wb")
+                self._data_start = _write_header(f, dtype, width, 0)
+
+    def add(self, X, labels, proba, messages=None):
+        """Appends one scored block to the column files."""
+        n = len(labels)
+        probability = np.full(n, np.nan, dtype=np.float32) if proba is None else np.asarray(proba, np.float32)
+        self._files["X"].write(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+        self._files["labels"].write(np.asarray(labels).astype(np.int8).tobytes())
+        self._files["proba"].write(probability.tobytes())
+        if messages is not None:
+            bad = np.flatnonzero(messages != "")
+            if len(bad):
+                self._message_rows.append(bad + self.rows)
+                self._message_text.append(np.asarray(messages)[bad])
+        self.rows += n
+
+    def close(self):
+        """Finishes the files and maps them back in; call once scoring has finished."""
+        if not self._files:
+            return self
+        for name, dtype, width in _APPENDED:
+            f = self._files.pop(name)
+            f.seek(0)
+            # NumPy pads .npy headers so the row count can grow without changing
+            # their length: the header written before the first block is replaced in place
+            data_start = _write_header(f, dtype, width, self.rows)
+            f.close()
+            if data_start != self._data_start:
+                raise ValueError(f"{f.name}: the .npy header changed length")
+        message_rows = np.concatenate(self._message_rows) if self._message_rows else np.empty(0, np.intp)
+        message_text = np.concatenate(self._message_text) if self._message_text else np.empty(0, str)
+        np.save(_path(self.directory, "message_rows"), message_rows, allow_pickle=False)
+        np.save(_path(self.directory, "message_text"), message_text.astype(str), allow_pickle=False)
+        self._message_rows = self._message_text = []
+        self._map(self.directory)
+        return self
+
+    @classmethod
+    def load(cls, directory):
+        """Reopens closed results; the large columns are memory-mapped, not read."""
+        results = cls()
+        results._map(directory)
+        return results
+
+    def _map(self, directory):
+        for name in COLUMNS:
+            values = np.load(_path(directory, name), mmap_mode="r", allow_pickle=False)
+            setattr(self, name, values.astype(object) if name == "message_text" else values)
+        self.rows = len(self.labels)
+
+    @property
+    def nbytes(self):
+        return self.X.nbytes + self.labels.nbytes + self.proba.nbytes + self.message_rows.nbytes
+
+    # -------------------- Aggregates --------------------
+    def summary(self):
+        """Row counts per outcome and the mean probability of the scored rows."""
+        invalid, negative, positive = np.bincount(self.labels.astype(np.intp) + 1, minlength=3)[:3]
+        scored = self.proba[self.labels != columnar.INVALID_LABEL]
+        return {
+            "rows": self.rows,
+            "Diabetic": int(positive),
+            "Non-Diabetic": int(negative),
+            "Invalid": int(invalid),
+            "mean_probability": float(np.nanmean(scored)) if np.isfinite(scored).any() else None,
+        }
+
+    def histogram(self, bins=HISTOGRAM_BINS):
+        """(counts, edges) of the scored rows' probabilities over [0, 1]."""
+        proba = self.proba[np.isfinite(self.proba)]
+        return np.histogram(proba, bins=bins, range=(0.0, 1.0))
+
+    # -------------------- Views --------------------
+    def order(self, risk="All", sort_by="Row", descending=False, min_probability=0.0, max_probability=1.0):
+        """Row indices matching the filter, in display order (cached per argument set)."""
+        key = (risk, sort_by, descending, min_probability, max_probability)
+        with self._lock:
+            idx = self._orders.get(key)
+        if idx is not None:
+            return idx
+
+        mask = np.ones(self.rows, dtype=bool)
+        if risk == "Diabetic":
+            mask &= self.labels == 1
+        elif risk == "Non-Diabetic":
+            mask &= self.labels == 0
+        elif risk == "Invalid":
+            mask &= self.labels == columnar.INVALID_LABEL
+        if min_probability > 0.0 or max_probability < 1.0:
+            mask &= (self.proba >= min_probability) & (self.proba <= max_probability)
+        idx = np.flatnonzero(mask)
+        if sort_by != "Row":
+            values = self.proba[idx] if sort_by == "Probability" else self.X[idx, FEATURES.index(sort_by)]
+            # NaN (invalid rows) sort last either way
+            idx = idx[np.argsort(-values if descending else values, kind="stable")]
+        elif descending:
+            idx = idx[::-1]
+
+        with self._lock:
+            if len(self._orders) >= MAX_ORDERS:
+                self._orders.pop(next(iter(self._orders)))
+            self._orders[key] = idx
+        return idx
+
+    def page(self, idx, page, page_size):
+        """DataFrame of the rows idx[page * page_size:(page + 1) * page_size] (0-based page)."""
+        import pandas as pd
+        rows = idx[page * page_size:(page + 1) * page_size]
+        df = pd.DataFrame(self.X[rows], columns=FEATURES)
+        df.insert(0, "Row", rows)
+        df["Prediction"] = columnar.prediction_names(self.labels[rows])
+        df["Probability"] = self.proba[rows]
+        if len(self.message_rows):
+            pos = np.searchsorted(self.message_rows, rows)
+            pos = np.minimum(pos, len(self.message_rows) - 1)
+            df["Validation"] = np.where(self.message_rows[pos] == rows, self.message_text[pos], "")
+        return df
+
+
+def page_count(matching, page_size):
+    return max(1, -(-matching // page_size))
+
+
+def _path(directory, name):
+    return os.path.join(directory, name + ".npy")
+
+
+def _write_header(f, dtype, width, rows):
+    """Writes a .npy header at the file position; returns where the data starts."""
+    shape = (rows,) if width is None else (rows, width)
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape}
+    np.lib.format.write_array_header_1_0(f, header)
+    return f.tell()
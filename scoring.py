@@ -0,0 +1,236 @@
+"""
+Headless scoring API and command-line entry point.
+
+This module owns the feature contract shared by both Streamlit apps and the
+batch paths. From the command line it scores CSV, Parquet, Arrow IPC or .npy
+files with the bundled (or any) model, sharding chunks across a process pool.
+Chunks are scored by batch.score_block() and written by columnar.BlockWriter,
+so the output matches the apps' batch downloads:
+
+    python scoring.py patients.csv -o scored.parquet --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fastpath import kernel_for
+from metrics import count, span
+
+FEATURES = ["Pregnancies", "Glucose", "BloodPressure", "SkinThickness",
+            "Insulin", "BMI", "DiabetesPedigreeFunction", "Age"]
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(APP_DIR, "diabetes.csv")
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+# -------------------- Feature contract --------------------
+def single_row(**values):
+    """
+    Builds a (1, 8) float array in FEATURES order from keyword arguments,
+    e.g. single_row(Pregnancies=1, Glucose=120, ...). A plain array rather
+    than a DataFrame: building a one-row frame costs more than scoring it.
+    """
+    missing = [c for c in FEATURES if c not in values]
+    if missing:
+        raise KeyError(f"Missing columns: {', '.join(missing)}")
+    return np.array([[values[c] for c in FEATURES]], dtype=np.float64)
+
+
+def load_data(data_path=DATA_PATH):
+    """
+    (X, y) of a diabetes.csv-style file: raw features in FEATURES order and
+    Outcome (None if the file has no Outcome column). Parsed with np.loadtxt,
+    so callers don't need pandas. The one loader for diabetes.csv.
+    """
+    with open(data_path) as f:
+        header = f.readline().strip().split(",")
+    labelled = "Outcome" in header
+    usecols = [header.index(name) for name in FEATURES + (["Outcome"] if labelled else [])]
+    data = np.loadtxt(data_path, delimiter=",", skiprows=1, usecols=usecols, ndmin=2)
+    if not labelled:
+        return data, None
+    return data[:, :-1], data[:, -1].astype(np.int64)
+
+
+# -------------------- Prediction --------------------
+def predict(model, X, preprocessor=None):
+    """
+    Returns (labels, probabilities) for a feature block in FEATURES order.
+    Probabilities are for class 1 and None when the model has no predict_proba.
+
+    `preprocessor` (see preprocessing.py) is applied to the whole block first.
+    Binary logistic models then go through the fused NumPy kernel in
+    fastpath.py; everything else is scored by sklearn.
+    """
+    if preprocessor is not None and not preprocessor.is_identity:
+        with span("preprocess"):
+            X = preprocessor.transform(X)
+    count("rows", len(X), stage="predict")
+    kernel = kernel_for(model)
+    if kernel is not None:
+        with span("predict", path="kernel"):
+            return kernel.predict(X)
+    if isinstance(X, np.ndarray) and hasattr(model, "feature_names_in_"):
+        # keep column names for sklearn models that were fit on a DataFrame
+        import pandas as pd
+        X = pd.DataFrame(X, columns=FEATURES)
+    with span("predict", path="sklearn"):
+        if hasattr(model, "predict_proba"):
+            proba = np.asarray(model.predict_proba(X))
+            classes = getattr(model, "classes_", np.array([0, 1]))
+            labels = np.asarray(classes)[proba.argmax(axis=1)]
+            return labels, proba[:, 1]
+        return np.asarray(model.predict(X)), None
+
+
+def predict_unique(model, X, preprocessor=None):
+    """
+    Same as predict(), but identical rows are scored once. Only worth it for
+    models without a compiled kernel: for logistic models the sort that finds
+    duplicates costs more than scoring every row.
+    """
+    if kernel_for(model) is not None:
+        return predict(model, X, preprocessor)
+    X = np.asarray(X, dtype=np.float64)
+    unique, inverse = np.unique(X, axis=0, return_inverse=True)
+    if len(unique) == len(X):
+        return predict(model, X, preprocessor)
+    labels, proba = predict(model, unique, preprocessor)
+    inverse = inverse.reshape(-1)
+    return labels[inverse], None if proba is None else proba[inverse]
+
+
+# -------------------- Files --------------------
+def file_format(path):
+    """Batch format (see columnar.FORMATS) of a file name; ValueError for an unknown extension."""
+    import columnar
+    fmt = columnar.FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"{path}: unknown file type, expected one of {', '.join(columnar.FORMATS)}")
+    return fmt
+
+
+# -------------------- Process-pool sharding --------------------
+_worker_version = None
+_worker_explainer = None
+
+
+def _init_worker(artifacts, explain):
+    global _worker_version, _worker_explainer
+    from registry import get_registry
+    # the parent's exact bytes, so every worker scores the same version key
+    _worker_version = get_registry().load_bytes(*artifacts)
+    if explain:
+        from explain import explainer_for
+        _worker_explainer = explainer_for(_worker_version.model, _worker_version.preprocessor)
+
+
+def _score_in_worker(block):
+    import batch
+    # X is not sent back: the parent rebuilds it from the block only when it logs
+    _, codes, labels, proba, messages, contributions = batch.score_block(
+        block, _worker_version.model, _worker_version.preprocessor, _worker_explainer)
+    return codes, labels, proba, messages, contributions
+
+
+def score_file(input_path, output_path, model_path=None, scaler_path=None, workers=None,
+               chunk_rows=DEFAULT_CHUNK_ROWS, prediction_log=None, explain=False):
+    """
+    Scores `input_path` into `output_path` in the batch formats of
+    columnar.py, with the same columns as the apps' batch downloads
+    (see batch.iter_score). Without `model_path` the bundled model is used,
+    as registry.bundled() loads it. At most two chunks per worker are in
+    flight so memory stays bounded. Returns (rows, invalid_rows, seconds).
+    """
+    import batch
+    import columnar
+    from registry import get_registry
+    in_fmt, out_fmt = file_format(input_path), file_format(output_path)
+    registry = get_registry()
+    version = registry.bundled() if model_path is None else registry.load_files(model_path, scaler_path)
+    if version is None:
+        raise FileNotFoundError("No bundled model.pkl; pass --model")
+    workers = workers or os.cpu_count() or 1
+    explainer = None
+    if explain and workers == 1:
+        from explain import explainer_for
+        explainer = explainer_for(version.model, version.preprocessor)
+    rows = invalid = 0
+    started = time.perf_counter()
+
+    with open(output_path, "wb") as out:
+        writer = columnar.BlockWriter(out, out_fmt, explained=explain)
+
+        def emit(block, codes, labels, proba, messages, contributions):
+            nonlocal rows, invalid
+            writer.write(block, labels, proba, messages, contributions)
+            valid = ~codes.any(axis=1)
+            if prediction_log is not None and valid.any():
+                outcomes = columnar.outcomes_of(block)
+                X = columnar.feature_matrix(block)[0]
+                prediction_log.log(labels[valid], None if proba is None else proba[valid], version.key, "cli",
+                                   None if outcomes is None else outcomes[valid], features=X[valid])
+            rows += len(labels)
+            invalid += int((~valid).sum())
+
+        blocks = columnar.iter_blocks(input_path, in_fmt, chunk_rows)
+        if workers == 1:
+            for block in blocks:
+                emit(block, *batch.score_block(block, version.model, version.preprocessor, explainer)[1:])
+        else:
+            artifacts = registry.artifacts(version.key)
+            if artifacts is None:
+                raise ValueError(f"{model_path or 'model.pkl'} changed while it was being loaded")
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(artifacts, explain)) as pool:
+                pending = deque()
+                for block in blocks:
+                    pending.append((block, pool.submit(_score_in_worker, block)))
+                    if len(pending) >= workers * 2:
+                        block, future = pending.popleft()
+                        emit(block, *future.result())
+                while pending:
+                    block, future = pending.popleft()
+                    emit(block, *future.result())
+        writer.close()
+    return rows, invalid, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a diabetes.csv-style CSV, Parquet, Arrow or .npy file.")
+    parser.add_argument("input", help="CSV, Parquet, Arrow IPC or (n, 8) .npy file with the diabetes.csv features")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output file; its extension picks the format (.csv, .parquet, .arrow or .npy)")
+    parser.add_argument("--model", default=None,
+                        help="model file (default: bundled model.pkl); <model>.preprocess.json is applied if present")
+    parser.add_argument("--scaler", default=None, help="scaler pickle to apply before --model")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--log", action="store_true", help="append the predictions to the prediction log")
+    parser.add_argument("--explain", action="store_true", help="add per-feature contribution columns")
+    args = parser.parse_args(argv)
+
+    prediction_log = None
+    if args.log:
+        from prediction_log import get_log
+        prediction_log = get_log()
+    try:
+        rows, invalid, seconds = score_file(args.input, args.output, args.model, args.scaler, args.workers,
+                                            args.chunk_rows, prediction_log, args.explain)
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        print(f"error: {e.args[0] if isinstance(e, KeyError) else e}", file=sys.stderr)
+        return 2
+    rate = rows / seconds if seconds > 0 else 0.0
+    print(f"scored {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/s) -> {args.output}")
+    if invalid:
+        print(f"{invalid:,} rows failed validation (Prediction Invalid, see the Validation column)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
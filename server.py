@@ -0,0 +1,286 @@
+"""
+Standalone async inference server (stdlib asyncio, no web framework).
+
+Concurrent requests are coalesced into micro-batches: the first request
+opens a short window (--window-ms) and everything that arrives before it
+closes, up to --max-batch rows, is scored with one vectorized predict call.
+Batches are scored off the event loop, and the next window is collected
+while up to MAX_IN_FLIGHT of them are still being scored.
+
+    python server.py --port 8765
+
+Endpoints
+    POST /predict        {"Pregnancies": 1, "Glucose": 120, ...}
+                         -> {"label": 0, "probability": 0.12}
+    POST /predict/batch  {"rows": [{...}, {...}]}  (or a bare list)
+                         -> {"results": [{"label": .., "probability": ..}, ...]}
+    GET  /health         -> {"status": "ok", "model": "<version key>"}
+    GET  /stats          -> batching and latency counters
+    GET  /metrics        -> spans and counters in the Prometheus text format (see metrics.py)
+
+See loadgen.py for a load generator that reports p50/p99 latency.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+import validation
+from metrics import get_metrics, observe
+from prediction_log import get_log
+from registry import get_registry
+from scoring import FEATURES, predict
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 1024
+# micro-batches being scored at once (in the default executor's threads)
+MAX_IN_FLIGHT = 2
+
+
+class MicroBatcher:
+    """Collects feature rows from concurrent callers and scores them together."""
+
+    def __init__(self, model, preprocessor=None, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 prediction_log=None, model_key=None):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.prediction_log = prediction_log
+        self.model_key = model_key
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+        self._in_flight = set()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+
+    async def submit(self, rows):
+        """Scores a (n, len(FEATURES)) array; resolves once its batch has run."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    def _score(self, X):
+        labels, proba = predict(self.model, X, self.preprocessor)
+        if self.prediction_log is not None:
+            # one bulk insert per micro-batch
+            self.prediction_log.log(labels, proba, self.model_key, "api", features=X)
+        return labels, proba
+
+    async def _collect(self, loop):
+        """Waits for a request, then gathers more until the window closes or max_batch rows are in."""
+        items = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = loop.time() + self.window
+        while size < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items, size
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items, size = await self._collect(loop)
+            # scoring runs as a task, so the next window is collected while this batch is scored
+            await self._slots.acquire()
+            task = loop.create_task(self._dispatch(loop, items, size))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, loop, items, size):
+        try:
+            X = np.concatenate([rows for rows, _ in items])
+            try:
+                labels, proba = await loop.run_in_executor(None, self._score, X)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        finally:
+            self._slots.release()
+
+        self.batches += 1
+        self.rows += size
+        self.largest_batch = max(self.largest_batch, size)
+        start = 0
+        for rows, future in items:
+            end = start + len(rows)
+            if not future.done():
+                future.set_result((labels[start:end], None if proba is None else proba[start:end]))
+            start = end
+
+
+def rows_to_matrix(records):
+    """
+    Converts a list of feature dicts into a float matrix in FEATURES order.
+    ValueError (a 400) for missing, non-numeric, NaN/Infinity or out-of-range
+    values (see validation.py), so nothing invalid reaches the batcher.
+    """
+    try:
+        X = np.array([[float(r[c]) for c in FEATURES] for r in records], dtype=np.float64)
+    except KeyError as e:
+        raise ValueError(f"Missing feature: {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("Feature values must be numbers")
+    codes = validation.check(X)
+    bad = np.flatnonzero(codes.any(axis=1))
+    if len(bad):
+        i = bad[0]
+        where = f"Row {i}: " if len(records) > 1 else ""
+        more = f" (and {len(bad) - 1} more invalid rows)" if len(bad) > 1 else ""
+        raise ValueError(where + validation.describe_row(codes[i], X[i]) + more)
+    return X
+
+
+def results_json(labels, proba):
+    return [{"label": int(labels[i]), "probability": None if proba is None else float(proba[i])}
+            for i in range(len(labels))]
+
+
+class InferenceServer:
+    def __init__(self, version, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, prediction_log=None):
+        self.model_key = version.key
+        self.batcher = MicroBatcher(version.model, version.preprocessor, window_ms, max_batch,
+                                    prediction_log, version.key)
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method, path, body)
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload, allow_nan=False).encode(), "application/json"
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return "200 OK", {"status": "ok", "model": self.model_key}
+        if method == "GET" and path == "/stats":
+            return "200 OK", self.stats()
+        if method == "GET" and path == "/metrics":
+            return "200 OK", get_metrics().to_prometheus()
+        if method != "POST" or path not in ("/predict", "/predict/batch"):
+            return "404 Not Found", {"error": f"No route for {method} {path}"}
+
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            payload = json.loads(body or b"null")
+            if path == "/predict":
+                records = [payload]
+            else:
+                records = payload.get("rows") if isinstance(payload, dict) else payload
+            if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+                raise ValueError("Expected a JSON object (or a list of objects for /predict/batch)")
+            labels, proba = await self.batcher.submit(rows_to_matrix(records)) if records else ([], None)
+        except ValueError as e:
+            self.errors += 1
+            return "400 Bad Request", {"error": str(e)}
+        except Exception as e:
+            self.errors += 1
+            return "500 Internal Server Error", {"error": f"Model prediction failed: {e}"}
+        finally:
+            elapsed = time.perf_counter() - started
+            self.total_latency += elapsed
+            observe("http_request", elapsed, path=path)
+
+        results = results_json(labels, proba)
+        return "200 OK", results[0] if path == "/predict" else {"results": results}
+
+    def stats(self):
+        b = self.batcher
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_latency_ms": 1000.0 * self.total_latency / self.requests if self.requests else 0.0,
+            "batches": b.batches,
+            "rows": b.rows,
+            "mean_batch_rows": b.rows / b.batches if b.batches else 0.0,
+            "largest_batch": b.largest_batch,
+        }
+
+
+async def serve(host, port, version, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, prediction_log=None):
+    app = InferenceServer(version, window_ms, max_batch, prediction_log)
+    app.batcher.start()
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    print(f"serving model {version.key} on http://{host}:{port} (window {window_ms}ms, max batch {max_batch})")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-batching inference server for the diabetes model.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=None, help="model file (default: bundled model.pkl)")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--no-log", action="store_true", help="don't append predictions to the prediction log")
+    args = parser.parse_args(argv)
+
+    registry = get_registry()
+    version = registry.load_files(args.model) if args.model else registry.bundled()
+    if version is None:
+        parser.error("no model: pass --model or put model.pkl next to server.py")
+    prediction_log = None if args.no_log else get_log()
+    try:
+        asyncio.run(serve(args.host, args.port, version, args.window_ms, args.max_batch, prediction_log))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
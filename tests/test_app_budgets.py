@@ -0,0 +1,33 @@
+"""Start-up budgets for both Streamlit apps (see benchmarks.APP_BUDGETS)."""
+import pytest
+
+pytest.importorskip("streamlit")
+
+import benchmarks
+
+STATE_DIRS = {
+    "DIABETES_PREDICTION_LOG": "predictions.db",
+    "DIABETES_JOBS_DIR": "batch_jobs",
+    "DIABETES_INSIGHTS_DIR": "insights",
+    "DIABETES_ONLINE_DIR": "online_models",
+}
+
+
+@pytest.fixture(scope="module")
+def app_results(tmp_path_factory):
+    # a fresh clone: no prediction log, jobs, online snapshots or built insights
+    root = tmp_path_factory.mktemp("state")
+    with pytest.MonkeyPatch.context() as mp:
+        for name, path in STATE_DIRS.items():
+            mp.setenv(name, str(root / path))
+        yield benchmarks.bench_apps(reruns=5)
+
+
+def test_first_render_stays_light(app_results):
+    # script errors and heavy imports (pandas, sklearn, matplotlib, pyarrow) on the first run
+    assert benchmarks.check_budgets(app_results, timings=False) == []
+
+
+@pytest.mark.benchmark
+def test_apps_within_time_budget(app_results):
+    assert benchmarks.check_budgets(app_results) == []
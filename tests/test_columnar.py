@@ -0,0 +1,59 @@
+"""Batch output formats (columnar.py) over several chunks."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import batch
+import columnar
+from registry import get_registry
+from scoring import FEATURES, load_data
+
+
+@pytest.fixture(scope="module")
+def version():
+    return get_registry().bundled()
+
+
+@pytest.fixture
+def csv_with_late_blank(tmp_path):
+    X, y = load_data()
+    df = pd.DataFrame(X[:120], columns=FEATURES).assign(Outcome=y[:120], Note="ok")
+    df["Outcome"] = df["Outcome"].astype(object)
+    df.loc[100, "Outcome"] = None  # int64 in the first chunks, float64 in the last
+    df.loc[100:, "Note"] = None  # string in the first chunks, all-null in the last
+    path = tmp_path / "late_blank.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def _read(data, fmt):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(io.BytesIO(data))
+    return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_later_chunk_with_blanks_keeps_first_schema(version, csv_with_late_blank, fmt):
+    out = io.BytesIO()
+    with open(csv_with_late_blank, "rb") as source:
+        for _ in batch.iter_score(source, version.model, out, "csv", fmt, chunk_rows=50,
+                                  preprocessor=version.preprocessor):
+            pass
+    table = _read(out.getvalue(), fmt)
+    assert table.num_rows == 120
+    assert table.schema.field("Outcome").type == pa.int64()
+    assert table.column("Outcome").null_count == 1
+    assert table.column("Note").null_count == 20
+
+
+def test_to_frame_leaves_the_block_alone():
+    X, _ = load_data()
+    block = pd.DataFrame(X[:5], columns=FEATURES)
+    df = columnar.to_frame(block, np.zeros(5), np.full(5, 0.25), np.full(5, "", dtype=object))
+    assert list(block.columns) == FEATURES
+    assert {"Prediction", "Probability", "Validation"} <= set(df.columns)
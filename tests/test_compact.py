@@ -0,0 +1,56 @@
+"""Compact .npmodel exports against the models they were made from."""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import compact
+from preprocessing import Preprocessor
+from scoring import load_data
+
+
+@pytest.fixture(scope="module")
+def data():
+    return load_data()
+
+
+@pytest.fixture(scope="module")
+def linear(data):
+    X, y = data
+    preprocessor = Preprocessor.from_scaler(StandardScaler().fit(X))
+    return LogisticRegression().fit(preprocessor.transform(X), y), preprocessor
+
+
+@pytest.fixture(scope="module")
+def forest(data):
+    X, y = data
+    return RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize("dtype", compact.DTYPES)
+def test_linear_parity(data, linear, dtype):
+    X, y = data
+    model, preprocessor = linear
+    blob, result = compact.export(model, preprocessor, dtype)
+    assert result["max_proba_diff"] <= compact.TOLERANCES[dtype]
+    loaded = compact.loads(blob)
+    assert compact.parity(model, loaded, X, y, preprocessor) == result
+
+
+@pytest.mark.parametrize("dtype", compact.DTYPES)
+def test_tree_parity(data, forest, dtype):
+    X, y = data
+    blob, result = compact.export(forest, None, dtype)
+    assert result["max_proba_diff"] <= compact.TOLERANCES[dtype]
+    loaded = compact.loads(blob)
+    proba = loaded.predict_proba(X)[:, 1]
+    assert np.max(np.abs(proba - forest.predict_proba(X)[:, 1])) <= compact.TOLERANCES[dtype]
+    if dtype != "int8":
+        assert result["label_mismatches"] == 0
+        assert np.array_equal(loaded.predict(X), forest.predict(X))
+
+
+def test_rejects_other_files():
+    with pytest.raises(ValueError):
+        compact.loads(b"not a model file at all")
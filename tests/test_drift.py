@@ -0,0 +1,76 @@
+"""PSI, KS and drift reports on known distributions (drift.py)."""
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+import drift
+from prediction_log import PredictionLog
+from scoring import FEATURES, load_data
+
+
+@pytest.fixture(scope="module")
+def normal():
+    rng = np.random.default_rng(0)
+    reference = rng.normal(0.0, 1.0, 200_000)
+    edges = np.quantile(reference, np.linspace(0, 1, drift.QUANTILE_BINS + 1)[1:-1])
+    return rng, edges, drift.bin_counts(reference, edges)
+
+
+def test_psi_by_hand():
+    assert drift.psi([50, 50], [50, 50]) == 0.0
+    # (0.9 - 0.5) ln(0.9 / 0.5) + (0.1 - 0.5) ln(0.1 / 0.5)
+    assert drift.psi([50, 50], [90, 10]) == pytest.approx(0.4 * np.log(1.8) + 0.4 * np.log(5))
+    assert drift.psi([50, 50], [90, 10]) == pytest.approx(drift.psi([90, 10], [50, 50]))
+
+
+def test_same_distribution_is_stable(normal):
+    rng, edges, expected = normal
+    actual = drift.bin_counts(rng.normal(0.0, 1.0, 20_000), edges)
+    assert drift.psi(expected, actual) < 0.01
+    statistic, critical = drift.ks(expected, actual)
+    assert statistic < critical
+
+
+def test_mean_shift(normal):
+    rng, edges, expected = normal
+    actual = drift.bin_counts(rng.normal(0.4, 1.0, 20_000), edges)
+    # for N(0, 1) vs N(d, 1) PSI tends to d^2 and the KS statistic to 2 Phi(d / 2) - 1 (0.159 for d = 0.4)
+    assert 0.13 < drift.psi(expected, actual) < 0.17
+    statistic, critical = drift.ks(expected, actual)
+    assert statistic == pytest.approx(0.159, abs=0.015)
+    assert statistic > critical
+    assert drift.status(drift.psi(expected, actual), 20_000) == "watch"
+
+
+def test_status_thresholds():
+    assert drift.status(0.5, drift.MIN_ROWS - 1) == "too few rows"
+    assert drift.status(0.05, 1000) == "stable"
+    assert drift.status(drift.PSI_WATCH, 1000) == "watch"
+    assert drift.status(drift.PSI_DRIFT, 1000) == "drift"
+
+
+def test_histogram_median_of_a_uniform_sample():
+    edges = np.arange(1.0, 10.0)
+    counts = np.full(10, 100)
+    assert drift.histogram_quantile(counts, edges, 0.0, 10.0) == pytest.approx(5.0)
+
+
+def test_report_flags_only_the_shifted_feature(tmp_path):
+    X, _ = load_data()
+    today = date(2026, 3, 31)
+    ts = datetime(2026, 3, 30, 12).timestamp()
+    log = PredictionLog(str(tmp_path / "predictions.db"))
+    shifted = X.copy()
+    shifted[:, FEATURES.index("Glucose")] += 60
+    log.log(np.zeros(len(X)), features=shifted, ts=ts)
+
+    report = log.drift_report(days=7, today=today)
+    by_feature = {f["feature"]: f for f in report["features"]}
+    assert report["rows"] == len(X)
+    assert by_feature["Glucose"]["status"] == "drift"
+    assert by_feature["Glucose"]["mean"] == pytest.approx(X[:, 1].mean() + 60)
+    # the other columns are diabetes.csv itself
+    assert all(f["status"] == "stable" and f["psi"] < 1e-6 for name, f in by_feature.items() if name != "Glucose")
+    assert report == log.drift_report(days=7, today=today)
+    assert log.drift_report(days=1, today=today)["rows"] == 0
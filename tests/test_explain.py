@@ -0,0 +1,54 @@
+"""Additivity of the per-feature contributions (explain.py)."""
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+import explain
+from registry import get_registry
+from scoring import load_data, predict
+
+
+@pytest.fixture(scope="module")
+def data():
+    return load_data()
+
+
+@pytest.fixture(scope="module")
+def forest(data):
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = data
+    return RandomForestClassifier(n_estimators=20, max_depth=4, random_state=0).fit(X, y)
+
+
+def test_linear_contributions_sum_to_the_logit(data):
+    version = get_registry().bundled()
+    X = data[0][:200]
+    explainer = explain.Explainer(version.model, version.preprocessor)
+    assert explainer.units == "log-odds"
+    proba = predict(version.model, X, version.preprocessor)[1]
+    logit = np.log(proba / (1 - proba))
+    np.testing.assert_allclose(explainer.explain(X).sum(axis=1) + explainer.base, logit, atol=1e-6)
+
+
+@pytest.mark.parametrize("rows", [10, explain.EXACT_MAX_ROWS + 50])
+def test_contributions_sum_to_the_probability(data, forest, rows):
+    # up to EXACT_MAX_ROWS unique rows every coalition is scored, above that orderings are sampled
+    X = data[0][:rows]
+    explainer = explain.Explainer(forest)
+    assert explainer.units == "probability"
+    proba = predict(forest, X)[1]
+    np.testing.assert_allclose(explainer.explain(X).sum(axis=1) + explainer.base, proba, atol=1e-9)
+
+
+def test_sampled_values_approach_the_exact_ones(data, forest):
+    X = data[0][:5]
+    exact = explain.Explainer(forest)._exact(X)
+    sampled = explain.Explainer(forest, permutations=400)._sampled(X)
+    np.testing.assert_allclose(sampled, exact, atol=0.02)
+
+
+def test_duplicate_rows_get_the_same_contributions(data, forest):
+    X = np.repeat(data[0][:3], 30, axis=0)
+    phi = explain.Explainer(forest).explain(X)
+    np.testing.assert_array_equal(phi[:30], np.repeat(phi[:1], 30, axis=0))
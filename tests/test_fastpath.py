@@ -0,0 +1,60 @@
+"""The NumPy logistic kernel against sklearn."""
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from fastpath import compile_model, parity
+from scoring import load_data
+
+
+@pytest.fixture(scope="module")
+def data():
+    return load_data()
+
+
+def test_logistic_parity(data):
+    X, y = data
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    max_diff, mismatches = parity(model, compile_model(model), X)
+    assert max_diff <= 1e-9 and mismatches == 0
+
+
+def test_scaler_folded_parity(data):
+    X, y = data
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression().fit(scaler.transform(X), y)
+    max_diff, mismatches = parity(model, compile_model(model, scaler), X, scaler)
+    assert max_diff <= 1e-9 and mismatches == 0
+
+
+def test_pipeline_parity(data):
+    X, y = data
+    pipeline = make_pipeline(StandardScaler(), LogisticRegression()).fit(X, y)
+    max_diff, mismatches = parity(pipeline, compile_model(pipeline), X)
+    assert max_diff <= 1e-9 and mismatches == 0
+
+
+def test_float32_input(data):
+    X, y = data
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    kernel = compile_model(model)
+    labels, proba = kernel.predict(X.astype(np.float32))
+    assert np.max(np.abs(proba - model.predict_proba(X)[:, 1])) < 1e-4
+
+
+def test_non_logistic_models_use_sklearn(data):
+    from sklearn.tree import DecisionTreeClassifier
+    X, y = data
+    assert compile_model(DecisionTreeClassifier(max_depth=3).fit(X, y)) is None
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, -np.inf])
+def test_non_finite_input_raises(data, bad):
+    X, y = data
+    kernel = compile_model(LogisticRegression(max_iter=1000).fit(X, y))
+    X = X[:10].copy()
+    X[3, 1] = bad
+    with pytest.raises(ValueError):
+        kernel.predict(X)
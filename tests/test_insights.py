@@ -0,0 +1,57 @@
+"""The on-disk Data Insights cache (insights.py)."""
+import os
+import shutil
+
+import pytest
+
+import insights
+
+pytest.importorskip("matplotlib")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(insights, "MAX_KEYS", 2)
+    monkeypatch.setattr(insights, "_loaded", insights.OrderedDict())
+    # skip the pair plot thumbnail; it is the slowest artifact
+    monkeypatch.setattr(insights, "PAIRPLOT_SOURCE", str(tmp_path / "missing.png"))
+    return tmp_path
+
+
+def _dirs(cache):
+    return sorted(name.split("-", 1)[1] for name in os.listdir(cache))
+
+
+def test_build_then_cached(cache):
+    assert insights.cached("a") is None
+    stats = insights.get_insights(model_key="a")
+    assert insights.cached("a") is stats
+    assert all(os.path.exists(path) for path in stats["images"].values())
+
+
+def _age(cache, key):
+    os.utime(os.path.join(cache, f"{insights.data_hash()}-{key}"), (0, 0))
+
+
+def test_keeps_most_recently_used_keys(cache):
+    insights.get_insights(model_key="a")
+    insights.get_insights(model_key="b")
+    _age(cache, "a")
+    insights.get_insights(model_key="c")
+    assert _dirs(cache) == ["b", "c"]
+    assert insights.cached("a") is None
+
+    _age(cache, "b")
+    assert insights.cached("b") is not None  # a hit counts as a use
+    _age(cache, "c")
+    insights.get_insights(model_key="d")
+    assert _dirs(cache) == ["b", "d"]
+
+
+def test_pruned_key_is_rebuilt(cache):
+    stats = insights.get_insights(model_key="a")
+    shutil.rmtree(os.path.join(cache, stats["key"]))
+    assert insights.cached("a") is None
+    rebuilt = insights.get_insights(model_key="a")
+    assert all(os.path.exists(path) for path in rebuilt["images"].values())
@@ -0,0 +1,94 @@
+"""Cancelling and recovering background batch jobs (jobs.py)."""
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+import jobs
+import prediction_log
+from registry import get_registry
+from scoring import DATA_PATH
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # predictions go to a scratch log, in this process and in spawned workers
+    log_path = str(tmp_path / "predictions.db")
+    monkeypatch.setenv("DIABETES_PREDICTION_LOG", log_path)
+    monkeypatch.setattr(prediction_log, "_log", prediction_log.PredictionLog(log_path))
+    return jobs.JobStore(str(tmp_path / "jobs"))
+
+
+def _queue_job(store, job_id, **fields):
+    """A job as JobQueue.submit() leaves it, without handing it to a pool."""
+    version = get_registry().bundled()
+    job_dir = store.job_dir(job_id)
+    os.makedirs(job_dir)
+    jobs.write_model(job_dir, version.key)
+    shutil.copyfile(DATA_PATH, jobs.input_path(job_dir, "csv"))
+    store.create(job_id, job_id, "csv", "parquet", False, version.key)
+    if fields:
+        store.update(job_id, **fields)
+    return job_dir
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_run_job_scores_and_keeps_results(store):
+    job_dir = _queue_job(store, "ok")
+    jobs.run_job(store.root, "ok")
+    job = store.get("ok")
+    assert (job["status"], job["rows"]) == (jobs.DONE, 768)
+    assert os.path.exists(jobs.output_path(job_dir, "parquet"))
+    assert jobs.JobQueue(store.root).results("ok").rows == 768
+
+
+def test_cancel_before_start(store):
+    job_dir = _queue_job(store, "early", cancel=1)
+    jobs.run_job(store.root, "early")
+    assert store.get("early")["status"] == jobs.CANCELLED
+    assert not os.path.exists(jobs.output_path(job_dir, "parquet"))
+
+
+def test_cancel_while_running(store, monkeypatch):
+    job_dir = _queue_job(store, "late")
+    # the flag is checked at the first progress report, after one chunk is written
+    monkeypatch.setattr(jobs.JobStore, "cancel_requested", lambda self, job_id: True)
+    jobs.run_job(store.root, "late")
+    assert store.get("late")["status"] == jobs.CANCELLED
+    assert not os.path.exists(jobs.output_path(job_dir, "parquet"))
+    assert not os.path.exists(os.path.join(job_dir, "results"))
+
+
+def test_finished_jobs_are_not_run_again(store):
+    _queue_job(store, "done")
+    store.finish("done", jobs.DONE, rows=1)
+    jobs.run_job(store.root, "done")
+    assert store.get("done")["rows"] == 1
+
+
+def test_recover_reruns_jobs_of_a_crashed_process(store):
+    dead = _dead_pid()
+    _queue_job(store, "orphan", queue_pid=dead)
+    _queue_job(store, "interrupted", status=jobs.RUNNING, queue_pid=dead, worker_pid=dead, rows=100)
+    _queue_job(store, "ours")  # queued by this live process: left alone
+    queue = jobs.JobQueue(store.root, workers=1)
+    try:
+        queue.recover()
+        queue.recover()  # once per queue
+        deadline = time.monotonic() + 120
+        while any(j["status"] in jobs.ACTIVE for j in queue.jobs(["orphan", "interrupted"])):
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+    finally:
+        queue.shutdown()
+    for job in queue.jobs(["orphan", "interrupted"]):
+        assert (job["status"], job["rows"], job["queue_pid"]) == (jobs.DONE, 768, os.getpid())
+    assert store.get("ours")["status"] == jobs.QUEUED
@@ -0,0 +1,79 @@
+"""Incremental updates and snapshots of the online learner (online.py)."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+import online
+from registry import ModelRegistry
+from scoring import load_data
+
+
+@pytest.fixture
+def learner(tmp_path, monkeypatch):
+    learner = online.OnlineLearner(str(tmp_path), keep=3)
+    monkeypatch.setattr(online, "_learner", learner)
+    monkeypatch.setattr(online, "_keys", {})
+    return learner
+
+
+def test_no_snapshot_yet(learner):
+    assert online.latest_key() is None
+    assert online.latest_version(ModelRegistry()) is None
+    with pytest.raises(FileNotFoundError):
+        learner.update(np.zeros((1, 8)), [1])
+
+
+def test_update_writes_a_new_snapshot(learner):
+    first = learner.bootstrap(epochs=1)
+    X, y = load_data()
+    second = learner.update(X[:50], y[:50], source="test")
+    assert learner.latest_path() == second != first
+
+    parent, child = learner.snapshots()
+    assert child["parent"] == "v000001" and child["source"] == "test"
+    assert child["samples_seen"] == parent["samples_seen"] + 50
+    assert 0.0 <= child["accuracy_before_update"] <= 1.0
+
+    registry = ModelRegistry()
+    before, after = registry.load_files(first), registry.load_files(second)
+    assert not np.allclose(before.model.coef_, after.model.coef_)
+    # written snapshots are never modified
+    with open(os.path.join(os.path.dirname(first), "meta.json")) as f:
+        assert json.load(f) == parent
+
+
+def test_rows_without_usable_labels_are_skipped(learner):
+    learner.bootstrap(epochs=1)
+    X, _ = load_data()
+    assert learner.update(X[:5], [2, 2, 2, 2, 2]) is None
+    assert learner.latest_name() == "v000001"
+
+
+def test_latest_key_needs_no_unpickling(learner):
+    learner.bootstrap(epochs=1)
+    registry = ModelRegistry()
+    key = online.latest_key()
+    assert registry.stats()["versions"] == []
+    assert online.latest_version(registry).key == key
+
+    # snapshots written before meta.json recorded the key are hashed instead
+    meta_path = os.path.join(os.path.dirname(learner.latest_path()), "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    del meta["key"]
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    online._keys.clear()
+    assert online.latest_key() == key
+
+
+def test_old_snapshots_are_pruned(learner):
+    learner.bootstrap(epochs=1)
+    X, y = load_data()
+    for start in range(0, 200, 50):
+        learner.update(X[start:start + 50], y[start:start + 50])
+    assert [m["version"] for m in learner.snapshots()] == [3, 4, 5]
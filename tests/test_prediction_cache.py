@@ -0,0 +1,80 @@
+"""TTL and LRU eviction of the prediction cache (prediction_cache.py)."""
+import types
+
+import numpy as np
+import pytest
+
+import prediction_cache
+from prediction_cache import PredictionCache
+from registry import get_registry
+from scoring import load_data, predict
+
+
+@pytest.fixture(scope="module")
+def version():
+    return get_registry().bundled()
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Rows that reached the model, per call."""
+    calls = []
+
+    def counting_predict(model, X, preprocessor=None):
+        calls.append(len(X))
+        return predict(model, X, preprocessor)
+
+    monkeypatch.setattr(prediction_cache, "predict", counting_predict)
+    return calls
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_hits_match_the_model(version, scored):
+    cache = PredictionCache()
+    X = load_data()[0][:5]
+    first = cache.predict(version.key, version.model, X, version.preprocessor)
+    second = cache.predict(version.key, version.model, X, version.preprocessor)
+    assert scored == [5]
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_allclose(second[1], predict(version.model, X, version.preprocessor)[1])
+    assert cache.stats()["hits"] == 5 and cache.stats()["misses"] == 5
+
+
+def test_entries_expire_after_ttl(version, scored, clock):
+    cache = PredictionCache(ttl=60)
+    X = load_data()[0][:1]
+    cache.predict(version.key, version.model, X, version.preprocessor)
+    clock[0] += 59
+    cache.predict(version.key, version.model, X, version.preprocessor)
+    assert scored == [1]
+    clock[0] += 2
+    cache.predict(version.key, version.model, X, version.preprocessor)
+    assert scored == [1, 1]
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_rows_are_evicted(version, scored):
+    cache = PredictionCache(max_entries=2)
+    a, b, c = (row[None] for row in load_data()[0][:3])
+    for X in (a, b, a, c):
+        cache.predict(version.key, version.model, X, version.preprocessor)
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+    scored.clear()
+    cache.predict(version.key, version.model, a, version.preprocessor)
+    assert scored == []  # a was used after b, so b went
+    cache.predict(version.key, version.model, b, version.preprocessor)
+    assert scored == [1]
+
+
+def test_keys_are_per_model_version(version, scored):
+    cache = PredictionCache()
+    X = load_data()[0][:1]
+    cache.predict("v1", version.model, X, version.preprocessor)
+    cache.predict("v2", version.model, X, version.preprocessor)
+    assert scored == [1, 1]
@@ -0,0 +1,59 @@
+"""Counters and aggregates of the SQLite prediction log (prediction_log.py)."""
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from prediction_log import PredictionLog
+
+TODAY = date(2026, 3, 31)
+
+
+def _ts(days_ago):
+    return datetime.combine(TODAY - timedelta(days=days_ago), datetime.min.time()).timestamp() + 3600
+
+
+@pytest.fixture
+def log(tmp_path):
+    return PredictionLog(str(tmp_path / "predictions.db"))
+
+
+def test_counters_follow_the_rows(log):
+    log.log([1, 0, 1], [0.9, 0.2, 0.7], "k", "batch", outcomes=[1, 0, np.nan], ts=_ts(0))
+    log.log([1], [0.8], "k", ts=_ts(40))
+    metrics = log.home_metrics(window_days=30, today=TODAY)
+    assert (metrics["total"], metrics["high_risk"]) == (4, 3)
+    assert (metrics["window_total"], metrics["high_risk_window"]) == (3, 2)
+    assert metrics["labelled"] == 2 and metrics["accuracy"] == 1.0
+
+    # the counters agree with the raw rows
+    conn = sqlite3.connect(log.path)
+    assert conn.execute("SELECT COUNT(*), SUM(label = 1), COUNT(outcome) FROM predictions").fetchone() == (4, 3, 2)
+    assert conn.execute("SELECT SUM(total) FROM daily_stats").fetchone() == (4,)
+
+
+def test_recording_an_outcome_updates_accuracy(log):
+    first = log.log([1, 0], [0.9, 0.1], "k", ts=_ts(0))
+    log.record_outcome(first, 0)
+    metrics = log.home_metrics(today=TODAY)
+    assert (metrics["labelled"], metrics["accuracy"]) == (1, 0.0)
+    # a corrected outcome replaces the earlier one instead of counting twice
+    log.record_outcome(first, 1)
+    log.record_outcome(first + 1, 0)
+    metrics = log.home_metrics(today=TODAY)
+    assert (metrics["labelled"], metrics["accuracy"]) == (2, 1.0)
+    with pytest.raises(KeyError):
+        log.record_outcome(first + 10, 1)
+
+
+def test_empty_log(log):
+    assert log.log([]) is None
+    metrics = log.home_metrics(today=TODAY)
+    assert (metrics["total"], metrics["window_total"], metrics["accuracy"]) == (0, 0, None)
+
+
+def test_a_failed_write_leaves_no_partial_counts(log):
+    with pytest.raises(ValueError):
+        log.log([1, 0], [0.9, 0.1], "k", features=np.zeros((2, 3)), ts=_ts(0))
+    assert log.home_metrics(today=TODAY)["total"] == 0
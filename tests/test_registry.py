@@ -0,0 +1,70 @@
+"""The process-wide model registry (registry.py)."""
+import os
+import pickle
+import shutil
+
+import pytest
+
+import registry
+from registry import ModelRegistry
+
+
+def _model(i):
+    return pickle.dumps({"model": i})
+
+
+def test_hits_misses_and_lru_eviction():
+    reg = ModelRegistry(max_versions=2)
+    a = reg.load_bytes(_model(1))
+    assert reg.load_bytes(_model(1)) is a
+    b = reg.load_bytes(_model(2))
+    reg.get(a.key)  # a is now the most recently used
+    reg.load_bytes(_model(3))
+    stats = reg.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    assert reg.get(b.key) is None
+    assert stats["versions"][0] == a.key
+    assert stats["hit_rate"] == pytest.approx(1 / 4)
+
+
+@pytest.fixture
+def bundled(tmp_path, monkeypatch):
+    for name in ("BUNDLED_MODEL", "BUNDLED_SCALER", "BUNDLED_PREPROCESS"):
+        original = getattr(registry, name)
+        path = tmp_path / os.path.basename(original)
+        if os.path.exists(original):
+            shutil.copyfile(original, path)
+        monkeypatch.setattr(registry, name, str(path))
+    return tmp_path
+
+
+def test_promoted_model_is_picked_up(bundled):
+    reg = ModelRegistry()
+    first = reg.bundled()
+    assert first is not None and reg.bundled_version_key() == first.key
+    assert reg.bundled() is first
+
+    promoted = bundled / "model.pkl"
+    promoted.write_bytes(_model(7))
+    os.utime(promoted, ns=(0, 1))  # a different mtime even on coarse clocks
+    assert reg.bundled_version_key() != first.key
+    second = reg.bundled()
+    assert second.model == {"model": 7}
+    assert second.key == reg.bundled_version_key() == reg.bundled_key
+
+
+def test_no_bundled_model(bundled):
+    os.remove(bundled / "model.pkl")
+    reg = ModelRegistry()
+    assert reg.bundled_version_key() is None
+    assert reg.bundled() is None
+
+
+def test_preload_runs_once_in_the_background(bundled):
+    reg = ModelRegistry()
+    reg.preload_bundled(delay=0)
+    timer = reg._preload
+    reg.preload_bundled(delay=0)
+    assert reg._preload is timer
+    timer.join(30)
+    assert reg.stats()["versions"] == [reg.bundled_version_key()]
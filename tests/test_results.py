@@ -0,0 +1,53 @@
+"""Paged batch results (results.py)."""
+import os
+
+import numpy as np
+
+from results import BatchResults, page_count
+from scoring import FEATURES
+
+
+def _fill(directory, blocks=3, rows=40):
+    rng = np.random.default_rng(0)
+    results = BatchResults(str(directory))
+    for b in range(blocks):
+        X = rng.uniform(0, 200, (rows, len(FEATURES)))
+        labels = rng.integers(0, 2, rows)
+        proba = rng.uniform(0, 1, rows)
+        messages = np.full(rows, "", dtype=object)
+        if b == blocks - 1:
+            labels[:2], proba[:2], messages[:2] = -1, np.nan, "Glucose: empty"
+        results.add(X, labels, proba, messages)
+        # blocks go to the files, not to memory
+        assert results.X is None and results.rows == (b + 1) * rows
+    results.close()
+    assert os.path.getsize(directory / "labels.npy") == 128 + blocks * rows
+    return results
+
+
+def test_blocks_are_appended_to_npy_files(tmp_path):
+    results = _fill(tmp_path)
+    assert results.rows == 120
+    assert isinstance(results.X, np.memmap) and results.X.shape == (120, len(FEATURES))
+    assert results.summary()["Invalid"] == 2
+    reopened = BatchResults.load(str(tmp_path))
+    assert reopened.rows == 120
+    np.testing.assert_array_equal(reopened.labels, results.labels)
+
+
+def test_paging_a_sorted_filtered_view(tmp_path):
+    results = _fill(tmp_path)
+    idx = results.order("All", "Probability", descending=True)
+    assert len(idx) == 120
+    first, last = results.page(idx, 0, 25), results.page(idx, page_count(len(idx), 25) - 1, 25)
+    assert len(first) == 25 and len(last) == 20
+    assert first["Probability"].is_monotonic_decreasing
+    # NaN (invalid rows) sort last
+    assert list(last["Prediction"][-2:]) == ["Invalid", "Invalid"]
+    assert list(last["Validation"][-2:]) == ["Glucose: empty"] * 2
+    assert results.order("All", "Probability", descending=True) is idx
+
+    invalid = results.order("Invalid")
+    np.testing.assert_array_equal(invalid, [80, 81])
+    diabetic = results.page(results.order("Diabetic"), 0, 500)
+    assert set(diabetic["Prediction"]) == {"Diabetic"}
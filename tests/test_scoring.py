@@ -0,0 +1,80 @@
+"""Row validation and output formats on the scoring.py command-line path."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import scoring
+from columnar import INVALID_LABEL, INVALID_NAME
+from registry import get_registry
+
+
+@pytest.fixture
+def source(tmp_path):
+    X, y = scoring.load_data()
+    df = pd.DataFrame(X[:20], columns=scoring.FEATURES).assign(Outcome=y[:20])
+    df = df.astype({"Glucose": object})
+    df.loc[0, "Glucose"] = "abc"
+    df.loc[1, "Glucose"] = 900
+    df.loc[2, "BMI"] = np.nan
+    path = tmp_path / "in.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def _read(path):
+    return pd.read_csv(path) if path.suffix == ".csv" else pd.read_parquet(path)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_invalid_rows_are_not_scored(source, tmp_path, suffix):
+    output = tmp_path / f"out{suffix}"
+    rows, invalid, _ = scoring.score_file(str(source), str(output), workers=1, chunk_rows=7)
+    assert (rows, invalid) == (20, 3)
+    out = _read(output)
+    # the same contract as the apps' batch downloads: names in CSV, int8 labels in binary formats
+    if suffix == ".csv":
+        assert list(out["Prediction"][:3]) == [INVALID_NAME] * 3
+        assert set(out["Prediction"][3:]) <= {"Diabetic", "Non-Diabetic"}
+    else:
+        assert out["Prediction"].dtype == np.int8 and out["Probability"].dtype == np.float32
+        assert list(out["Prediction"][:3]) == [INVALID_LABEL] * 3
+        assert set(out["Prediction"][3:]) <= {0, 1}
+    assert out["Probability"][:3].isna().all()
+    assert list(out["Validation"][:3]) == ["Glucose not a number", "Glucose above 500 (900)", "BMI missing"]
+    assert out["Probability"][3:].between(0, 1).all()
+
+
+def test_explain_skips_invalid_rows(source, tmp_path):
+    output = tmp_path / "out.csv"
+    scoring.score_file(str(source), str(output), workers=1, explain=True)
+    contributions = _read(output).filter(like="_contribution")
+    assert contributions.shape[1] == len(scoring.FEATURES)
+    assert contributions[:3].isna().all().all()
+    assert contributions[3:].notna().all().all()
+
+
+def test_missing_columns(source, tmp_path):
+    pd.read_csv(source).drop(columns="Age").to_csv(source, index=False)
+    with pytest.raises(KeyError):
+        scoring.score_file(str(source), str(tmp_path / "out.csv"), workers=1)
+
+
+def test_unknown_extension_is_rejected(source, tmp_path):
+    with pytest.raises(ValueError):
+        scoring.score_file(str(source), str(tmp_path / "out.xlsx"), workers=1)
+    assert not (tmp_path / "out.xlsx").exists()
+    assert scoring.main([str(source), "-o", str(tmp_path / "out.txt")]) == 2
+
+
+def test_workers_match_a_single_process(source, tmp_path):
+    one, two = tmp_path / "one.csv", tmp_path / "two.csv"
+    scoring.score_file(str(source), str(one), workers=1, chunk_rows=7)
+    scoring.score_file(str(source), str(two), workers=2, chunk_rows=7)
+    pd.testing.assert_frame_equal(_read(one), _read(two))
+
+
+def test_workers_load_the_bundled_version():
+    registry = get_registry()
+    bundled = registry.bundled()
+    scoring._init_worker(registry.artifacts(bundled.key), False)
+    assert scoring._worker_version.key == bundled.key
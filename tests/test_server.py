@@ -0,0 +1,125 @@
+"""Micro-batching in the async inference server (server.py)."""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import server
+from registry import get_registry
+from scoring import load_data, predict
+
+
+@pytest.fixture(scope="module")
+def version():
+    return get_registry().bundled()
+
+
+@pytest.fixture(scope="module")
+def X():
+    return load_data()[0][:12]
+
+
+def _batcher(version, **kwargs):
+    return server.MicroBatcher(version.model, version.preprocessor, **kwargs)
+
+
+def test_concurrent_requests_share_one_batch(version, X):
+    async def go():
+        batcher = _batcher(version, window_ms=50)
+        batcher.start()
+        try:
+            results = await asyncio.gather(*(batcher.submit(X[i:i + 1]) for i in range(len(X))))
+        finally:
+            await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(go())
+    assert (batcher.batches, batcher.rows, batcher.largest_batch) == (1, len(X), len(X))
+    labels, proba = predict(version.model, X, version.preprocessor)
+    np.testing.assert_array_equal(np.concatenate([r[0] for r in results]), labels)
+    np.testing.assert_allclose(np.concatenate([r[1] for r in results]), proba)
+
+
+def test_batch_is_flushed_at_max_batch(version, X):
+    async def go():
+        batcher = _batcher(version, window_ms=1000, max_batch=4)
+        batcher.start()
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(batcher.submit(X[i:i + 1]) for i in range(len(X))))
+        finally:
+            await batcher.stop()
+        return batcher, time.perf_counter() - started
+
+    batcher, elapsed = asyncio.run(go())
+    assert (batcher.batches, batcher.largest_batch) == (3, 4)
+    # full batches don't wait for the window to close
+    assert elapsed < 1.0
+
+
+def test_window_closes_a_batch(version, X):
+    async def go():
+        batcher = _batcher(version, window_ms=5)
+        batcher.start()
+        try:
+            await batcher.submit(X[:1])
+            await asyncio.sleep(0.05)
+            await batcher.submit(X[1:3])
+        finally:
+            await batcher.stop()
+        return batcher
+
+    batcher = asyncio.run(go())
+    assert (batcher.batches, batcher.rows) == (2, 3)
+
+
+def test_next_window_is_collected_while_scoring(version, X):
+    scoring_now, most = [0], [0]
+    lock = threading.Lock()
+
+    async def go():
+        batcher = _batcher(version, window_ms=1)
+        score = batcher._score
+
+        def slow_score(rows):
+            with lock:
+                scoring_now[0] += 1
+                most[0] = max(most[0], scoring_now[0])
+            time.sleep(0.2)
+            with lock:
+                scoring_now[0] -= 1
+            return score(rows)
+
+        batcher._score = slow_score
+        batcher.start()
+        try:
+            first = asyncio.ensure_future(batcher.submit(X[:1]))
+            await asyncio.sleep(0.05)  # the first batch is being scored by now
+            await asyncio.gather(first, batcher.submit(X[1:2]))
+        finally:
+            await batcher.stop()
+        return batcher
+
+    batcher = asyncio.run(go())
+    assert batcher.batches == 2
+    assert most[0] == 2
+
+
+def test_scoring_errors_reach_every_caller(version, X):
+    async def go():
+        batcher = _batcher(version, window_ms=20)
+
+        def broken(rows):
+            raise RuntimeError("model exploded")
+
+        batcher._score = broken
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit(X[:1]), batcher.submit(X[1:2]), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(go())
+    assert [str(r) for r in results] == ["model exploded"] * 2
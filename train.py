@@ -0,0 +1,355 @@
+"""
+Reproducible model training and hyperparameter search.
+
+    python train.py                            # search, write models/<timestamp>/
+    python train.py --promote                  # ... and copy the winner next to the app
+    python train.py --promote-from models/20260101-120000
+    python train.py -o build/ --workers 8
+    python train.py --models logistic_regression,random_forest --no-halving
+
+Every candidate in SEARCH_SPACE is scored with stratified k-fold CV on the
+training split. Folds are preprocessed once (zero-imputation means and a
+StandardScaler fitted on each fold's training part) and shipped to the worker
+processes when the pool starts, so candidates only fit the estimator.
+
+The search uses successive halving: all candidates are first scored on a
+small fraction of each fold's training rows, the best 1/eta move on to a
+budget eta times larger, and so on until the survivors see the full folds.
+The winner is refit on the whole training split and evaluated on the held-out
+split (test_size=0.2, random_state=42, as in the notebook).
+
+Runs never overwrite the model the apps serve: they go to a fresh
+models/<timestamp>/ directory (or -o), and only --promote / --promote-from
+copy model.pkl, scaler.pkl and model.preprocess.json over the bundled ones.
+
+Outputs in the output directory:
+    model.pkl               the fitted estimator (expects scaled features)
+    scaler.pkl              StandardScaler fitted on the imputed training split
+    model.preprocess.json   imputation means + scaler, applied by registry/scoring
+    metrics.json            search leaderboard, CV and hold-out metrics
+"""
+import argparse
+import json
+import math
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from preprocessing import Preprocessor, fit_impute_means, spec_path_for
+from scoring import APP_DIR, DATA_PATH, FEATURES, load_data
+
+MODELS_DIR = os.path.join(APP_DIR, "models")
+# files copied next to the app by promote()
+PROMOTED = ("model.pkl", "scaler.pkl", "model.preprocess.json")
+
+SEED = 42
+TEST_SIZE = 0.2
+DEFAULT_FOLDS = 5
+DEFAULT_ETA = 3
+# the first halving rung never trains on less than this share of a fold
+MIN_FRACTION = 0.1
+METRICS = ("roc_auc", "accuracy")
+
+# name -> (estimator class path, parameter grid)
+SEARCH_SPACE = {
+    "logistic_regression": ("sklearn.linear_model.LogisticRegression", {
+        "C": [0.01, 0.1, 1.0, 10.0],
+        "max_iter": [1000],
+    }),
+    "random_forest": ("sklearn.ensemble.RandomForestClassifier", {
+        "n_estimators": [100, 300],
+        "max_depth": [None, 5, 10],
+        "min_samples_leaf": [1, 5],
+        "random_state": [SEED],
+    }),
+    "svm": ("sklearn.svm.SVC", {
+        "C": [0.1, 1.0, 10.0],
+        "gamma": ["scale", 0.01, 0.1],
+        "probability": [True],
+        "random_state": [SEED],
+    }),
+}
+
+
+def _estimator(name, params):
+    import importlib
+    module, cls = SEARCH_SPACE[name][0].rsplit(".", 1)
+    return getattr(importlib.import_module(module), cls)(**params)
+
+
+def candidates(names=None):
+    """All (model name, params) pairs of the selected grids."""
+    from sklearn.model_selection import ParameterGrid
+    return [(name, params)
+            for name in (names or SEARCH_SPACE)
+            for params in ParameterGrid(SEARCH_SPACE[name][1])]
+
+
+# -------------------- Data and folds --------------------
+def fit_preprocessing(X):
+    """Imputation means + StandardScaler fitted on X; returns (Preprocessor, scaler)."""
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    means = fit_impute_means(pd.DataFrame(X, columns=FEATURES))
+    scaler = StandardScaler().fit(Preprocessor(means).transform(X))
+    return Preprocessor.from_scaler(scaler, means), scaler
+
+
+def make_folds(X, y, n_folds=DEFAULT_FOLDS, seed=SEED):
+    """
+    Preprocessed CV folds: a list of (X_train, y_train, X_val, y_val) with
+    preprocessing fitted on each training part only. Training rows are
+    shuffled once so a halving rung can take a prefix of them.
+    """
+    from sklearn.model_selection import StratifiedKFold
+    rng = np.random.default_rng(seed)
+    folds = []
+    for train_idx, val_idx in StratifiedKFold(n_folds, shuffle=True, random_state=seed).split(X, y):
+        train_idx = rng.permutation(train_idx)
+        pre, _ = fit_preprocessing(X[train_idx])
+        folds.append((pre.transform(X[train_idx]), y[train_idx], pre.transform(X[val_idx]), y[val_idx]))
+    return folds
+
+
+# -------------------- Workers --------------------
+_folds = None
+
+
+def _init_worker(folds):
+    global _folds
+    _folds = folds
+
+
+def evaluate(name, params, fold, fraction, folds=None):
+    """Fits one candidate on the first `fraction` of a fold's training rows; returns its metrics."""
+    from sklearn.metrics import accuracy_score, roc_auc_score
+    X_train, y_train, X_val, y_val = (folds or _folds)[fold]
+    n = max(int(len(X_train) * fraction), 2 * len(np.unique(y_train)))
+    model = _estimator(name, params)
+    started = time.perf_counter()
+    model.fit(X_train[:n], y_train[:n])
+    fit_s = time.perf_counter() - started
+    proba = model.predict_proba(X_val)[:, 1]
+    return {
+        "roc_auc": float(roc_auc_score(y_val, proba)),
+        "accuracy": float(accuracy_score(y_val, model.predict(X_val))),
+        "fit_seconds": fit_s,
+    }
+
+
+# -------------------- Search --------------------
+def halving_fractions(n_candidates, eta=DEFAULT_ETA, min_fraction=MIN_FRACTION):
+    """Training-row fractions per rung, ending at 1.0."""
+    rungs = 1
+    while n_candidates > eta ** rungs and eta ** -rungs >= min_fraction:
+        rungs += 1
+    return [float(eta) ** -(rungs - 1 - r) for r in range(rungs)]
+
+
+def search(folds, pool_candidates, metric="roc_auc", workers=None, eta=DEFAULT_ETA, halving=True):
+    """
+    Runs the (halving) search over a process pool. Returns the leaderboard
+    of the final rung (best first) and a per-rung history.
+    """
+    fractions = halving_fractions(len(pool_candidates), eta) if halving else [1.0]
+    survivors = list(pool_candidates)
+    history = []
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=_init_worker,
+                             initargs=(folds,)) as pool:
+        for rung, fraction in enumerate(fractions):
+            futures = [[pool.submit(evaluate, name, params, fold, fraction) for fold in range(len(folds))]
+                       for name, params in survivors]
+            board = []
+            for (name, params), fold_futures in zip(survivors, futures):
+                scores = [f.result() for f in fold_futures]
+                entry = {"model": name, "params": params}
+                for key in METRICS:
+                    values = [s[key] for s in scores]
+                    entry[key] = float(np.mean(values))
+                    entry[key + "_std"] = float(np.std(values))
+                entry["fit_seconds"] = float(sum(s["fit_seconds"] for s in scores))
+                board.append(entry)
+            board.sort(key=lambda e: e[metric], reverse=True)
+            history.append({"rung": rung, "fraction": fraction, "candidates": len(board), "leaderboard": board})
+            if rung < len(fractions) - 1:
+                keep = max(1, math.ceil(len(board) / eta))
+                survivors = [(e["model"], e["params"]) for e in board[:keep]]
+    return board, history
+
+
+# -------------------- Final model --------------------
+def holdout_metrics(model, X, y):
+    from sklearn.metrics import (accuracy_score, confusion_matrix, f1_score, precision_score,
+                                 recall_score, roc_auc_score)
+    pred = model.predict(X)
+    proba = model.predict_proba(X)[:, 1]
+    return {
+        "rows": int(len(y)),
+        "accuracy": float(accuracy_score(y, pred)),
+        "roc_auc": float(roc_auc_score(y, proba)),
+        "precision": float(precision_score(y, pred, zero_division=0)),
+        "recall": float(recall_score(y, pred, zero_division=0)),
+        "f1": float(f1_score(y, pred, zero_division=0)),
+        "confusion_matrix": confusion_matrix(y, pred).tolist(),
+    }
+
+
+def write_artifacts(out_dir, model, scaler, preprocessor):
+    """Writes model.pkl, scaler.pkl and model.preprocess.json; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "model": os.path.join(out_dir, "model.pkl"),
+        "scaler": os.path.join(out_dir, "scaler.pkl"),
+    }
+    paths["preprocess"] = spec_path_for(paths["model"])
+    for key, obj in (("model", model), ("scaler", scaler)):
+        with open(paths[key], "wb") as f:
+            pickle.dump(obj, f)
+    preprocessor.save(paths["preprocess"])
+    return paths
+
+
+def run_dir():
+    """A new models/<timestamp> directory name for one training run."""
+    path = os.path.join(MODELS_DIR, time.strftime("%Y%m%d-%H%M%S"))
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(MODELS_DIR, time.strftime("%Y%m%d-%H%M%S") + f"-{suffix}")
+    return path
+
+
+def promote(out_dir, app_dir=APP_DIR):
+    """
+    Copies a run's model.pkl, scaler.pkl and model.preprocess.json next to
+    the app. Each file is written to a temporary name and renamed, so a
+    running app never reads a half-written model. Returns the promoted paths.
+    """
+    missing = [name for name in PROMOTED if not os.path.exists(os.path.join(out_dir, name))]
+    if missing:
+        raise FileNotFoundError(f"{out_dir} has no {', '.join(missing)}")
+    paths = []
+    for name in PROMOTED:
+        target = os.path.join(app_dir, name)
+        shutil.copyfile(os.path.join(out_dir, name), target + ".tmp")
+        os.replace(target + ".tmp", target)
+        paths.append(target)
+    return paths
+
+
+def check_artifacts(paths, X, expected):
+    """
+    Reloads the written files the way the apps do and returns the largest
+    difference from the `expected` probabilities on raw features X.
+    """
+    from registry import ModelRegistry
+    from scoring import predict
+    version = ModelRegistry().load_files(paths["model"])
+    _, proba = predict(version.model, X, version.preprocessor)
+    return float(np.max(np.abs(proba - expected)))
+
+
+def train(data_path=DATA_PATH, out_dir=None, models=None, metric="roc_auc", n_folds=DEFAULT_FOLDS,
+          workers=None, eta=DEFAULT_ETA, halving=True, refit_full=False):
+    """
+    Runs the whole pipeline into `out_dir` (default: a new models/<timestamp>)
+    and returns the metrics report (also written to metrics.json).
+    """
+    from sklearn.model_selection import train_test_split
+    started = time.perf_counter()
+    out_dir = out_dir or run_dir()
+    X, y = load_data(data_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SEED)
+
+    folds = make_folds(X_train, y_train, n_folds)
+    pool = candidates(models)
+    board, history = search(folds, pool, metric, workers, eta, halving)
+    best = board[0]
+    search_s = time.perf_counter() - started
+
+    preprocessor, scaler = fit_preprocessing(X_train)
+    model = _estimator(best["model"], best["params"]).fit(preprocessor.transform(X_train), y_train)
+    holdout = holdout_metrics(model, preprocessor.transform(X_test), y_test)
+    if refit_full:
+        preprocessor, scaler = fit_preprocessing(X)
+        model = _estimator(best["model"], best["params"]).fit(preprocessor.transform(X), y)
+
+    paths = write_artifacts(out_dir, model, scaler, preprocessor)
+    parity = check_artifacts(paths, X_test, model.predict_proba(preprocessor.transform(X_test))[:, 1])
+
+    report = {
+        "data": os.path.abspath(data_path),
+        "rows": int(len(y)),
+        "seed": SEED,
+        "metric": metric,
+        "folds": n_folds,
+        "halving": {"enabled": halving, "eta": eta, "fractions": [h["fraction"] for h in history]},
+        "candidates": len(pool),
+        "fits": sum(h["candidates"] for h in history) * n_folds,
+        "best": best,
+        "holdout": holdout,
+        "refit_full": refit_full,
+        "artifact_max_abs_diff": parity,
+        "output_dir": os.path.abspath(out_dir),
+        "artifacts": paths,
+        "search_seconds": search_s,
+        "total_seconds": time.perf_counter() - started,
+        "history": history,
+    }
+    with open(os.path.join(out_dir, "metrics.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and select the diabetes model; writes model.pkl, "
+                                                 "scaler.pkl, model.preprocess.json and metrics.json.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("-o", "--output-dir", default=None, help="default: a new models/<timestamp>/")
+    parser.add_argument("--promote", action="store_true",
+                        help="copy the trained model.pkl, scaler.pkl and model.preprocess.json next to the app")
+    parser.add_argument("--promote-from", default=None, metavar="RUN_DIR",
+                        help="don't train; promote the artifacts of an earlier run")
+    parser.add_argument("--models", default=None,
+                        help=f"comma-separated subset of {','.join(SEARCH_SPACE)} (default: all)")
+    parser.add_argument("--metric", choices=METRICS, default="roc_auc", help="selection metric")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--eta", type=int, default=DEFAULT_ETA, help="halving factor")
+    parser.add_argument("--no-halving", action="store_true", help="score every candidate on the full folds")
+    parser.add_argument("--refit-full", action="store_true",
+                        help="refit the winner on all rows after hold-out evaluation")
+    args = parser.parse_args(argv)
+
+    if args.promote_from:
+        try:
+            promote(args.promote_from)
+        except FileNotFoundError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        print(f"promoted {args.promote_from} -> {APP_DIR}")
+        return 0
+    models = args.models.split(",") if args.models else None
+    unknown = [m for m in models or [] if m not in SEARCH_SPACE]
+    if unknown:
+        print(f"error: unknown model(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    report = train(args.data, args.output_dir, models, args.metric, args.folds, args.workers,
+                   args.eta, not args.no_halving, args.refit_full)
+    best = report["best"]
+    print(f"best: {best['model']} {best['params']} cv {args.metric}={best[args.metric]:.4f}")
+    print(f"hold-out: accuracy={report['holdout']['accuracy']:.4f} roc_auc={report['holdout']['roc_auc']:.4f}")
+    print(f"{report['fits']} fits in {report['search_seconds']:.1f}s -> {report['output_dir']}")
+    if args.promote:
+        promote(report["output_dir"])
+        print(f"promoted to {APP_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
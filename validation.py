@@ -0,0 +1,147 @@
+"""
+Schema and clinical-range validation for feature blocks.
+
+Every check is a whole-array NumPy operation over an (n, 8) block, producing
+an int8 code per cell (OK, MISSING, NOT_NUMERIC, BELOW_MIN, ABOVE_MAX). Rows
+with any non-zero code are left unscored and reported; the rest of the batch
+is scored as usual. Zeros are valid everywhere: the notebook treats them as
+"not measured" and preprocessing.py imputes them.
+
+RANGES is also the source of the bounds on both apps' single-patient forms.
+"""
+import numpy as np
+
+from scoring import FEATURES
+
+# (min, max) accepted per feature; ints where the forms take whole numbers
+RANGES = {
+    "Pregnancies": (0, 20),
+    "Glucose": (0, 500),
+    "BloodPressure": (0, 250),
+    "SkinThickness": (0, 100),
+    "Insulin": (0, 1000),
+    "BMI": (0.0, 80.0),
+    "DiabetesPedigreeFunction": (0.0, 3.0),
+    "Age": (1, 120),
+}
+LOW = np.array([RANGES[c][0] for c in FEATURES], dtype=np.float64)
+HIGH = np.array([RANGES[c][1] for c in FEATURES], dtype=np.float64)
+
+OK, MISSING, NOT_NUMERIC, BELOW_MIN, ABOVE_MAX = range(5)
+CODE_NAMES = ["ok", "missing", "not_numeric", "below_min", "above_max"]
+
+# examples kept in a report
+MAX_EXAMPLES = 20
+
+
+def check_columns(columns):
+    """
+    Schema check on the input's column names. Raises KeyError naming missing
+    features (the file cannot be scored); returns a list of notes otherwise.
+    """
+    columns = list(columns)
+    missing = [c for c in FEATURES if c not in columns]
+    if missing:
+        raise KeyError(f"Missing columns: {', '.join(missing)}")
+    notes = []
+    if [c for c in columns if c in FEATURES] != FEATURES:
+        notes.append("Feature columns are not in model order; they are matched by name.")
+    extra = [c for c in columns if c not in FEATURES and c != "Outcome"]
+    if extra:
+        notes.append(f"Columns passed through unscored: {', '.join(map(str, extra))}")
+    return notes
+
+
+def check(X, not_numeric=None):
+    """(n, 8) int8 error codes for a float block (NaN = missing)."""
+    X = np.asarray(X)
+    codes = np.zeros(X.shape, dtype=np.int8)
+    codes[X < LOW] = BELOW_MIN
+    codes[X > HIGH] = ABOVE_MAX
+    codes[np.isnan(X)] = MISSING
+    if not_numeric is not None:
+        codes[not_numeric] = NOT_NUMERIC
+    return codes
+
+
+def describe_row(row_codes, row_values):
+    """Readable list of problems for one row, e.g. "Glucose above 500 (612)"."""
+    problems = []
+    for j in np.flatnonzero(row_codes):
+        name, code = FEATURES[j], row_codes[j]
+        if code == MISSING:
+            problems.append(f"{name} missing")
+        elif code == NOT_NUMERIC:
+            problems.append(f"{name} not a number")
+        elif code == BELOW_MIN:
+            problems.append(f"{name} below {RANGES[name][0]} ({row_values[j]:g})")
+        else:
+            problems.append(f"{name} above {RANGES[name][1]} ({row_values[j]:g})")
+    return "; ".join(problems)
+
+
+def row_messages(codes, X):
+    """
+    One message per row ("" for valid rows), built per (feature, problem)
+    over all invalid rows at once rather than row by row.
+    """
+    messages = np.full(len(codes), "", dtype=object)
+    rows = np.flatnonzero(codes.any(axis=1))
+    if not len(rows):
+        return messages
+    codes, X = codes[rows], X[rows]
+    out = np.full(len(rows), "", dtype=object)
+    for j, name in enumerate(FEATURES):
+        for code in range(1, len(CODE_NAMES)):
+            mask = codes[:, j] == code
+            if not mask.any():
+                continue
+            if code == MISSING:
+                text = np.full(mask.sum(), f"{name} missing", dtype=object)
+            elif code == NOT_NUMERIC:
+                text = np.full(mask.sum(), f"{name} not a number", dtype=object)
+            else:
+                bound = f"below {RANGES[name][0]}" if code == BELOW_MIN else f"above {RANGES[name][1]}"
+                text = f"{name} {bound} (" + np.char.mod("%g", X[mask, j]).astype(object) + ")"
+            previous = out[mask]
+            out[mask] = np.where(previous == "", text, previous + "; " + text)
+    messages[rows] = out
+    return messages
+
+
+class ValidationReport:
+    """Running counts over the blocks of one batch."""
+
+    def __init__(self):
+        self.rows = 0
+        self.invalid_rows = 0
+        self.counts = np.zeros((len(FEATURES), len(CODE_NAMES)), dtype=np.int64)
+        self.notes = []
+        self.examples = []
+
+    def add(self, codes, X):
+        """Counts a block's codes; returns the boolean mask of valid rows."""
+        invalid = codes.any(axis=1)
+        for code in range(1, len(CODE_NAMES)):
+            self.counts[:, code] += (codes == code).sum(axis=0)
+        for i in np.flatnonzero(invalid)[:MAX_EXAMPLES - len(self.examples)]:
+            self.examples.append({"row": self.rows + int(i), "problems": describe_row(codes[i], X[i])})
+        self.rows += len(codes)
+        self.invalid_rows += int(invalid.sum())
+        return ~invalid
+
+    def by_feature(self):
+        """{feature: {problem: count}} for features with at least one problem."""
+        return {
+            name: {CODE_NAMES[code]: int(n) for code, n in enumerate(self.counts[j]) if code and n}
+            for j, name in enumerate(FEATURES) if self.counts[j, 1:].any()
+        }
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "invalid_rows": self.invalid_rows,
+            "by_feature": self.by_feature(),
+            "notes": list(self.notes),
+            "examples": list(self.examples),
+        }